@@ -1,27 +1,71 @@
+import time
+
 import streamlit as st
-from tabs.akcje_tab import akcje_tab
-# Inne zakładki, możesz je stworzyć analogicznie w folderze tabs
-# from tabs.krypto_tab import krypto_tab
-# from tabs.ai_tab import ai_tab
-# from tabs.alerty_tab import alerty_tab
-# from tabs.analityka_tab import analityka_tab
-# from tabs.strategie_tab import strategie_tab
+from utils import perf, resources
 
+_script_start = time.perf_counter()
 st.set_page_config(page_title="TradingRevolution Ultimate", layout="wide")
+# pomiary tej sesji (czasy wywołań, cache, rozmiary wykresów)
+session_perf = perf.bind(st.session_state.setdefault("perf_registry", perf.Registry()))
 
 # --- Panel zakładek ---
-tabs = ["Akcje", "AI", "Alerty", "Analityka", "Strategie"]
-selected_tab = st.sidebar.radio("Wybierz zakładkę:", tabs)
-
-if selected_tab == "Akcje":
-    akcje_tab()
-# elif selected_tab == "Krypto":
-#     krypto_tab()
-# elif selected_tab == "AI":
-#     ai_tab()
-# elif selected_tab == "Alerty":
-#     alerty_tab()
-# elif selected_tab == "Analityka":
-#     analityka_tab()
-# elif selected_tab == "Strategie":
-#     strategie_tab()
+# moduły zakładek (i ich zależności: pandas, plotly, sklearn, ccxt) są importowane
+# dopiero przy pierwszym wyborze zakładki albo w tle po pierwszym wyrenderowaniu strony
+TABS = {
+    "Akcje": ("tabs.akcje_tab", "akcje_tab"),
+    "Krypto": ("tabs.krypto_tab", "krypto_tab"),
+    "AI": ("tabs.ai_tab", "ai_tab"),
+    "Alerty": ("tabs.alerty_tab", "alerty_tab"),
+    "Analityka": ("tabs.analityka_tab", "analityka_tab"),
+    "Strategie": ("tabs.strategie_tab", "strategie_tab"),
+    "Portfolio": ("tabs.portfolio_tab", "portfolio_tab"),
+}
+PREWARM_MODULES = [module for module, _ in TABS.values()] + ["sklearn.linear_model", "ccxt.async_support"]
+PREWARM_RESOURCES = ["bar_cache", "forecaster", "ticker_universe"]
+
+selected_tab = st.sidebar.radio("Wybierz zakładkę:", list(TABS))
+perf.observe("app.first_paint", time.perf_counter() - _script_start)
+
+module_name, function_name = TABS[selected_tab]
+try:
+    with perf.span(f"tab.{selected_tab}"):
+        tab = getattr(resources.import_module(module_name), function_name)
+        tab()
+finally:
+    perf.observe("app.script", time.perf_counter() - _script_start)
+    resources.prewarm(PREWARM_MODULES, PREWARM_RESOURCES)
+
+
+# --- Panel wydajności ---
+def performance_panel(registry):
+    import pandas as pd
+    with st.sidebar.expander("Performance"):
+        if not perf.enabled():
+            st.caption("Pomiary wyłączone (STOCKMATRIX_PERF=0).")
+            return
+        latency = registry.latency_rows()
+        if latency:
+            st.caption("Czasy wywołań (ms)")
+            st.dataframe(pd.DataFrame(latency).set_index("name").round(2), use_container_width=True)
+        caches = registry.cache_rows()
+        if caches:
+            st.caption("Cache")
+            st.dataframe(pd.DataFrame(caches).set_index("cache").round(3), use_container_width=True)
+        sizes = registry.size_rows()
+        if sizes:
+            st.caption("Rozmiary danych (KB)")
+            st.dataframe(pd.DataFrame(sizes).set_index("name").round(1), use_container_width=True)
+        shared = resources.stats()
+        if shared:
+            st.caption("Zasoby współdzielone (s)")
+            st.dataframe(pd.DataFrame(shared).set_index("resource").round(3), use_container_width=True)
+        if not (latency or caches or sizes or shared):
+            st.caption("Brak pomiarów.")
+        col1, col2 = st.columns(2)
+        col1.download_button("Prometheus", perf.to_prometheus(registry), file_name="stockmatrix_metrics.txt",
+                             mime="text/plain")
+        if col2.button("Wyczyść"):
+            registry.reset()
+
+
+performance_panel(session_perf)
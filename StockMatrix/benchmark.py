@@ -0,0 +1,618 @@
+"""
+Benchmarks for the data, indicator and strategy hot paths.
+
+Every case runs on deterministic synthetic OHLCV (utils/synthetic.py) served
+through an offline bar cache, with Streamlit replaced by a stub, so results
+only depend on the code and the machine. For each case and size the
+harness records the best and mean wall time over --repeat runs,
+throughput, peak traced memory (separate run under tracemalloc) and
+per-stage timings, and writes everything as JSON. Pass --compare with an
+earlier file to see ratios and flag regressions.
+
+    python benchmark.py                                  # quick preset
+    python benchmark.py --preset full --output bench.json
+    python benchmark.py --bars 1000,1000000 --symbols 1,500 --cases indicators
+    python benchmark.py --compare bench.json --fail-on-regression
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import types
+
+import numpy as np
+import pandas as pd
+
+PRESETS = {
+    "quick": {"bars": [1_000, 100_000], "symbols": [1, 100]},
+    "full": {"bars": [1_000, 100_000, 1_000_000, 10_000_000], "symbols": [1, 100, 1_000, 5_000]},
+}
+UNIVERSE_BARS = 504        # two years of daily bars per symbol in universe cases
+MAX_DAILY_BARS = 50_000    # longer series use a 1-minute index
+TA_MAX_BARS = 1_000_000    # the `ta` reference is too slow beyond this
+MONTECARLO_PATHS = 100_000  # per model; three 3-asset portfolios of 252 bars
+MONTECARLO_HISTORY = 1_260  # five years of daily returns to fit on
+BENCH_ORDERS = 2_000        # orders per batch size through the paper exchange
+
+
+class _Columns(list):
+    def __getattr__(self, name):
+        return getattr(_STUB, name)
+
+
+class StreamlitStub(types.ModuleType):
+    """
+    Minimal stand-in for the streamlit module: widgets return their default
+    (or a value preset in `values` by label), output calls are no-ops,
+    plotly payload sizes and error/warning messages are recorded.
+    """
+
+    def __init__(self):
+        super().__init__("streamlit")
+        self.values = {}
+        self.messages = []
+        self.payload_bytes = 0
+        self.charts = 0
+        self.session_state = {}
+        self.sidebar = self
+
+    def reset(self):
+        self.messages = []
+        self.payload_bytes = 0
+        self.charts = 0
+
+    def _value(self, label, default):
+        return self.values.get(label, default)
+
+    def text_input(self, label, value="", **kwargs):
+        return self._value(label, value)
+
+    def text_area(self, label, value="", **kwargs):
+        return self._value(label, value)
+
+    def number_input(self, label, min_value=None, max_value=None, value=None, **kwargs):
+        return self._value(label, value if value is not None else min_value)
+
+    def date_input(self, label, value=None, **kwargs):
+        return self._value(label, value)
+
+    def selectbox(self, label, options, index=0, **kwargs):
+        return self._value(label, list(options)[index])
+
+    def radio(self, label, options, index=0, **kwargs):
+        return self._value(label, list(options)[index])
+
+    def slider(self, label, min_value=None, max_value=None, value=None, **kwargs):
+        return self._value(label, value)
+
+    def select_slider(self, label, options=(), value=None, **kwargs):
+        return self._value(label, value if value is not None else list(options)[0])
+
+    def checkbox(self, label, value=False, **kwargs):
+        return self._value(label, value)
+
+    def button(self, label, **kwargs):
+        return self._value(label, False)
+
+    def file_uploader(self, label, **kwargs):
+        return self._value(label, None)
+
+    def columns(self, spec, **kwargs):
+        return _Columns([self] * (spec if isinstance(spec, int) else len(spec)))
+
+    def plotly_chart(self, fig, **kwargs):
+        self.charts += 1
+        self.payload_bytes += len(json.dumps(fig) if isinstance(fig, dict) else fig.to_json())
+
+    def error(self, body, **kwargs):
+        self.messages.append(("error", str(body)))
+
+    def warning(self, body, **kwargs):
+        self.messages.append(("warning", str(body)))
+
+    def cache_resource(self, func=None, **kwargs):
+        return func if func is not None else (lambda f: f)
+
+    cache_data = cache_resource
+
+    def fragment(self, func=None, **kwargs):
+        return func if func is not None else (lambda f: f)
+
+    def expander(self, *args, **kwargs):
+        return self
+
+    container = expander
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __getattr__(self, name):
+        # title, subheader, metric, write, dataframe, info, caption, ... -> no-op
+        return lambda *args, **kwargs: None
+
+
+_STUB = StreamlitStub()
+
+
+def install_stub():
+    sys.modules["streamlit"] = _STUB
+    return _STUB
+
+
+def _timed(stages, name, func):
+    """Wrap `func` so its wall time accumulates into stages[name]."""
+    def wrapper(*args, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            stages[name] = stages.get(name, 0.0) + time.perf_counter() - t0
+    return wrapper
+
+
+class Case:
+    """
+    One benchmark. `setup(size)` builds inputs outside the timing and returns
+    a state; `run(state)` does the work and may return {stage: seconds}.
+    `axis` says which size list the case follows ("bars" or "symbols").
+    """
+
+    def __init__(self, name, setup, run, axis="bars", items=None, max_size=None):
+        self.name = name
+        self.setup = setup
+        self.run = run
+        self.axis = axis
+        self.items = items or (lambda size: size)
+        self.max_size = max_size
+
+
+def _interval(n_bars):
+    return "1d" if n_bars <= MAX_DAILY_BARS else "1m"
+
+
+def _single(n_bars):
+    from utils.synthetic import synthetic_bars
+    return synthetic_bars(n_bars, seed=1, interval=_interval(n_bars))
+
+
+def _offline_cache(frames, interval="1d"):
+    """Point the process-wide bar cache at a temporary directory fed by `frames`."""
+    from utils.data_cache import FrameProvider, configure_cache
+    directory = tempfile.mkdtemp(prefix="stockmatrix-bench-")
+    provider = FrameProvider({(s, interval): df for s, df in frames.items()})
+    configure_cache(directory, provider, refresh_seconds=10 ** 9)
+    return directory
+
+
+# --- cases ---------------------------------------------------------------
+
+def _compute_indicators(df):
+    from utils.indicators import compute_indicators
+    compute_indicators(df, "Close", "High", "Low")
+
+
+def _ta_reference(df):
+    import ta
+    close, high, low = df["Close"], df["High"], df["Low"]
+    ta.trend.sma_indicator(close, 20)
+    ta.trend.ema_indicator(close, 50)
+    ta.momentum.rsi(close, 14)
+    macd = ta.trend.MACD(close)
+    macd.macd(), macd.macd_signal()
+    bb = ta.volatility.BollingerBands(close)
+    bb.bollinger_hband(), bb.bollinger_lband()
+    ta.volatility.average_true_range(high, low, close, 14)
+    ta.momentum.stoch(high, low, close, 14)
+    ta.trend.adx(high, low, close, 14)
+
+
+def _ta_setup(n_bars):
+    import ta  # noqa: F401  (skip the case when ta is missing)
+    return _single(n_bars)
+
+
+def _streaming_setup(n_bars):
+    df = _single(n_bars)
+    # a few missing bars, so the gap handling of both engines is compared too
+    gaps = np.linspace(0, n_bars - 1, 8).astype(int)[1:-1]
+    df.iloc[gaps, df.columns.get_indexer(["Close", "High", "Low"])] = np.nan
+    return df
+
+
+def _streaming(df):
+    from utils.screener import SCREENER_INDICATORS
+    from utils.streaming_indicators import parity
+    mismatched = {k: v for k, v in parity(SCREENER_INDICATORS, df["Close"], df["High"], df["Low"]).items() if v}
+    if mismatched:
+        raise AssertionError(f"streaming differs from IndicatorEngine on rows: {mismatched}")
+
+
+def _analyze_volatility(df):
+    from utils.risk_metrics import analyze_volatility
+    analyze_volatility(df, "Close")
+
+
+def _predict_trend(df):
+    from utils import ml_predict
+    ml_predict.get_forecaster().cache = ml_predict.ModelCache()
+    stages = {}
+    t0 = time.perf_counter()
+    ml_predict.predict_trend(df, "Close")
+    stages["cold"] = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    ml_predict.predict_trend(df, "Close")
+    stages["warm"] = time.perf_counter() - t0
+    return stages
+
+
+def _walk_forward(df):
+    from utils.ml_predict import Forecaster
+    _, _, report = Forecaster().backtest(df)
+    return {"fit_and_predict": report["seconds"]}
+
+
+def _backtest(df):
+    from utils.backtest import run_backtest, sma_crossover
+    stages = {}
+    t0 = time.perf_counter()
+    signal = sma_crossover(df["Close"].to_numpy(), 10, 50)
+    stages["signal"] = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    run_backtest(df["Close"], signal)
+    stages["backtest"] = time.perf_counter() - t0
+    return stages
+
+
+def _strategy_setup(n_bars):
+    from utils.synthetic import synthetic_bars
+    # the strategy asks for the last year, so end the series today
+    df = synthetic_bars(300, seed=2)
+    df.index = df.index + (pd.Timestamp.today().normalize() - df.index[-1])
+    _offline_cache({"STRAT": df})
+    return "STRAT"
+
+
+def _strategy(symbol):
+    from utils import strategies
+    strategies.moving_average_strategy(symbol)
+
+
+def _pipeline_setup(n_bars):
+    from utils.pipeline import MemoStore
+    from utils.synthetic import synthetic_bars
+    interval = "1d" if n_bars <= 5_000 else "1h"
+    df = synthetic_bars(n_bars, seed=3, interval=interval)
+    _offline_cache({"PIPE": df}, interval)
+    return {"start": df.index[0], "interval": interval, "store": MemoStore()}
+
+
+def _pipeline(state):
+    from utils.pipeline import run_analysis
+    from tabs.akcje_tab import INDICATORS
+    stages = {}
+    for label in ("cold", "warm"):
+        t0 = time.perf_counter()
+        result = run_analysis("PIPE", start=state["start"], interval=state["interval"], specs=INDICATORS,
+                              store=state["store"])
+        stages[label] = time.perf_counter() - t0
+        if label == "cold":
+            stages.update({f"cold.{k}": v for k, v in result.timings.items()})
+    state["store"].clear()
+    return stages
+
+
+def _tab_setup(module_name, ticker_label, ticker, interval_label):
+    def setup(n_bars):
+        from utils.synthetic import synthetic_bars
+        df = synthetic_bars(min(n_bars, MAX_DAILY_BARS), seed=4)
+        _offline_cache({ticker: df})
+        _STUB.values = {ticker_label: ticker, "Data początkowa:": df.index[0].date(),
+                        "Data końcowa:": (df.index[-1] + pd.Timedelta(days=1)).date(), interval_label: "1d"}
+        module = __import__(module_name, fromlist=["*"])
+        return module
+    return setup
+
+
+def _tab(module):
+    from utils import visuals
+    from utils.pipeline import _default_store
+    _default_store.clear()
+    visuals.figure_cache = visuals.FigureCache()
+    _STUB.reset()
+    stages = {}
+    patched = {}
+    for name in ("run_analysis", "chart_window", "candlestick_figure", "volume_figure"):
+        if hasattr(module, name):
+            patched[name] = getattr(module, name)
+            setattr(module, name, _timed(stages, name, patched[name]))
+    try:
+        entry = getattr(module, module.__name__.rsplit(".", 1)[-1])
+        entry()
+    finally:
+        for name, func in patched.items():
+            setattr(module, name, func)
+    errors = [m for kind, m in _STUB.messages if kind == "error"]
+    if errors:
+        raise RuntimeError(errors[0])
+    stages["payload_kb"] = _STUB.payload_bytes / 1e3
+    return stages
+
+
+def _universe(n_symbols):
+    from utils.synthetic import synthetic_universe
+    return synthetic_universe(n_symbols, UNIVERSE_BARS, seed=5)
+
+
+def _engine_setup(n_symbols):
+    from utils.synthetic import synthetic_arrays
+    _, high, low, close, _ = synthetic_arrays(UNIVERSE_BARS, n_symbols, seed=5)
+    return close, high, low
+
+
+def _engine(arrays):
+    from utils.indicators import IndicatorEngine
+    from utils.screener import SCREENER_INDICATORS
+    IndicatorEngine(SCREENER_INDICATORS).run(*arrays)
+
+
+def _screener(frames):
+    from utils.screener import compute_panel
+    stages = {}
+    t0 = time.perf_counter()
+    panel = compute_panel(frames)
+    stages["compute_panel"] = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    panel.latest()
+    stages["latest"] = time.perf_counter() - t0
+    return stages
+
+
+_COLD_START = """
+import json, os, runpy, sys, time
+t0 = time.perf_counter()
+sys.path.insert(0, os.getcwd())
+import benchmark
+benchmark.install_stub()
+from utils import perf
+if {eager}:
+    for module in ("tabs.akcje_tab", "tabs.krypto_tab", "tabs.ai_tab", "tabs.alerty_tab",
+                   "tabs.analityka_tab", "tabs.strategie_tab", "tabs.portfolio_tab", "sklearn.linear_model"):
+        __import__(module)
+benchmark._STUB.values = {{"Wybierz zakładkę:": "Analityka"}}
+runpy.run_path("app.py", run_name="__main__")
+hists = benchmark._STUB.session_state["perf_registry"].latency
+print(json.dumps({{"first_paint": hists["app.first_paint"].sum, "script": hists["app.script"].sum,
+                  "process": time.perf_counter() - t0}}))
+"""
+
+
+def _cold_start(_):
+    """A fresh interpreter rendering the app, lazy (current) and with every tab imported up front."""
+    root = os.path.dirname(os.path.abspath(__file__))
+    stages = {}
+    for label, eager in (("lazy", False), ("eager", True)):
+        proc = subprocess.run([sys.executable, "-c", _COLD_START.format(eager=eager)], capture_output=True,
+                              text=True, cwd=root)
+        if proc.returncode:
+            raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+        out = json.loads(proc.stdout.strip().splitlines()[-1])
+        stages.update({f"{label}.{k}": v for k, v in out.items()})
+    return stages
+
+
+def _bar_store(frames):
+    from utils.bar_store import BarStore
+    from utils.screener import SCREENER_INDICATORS
+    stages = {}
+    t0 = time.perf_counter()
+    store = BarStore.from_frames(frames)
+    stages["build"] = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    store.compute_indicators(SCREENER_INDICATORS)
+    stages["indicators"] = time.perf_counter() - t0
+    stages["store_mb"] = store.nbytes / 1e6
+    return stages
+
+
+def _correlation_setup(n_symbols):
+    from utils.synthetic import synthetic_arrays
+    close = synthetic_arrays(UNIVERSE_BARS + 21, n_symbols, seed=6)[3]
+    return np.diff(np.log(close), axis=0)
+
+
+def _correlation(returns):
+    from utils.correlation import CorrelationTracker
+    tracker = CorrelationTracker(range(returns.shape[1]), window=250)
+    stages = {}
+    t0 = time.perf_counter()
+    tracker.extend(returns[:-20])
+    stages["extend"] = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    for row in returns[-20:]:
+        tracker.update(row)
+    stages["update_per_bar"] = (time.perf_counter() - t0) / 20
+    t0 = time.perf_counter()
+    tracker.correlation()
+    stages["correlation"] = time.perf_counter() - t0
+    return stages
+
+
+def _montecarlo_setup(n_bars):
+    from utils.synthetic import synthetic_arrays
+    close = synthetic_arrays(MONTECARLO_HISTORY, 3, seed=8)[3]
+    return np.diff(np.log(close), axis=0)
+
+
+def _montecarlo(returns):
+    from utils.montecarlo import simulate
+    stages = {}
+    for model in ("gbm", "bootstrap", "garch"):
+        t0 = time.perf_counter()
+        simulate(returns, model=model, n_paths=MONTECARLO_PATHS, horizon=252, seed=1, block=5)
+        stages[model] = time.perf_counter() - t0
+    return stages
+
+
+def _orders(_):
+    from utils.orders import throughput
+    stages = {}
+    for batch in (1, 5):
+        r = throughput(BENCH_ORDERS, batch_size=batch)
+        stages[f"batch{batch}"] = r["seconds"]
+    return stages
+
+
+CASES = [
+    Case("indicators.compute_indicators", _single, _compute_indicators),
+    Case("indicators.ta_reference", _ta_setup, _ta_reference, max_size=TA_MAX_BARS),
+    Case("streaming.parity", _streaming_setup, _streaming, max_size=100_000),
+    Case("risk_metrics.analyze_volatility", _single, _analyze_volatility),
+    Case("ml_predict.predict_trend", _single, _predict_trend),
+    Case("ml_predict.walk_forward", _single, _walk_forward, max_size=1_000_000),
+    Case("backtest.sma_crossover", _single, _backtest),
+    Case("strategies.moving_average_strategy", _strategy_setup, _strategy, items=lambda size: 1,
+         max_size=1_000),
+    Case("pipeline.run_analysis", _pipeline_setup, _pipeline, max_size=1_000_000),
+    Case("tabs.akcje_tab", _tab_setup("tabs.akcje_tab", "Ticker akcji (np. AAPL, TSLA):", "BENCH",
+                                      "Interwał:"), _tab, items=lambda size: min(size, MAX_DAILY_BARS)),
+    Case("tabs.krypto_tab", _tab_setup("tabs.krypto_tab", "Krypto ticker (np. BTC-USD, ETH-USD):",
+                                       "BENCH-USD", "Interwał:"), _tab,
+         items=lambda size: min(size, MAX_DAILY_BARS)),
+    Case("app.cold_start", lambda size: None, _cold_start, items=lambda size: 1, max_size=1_000),
+    Case("indicators.engine_universe", _engine_setup, _engine, axis="symbols",
+         items=lambda size: size * UNIVERSE_BARS),
+    Case("screener.compute_panel", _universe, _screener, axis="symbols",
+         items=lambda size: size * UNIVERSE_BARS),
+    Case("bar_store.build_and_indicators", _universe, _bar_store, axis="symbols",
+         items=lambda size: size * UNIVERSE_BARS),
+    Case("montecarlo.simulate", _montecarlo_setup, _montecarlo, items=lambda size: 3 * MONTECARLO_PATHS * 252,
+         max_size=1_000),
+    Case("orders.paper_throughput", lambda size: None, _orders, items=lambda size: 2 * BENCH_ORDERS,
+         max_size=1_000),
+    Case("correlation.tracker", _correlation_setup, _correlation, axis="symbols", max_size=2_000,
+         items=lambda size: size * size),
+]
+
+
+def run_case(case, size, repeat):
+    try:
+        state = case.setup(size)
+    except ImportError as e:
+        return {"skipped": f"missing dependency: {e.name}"}
+    times, stage_runs = [], []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        stages = case.run(state) or {}
+        times.append(time.perf_counter() - t0)
+        stage_runs.append(stages)
+    tracemalloc.start()
+    case.run(state)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    best = min(times)
+    items = case.items(size)
+    stages = stage_runs[times.index(best)]
+    return {"seconds": best, "mean_seconds": float(np.mean(times)), "items": items,
+            "items_per_second": items / best if best else None, "peak_mb": peak / 1e6, "stages": stages}
+
+
+def environment():
+    def version(name):
+        try:
+            return __import__(name).__version__
+        except Exception:
+            return None
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {"python": platform.python_version(), "platform": platform.platform(),
+            "cpus": os.cpu_count(), "numpy": version("numpy"), "pandas": version("pandas"),
+            "commit": commit, "timestamp": pd.Timestamp.now(tz="UTC").isoformat()}
+
+
+def compare(results, baseline, tolerance):
+    """Rows of (case, size, old seconds, new seconds, ratio, regressed)."""
+    old = {(r["case"], r["axis"], r["size"]): r for r in baseline["results"] if "seconds" in r}
+    rows = []
+    for r in results:
+        ref = old.get((r["case"], r["axis"], r["size"]))
+        if ref is None or "seconds" not in r:
+            continue
+        ratio = r["seconds"] / ref["seconds"] if ref["seconds"] else float("inf")
+        rows.append((r["case"], r["size"], ref["seconds"], r["seconds"], ratio, ratio > 1 + tolerance))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark StockMatrix hot paths on synthetic data.")
+    parser.add_argument("--preset", choices=sorted(PRESETS), default="quick")
+    parser.add_argument("--bars", help="comma-separated series lengths (overrides the preset)")
+    parser.add_argument("--symbols", help="comma-separated universe sizes (overrides the preset)")
+    parser.add_argument("--cases", help="only cases whose name contains one of these comma-separated words")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="write results as JSON")
+    parser.add_argument("--compare", help="JSON of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="slowdown counted as regression")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    install_stub()
+    sizes = {
+        "bars": [int(x) for x in args.bars.split(",")] if args.bars else PRESETS[args.preset]["bars"],
+        "symbols": [int(x) for x in args.symbols.split(",")] if args.symbols else PRESETS[args.preset]["symbols"],
+    }
+    wanted = [w.strip() for w in args.cases.split(",")] if args.cases else None
+
+    results = []
+    for case in CASES:
+        if wanted and not any(w in case.name for w in wanted):
+            continue
+        for size in sizes[case.axis]:
+            if case.max_size and size > case.max_size:
+                continue
+            row = {"case": case.name, "axis": case.axis, "size": size}
+            try:
+                row.update(run_case(case, size, args.repeat))
+            except Exception as e:
+                row["error"] = f"{type(e).__name__}: {e}"
+            results.append(row)
+            if "seconds" in row:
+                stages = ", ".join(f"{k}={v:.1f}" if k.endswith(("_kb", "_mb")) else f"{k}={v * 1e3:.1f}ms"
+                                   for k, v in row["stages"].items())
+                print(f"{case.name:38s} {case.axis}={size:<9,d} {row['seconds'] * 1e3:10.2f} ms "
+                      f"{row['items_per_second'] or 0:14,.0f}/s {row['peak_mb']:9.1f} MB"
+                      + (f"  [{stages}]" if stages else ""))
+            else:
+                print(f"{case.name:38s} {case.axis}={size:<9,d} {row.get('skipped') or row.get('error')}")
+
+    report = {"environment": environment(), "sizes": sizes, "repeat": args.repeat, "results": results}
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump(report, fh, indent=2, default=float)
+
+    if args.compare:
+        with open(args.compare) as fh:
+            baseline = json.load(fh)
+        rows = compare(results, baseline, args.tolerance)
+        print(f"\ncompared with {args.compare} (commit {baseline['environment'].get('commit')}):")
+        for name, size, old, new, ratio, regressed in rows:
+            print(f"{name:38s} {size:<9,d} {old * 1e3:10.2f} -> {new * 1e3:10.2f} ms  x{ratio:5.2f}"
+                  + ("  REGRESSION" if regressed else ""))
+        if args.fail_on_regression and any(r[-1] for r in rows):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
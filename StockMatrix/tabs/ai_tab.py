@@ -1,4 +1,74 @@
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
 import streamlit as st
+from utils.data_cache import load_bars, load_many
+from utils import resources
+from utils.ml_predict import FEATURE_SETS, signal_label
+from utils.visuals import show_chart
+
 
 def ai_tab():
-    st.write("✅ Zakładka AI działa!")
+    st.title("🤖 Prognoza AI")
+    col1, col2, col3, col4 = st.columns(4)
+    feature_set = col1.selectbox("Zestaw cech", FEATURE_SETS, index=1)
+    lags = col2.slider("Opóźnienia zwrotów", 1, 20, 5)
+    window = col3.slider("Okno treningowe (sesje)", 60, 1000, 250, step=10)
+    refit_every = col4.slider("Ponowny trening co (sesje)", 1, 60, 20)
+    period = st.selectbox("Okres danych:", ["1y", "2y", "5y", "10y"], index=2)
+    # one instance per configuration and process, so its model cache survives reruns and sessions
+    forecaster = resources.get("forecaster", feature_set, lags, window, refit_every)
+
+    # --- Walk-forward dla jednego symbolu ---
+    symbol = st.text_input("Symbol:", "AAPL").strip().upper()
+    if st.button("Oceń model (walk-forward)"):
+        df = load_bars(symbol, period=period)
+        if df.empty:
+            st.error("Brak danych")
+            return
+        preds, y, report = forecaster.backtest(df)
+        pred = forecaster.predict(symbol, df)
+        m1, m2, m3, m4 = st.columns(4)
+        m1.metric("Trafność kierunku", f"{report['hit_rate']:.1%}" if report["predictions"] else "—")
+        m2.metric("Prognoz poza próbą", report["predictions"])
+        m3.metric("Treningów", report["fits"])
+        m4.metric("Czas / prognozę", f"{report['latency_per_prediction'] * 1e6:.0f} µs")
+        if pred is not None:
+            last = float(df["Close"].iloc[-1])
+            next_price = last * float(np.exp(pred))
+            st.success(f"{symbol}: następne zamknięcie ≈ {next_price:.2f} ({pred:+.2%}) → "
+                       f"{signal_label(last, next_price)}")
+
+        ok = np.isfinite(preds) & np.isfinite(y)
+        hits = pd.Series(np.sign(preds[ok]) == np.sign(y[ok]), index=df.index[ok], dtype=float)
+        fig = go.Figure()
+        fig.add_trace(go.Scatter(x=df.index[ok], y=y[ok], name="Zwrot rzeczywisty", opacity=0.5))
+        fig.add_trace(go.Scatter(x=df.index[ok], y=preds[ok], name="Prognoza"))
+        fig.add_trace(go.Scatter(x=hits.index, y=hits.rolling(60).mean(), name="Trafność (60 sesji)",
+                                 yaxis="y2"))
+        fig.update_layout(template="plotly_dark", height=500, title=f"{symbol} - walk-forward",
+                          yaxis=dict(title="Log-zwrot"),
+                          yaxis2=dict(title="Trafność", overlaying="y", side="right", range=[0, 1]))
+        show_chart(fig)
+
+    # --- Prognozy dla listy symboli (jedno wywołanie wektorowe) ---
+    st.subheader("Prognozy dla wielu symboli")
+    universe = [t for t in resources.get("ticker_universe") if "-" not in t][:5]
+    tickers = st.text_area("Symbole (oddzielone przecinkami):", ", ".join(universe))
+    if st.button("Prognozuj"):
+        symbols = [t.strip().upper() for t in tickers.replace("\n", ",").split(",") if t.strip()]
+        frames = load_many(symbols, period=period)
+        preds = forecaster.predict_many(frames)
+        if not preds:
+            st.warning("Za mało danych do prognozy")
+            return
+        rows = []
+        for sym, pred in preds.items():
+            last = float(frames[sym]["Close"].iloc[-1])
+            next_price = last * float(np.exp(pred))
+            rows.append({"Symbol": sym, "Ostatnie": last, "Prognoza": next_price,
+                         "Zmiana %": pred * 100, "Sygnał": signal_label(last, next_price)})
+        st.dataframe(pd.DataFrame(rows).set_index("Symbol").sort_values("Zmiana %", ascending=False))
+        cache = forecaster.cache
+        st.caption(f"{len(preds)} prognoz, {forecaster.latency * 1e3:.2f} ms / prognozę; "
+                   f"cache modeli: {cache.hits} trafień, {cache.misses} chybień")
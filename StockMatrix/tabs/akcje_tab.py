@@ -1,12 +1,25 @@
 import streamlit as st
-import yfinance as yf
 import pandas as pd
-import plotly.graph_objects as go
-
-# --- Poprawne importy z biblioteki ta ---
-from ta.trend import SMAIndicator, EMAIndicator, MACD, ADXIndicator
-from ta.momentum import RSIIndicator, StochasticOscillator
-from ta.volatility import BollingerBands, AverageTrueRange
+from functools import partial
+from utils.indicators import spec
+from utils.pipeline import run_analysis
+from utils.resample import load_resampled
+from utils.visuals import candlestick_figure, volume_figure, chart_window, show_chart
+
+# --- Zestaw wskaźników liczony jednym przebiegiem silnika ---
+INDICATORS = [
+    spec("sma", "SMA20", window=20),
+    spec("sma", "SMA50", window=50),
+    spec("sma", "SMA200", window=200),
+    spec("ema", "EMA20", window=20),
+    spec("ema", "EMA50", window=50),
+    spec("rsi", "RSI", window=14),
+    spec("macd", "MACD", "MACD_signal"),
+    spec("bbands", "BB_upper", "BB_lower", window=20, dev=2),
+    spec("atr", "ATR", window=14),
+    spec("stoch", "Stochastic", window=14),
+    spec("adx", "ADX", window=14),
+]
 
 def akcje_tab():
     st.subheader("Zakładka Akcje - TradingRevolution Ultimate")
@@ -20,86 +33,45 @@ def akcje_tab():
         st.warning("Podaj ticker")
         return
 
+    # --- Pobranie danych, normalizacja i wskaźniki (wyniki etapów są zapamiętywane) ---
+    # wyższe interwały są liczone lokalnie z najdrobniejszych świec, bez ponownego pobierania
     try:
-        df = yf.download(ticker, start=start_date, end=end_date, interval=interval)
+        result = run_analysis(ticker, start=start_date, end=end_date, interval=interval, specs=INDICATORS,
+                              loader=partial(load_resampled, finest="1d"))
     except Exception as e:
         st.error(f"Błąd pobierania danych: {e}")
         return
 
+    df = result.frame
     if df.empty:
         st.warning(f"Brak danych dla {ticker}")
         return
 
-    df = df.copy()
-    df.index = pd.to_datetime(df.index)
-
-    # Spłaszczenie MultiIndex jeśli istnieje
-    if isinstance(df.columns, pd.MultiIndex):
-        df.columns = [' '.join(col).strip() for col in df.columns.values]
-
-    # Konwersja kolumn na float
-    for col in df.columns:
-        df[col] = pd.to_numeric(df[col], errors='coerce')
-
-    # --- Dynamiczne dopasowanie kolumn ---
-    def find_price_col(df, keyword):
-        for col in df.columns:
-            if keyword.lower() in col.lower():
-                return col
-        return None
-
-    open_col = find_price_col(df, 'Open')
-    high_col = find_price_col(df, 'High')
-    low_col = find_price_col(df, 'Low')
-    close_col = find_price_col(df, 'Close')
-    volume_col = find_price_col(df, 'Volume')
-
+    open_col, high_col, low_col, close_col, volume_col = result.columns
     if not all([open_col, high_col, low_col, close_col]):
         st.error(f"Brakuje wymaganych kolumn: Open, High, Low, Close")
         return
 
-    open_data = df[open_col]
-    high_data = df[high_col]
-    low_data = df[low_col]
     close_data = df[close_col]
     volume_data = df[volume_col] if volume_col else None
 
-    # --- Wskaźniki techniczne ---
-    df['SMA20'] = SMAIndicator(close_data, 20).sma_indicator()
-    df['SMA50'] = SMAIndicator(close_data, 50).sma_indicator()
-    df['SMA200'] = SMAIndicator(close_data, 200).sma_indicator()
-    df['EMA20'] = EMAIndicator(close_data, 20).ema_indicator()
-    df['EMA50'] = EMAIndicator(close_data, 50).ema_indicator()
-    df['RSI'] = RSIIndicator(close_data, 14).rsi()
-    macd = MACD(close_data)
-    df['MACD'] = macd.macd()
-    df['MACD_signal'] = macd.macd_signal()
-    df['BB_upper'] = BollingerBands(close_data, 20, 2).bollinger_hband()
-    df['BB_lower'] = BollingerBands(close_data, 20, 2).bollinger_lband()
-    df['ATR'] = AverageTrueRange(high_data, low_data, close_data, 14).average_true_range()
-    df['Stochastic'] = StochasticOscillator(high_data, low_data, close_data, 14).stoch()
-    df['ADX'] = ADXIndicator(high_data, low_data, close_data, 14).adx()
-
-    # --- Wykres świecowy ---
-    fig_candle = go.Figure()
-    fig_candle.add_trace(go.Candlestick(
-        x=df.index,
-        open=open_data,
-        high=high_data,
-        low=low_data,
-        close=close_data,
-        increasing_line_color='lime',
-        decreasing_line_color='red',
-        name="Świece"
-    ))
-    fig_candle.add_trace(go.Scatter(x=df.index, y=df['SMA20'], line=dict(color='orange', width=2), name="SMA20"))
-    fig_candle.add_trace(go.Scatter(x=df.index, y=df['SMA50'], line=dict(color='yellow', width=2), name="SMA50"))
-    fig_candle.add_trace(go.Scatter(x=df.index, y=df['SMA200'], line=dict(color='purple', width=2), name="SMA200"))
-    fig_candle.add_trace(go.Scatter(x=df.index, y=df['EMA20'], line=dict(color='green', width=2), name="EMA20"))
-    fig_candle.add_trace(go.Scatter(x=df.index, y=df['EMA50'], line=dict(color='blue', width=2), name="EMA50"))
-    fig_candle.update_layout(title=f"{ticker} - Świece i wskaźniki", template="plotly_dark", xaxis_rangeslider_visible=False, height=600)
-
-    st.plotly_chart(fig_candle, use_container_width=True)
+    # --- Wykres świecowy (świece agregowane do rozdzielczości wykresu) ---
+    view_start, view_end = chart_window(df, key="akcje_window")
+    fig_candle = candlestick_figure(
+        df, f"{ticker} - Świece i wskaźniki",
+        overlays=[
+            ('SMA20', dict(color='orange', width=2)),
+            ('SMA50', dict(color='yellow', width=2)),
+            ('SMA200', dict(color='purple', width=2)),
+            ('EMA20', dict(color='green', width=2)),
+            ('EMA50', dict(color='blue', width=2)),
+        ],
+        start=view_start, end=view_end,
+        open_col=open_col, high_col=high_col, low_col=low_col, close_col=close_col,
+        increasing_color='lime', decreasing_color='red',
+    )
+
+    show_chart(fig_candle)
 
     # --- Panel Technical Analysis ---
     st.subheader("Technical Analysis Panel")
@@ -119,7 +91,6 @@ def akcje_tab():
 
     # --- Wykres wolumenu ---
     if volume_data is not None:
-        fig_vol = go.Figure()
-        fig_vol.add_trace(go.Bar(x=df.index, y=volume_data, name="Wolumen", marker_color='blue'))
-        fig_vol.update_layout(title="Wolumen", template="plotly_dark", height=200)
-        st.plotly_chart(fig_vol, use_container_width=True)
+        fig_vol = volume_figure(df, "Wolumen", start=view_start, end=view_end, height=200,
+                                volume_col=volume_col, color='blue')
+        show_chart(fig_vol)
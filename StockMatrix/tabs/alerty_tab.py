@@ -1,7 +1,61 @@
 import streamlit as st
-from utils.alerts import check_alerts
+import pandas as pd
+from utils.alerts import AlertEngine, MemoryNotifier, CONDITIONS, FIELDS, check_alerts
+
+CONDITION_LABELS = {
+    "cross_above": "przecina w górę",
+    "cross_below": "przecina w dół",
+    "above": "powyżej",
+    "below": "poniżej",
+}
+
+def _session_engine():
+    if "alert_engine" not in st.session_state:
+        st.session_state.alert_engine = AlertEngine([MemoryNotifier()])
+    return st.session_state.alert_engine
 
 def alerty_tab():
     st.title("🔔 Alerty")
-    msg = check_alerts()
-    st.success(msg)
+    engine = _session_engine()
+
+    # --- Nowa reguła ---
+    with st.form("new_alert"):
+        cols = st.columns(5)
+        symbol = cols[0].text_input("Symbol", "AAPL").upper()
+        field = cols[1].selectbox("Pole", list(FIELDS))
+        condition = cols[2].selectbox("Warunek", CONDITIONS, format_func=CONDITION_LABELS.get)
+        threshold = cols[3].number_input("Próg", value=100.0)
+        cooldown = cols[4].number_input("Cooldown (h)", 0.0, 720.0, 24.0)
+        if st.form_submit_button("Dodaj alert") and symbol:
+            engine.add_rule(symbol, field, condition, threshold, cooldown=cooldown * 3600,
+                            message=f"{symbol} {field} {CONDITION_LABELS[condition]} {threshold:g}")
+
+    if engine.rules:
+        remove = st.selectbox("Usuń regułę:", [None] + list(engine.rules))
+        if remove is not None and st.button("Usuń"):
+            engine.remove_rule(remove)
+
+    if not engine.rules:
+        st.info("Brak reguł - dodaj pierwszy alert")
+        return
+
+    rules = pd.DataFrame([r.as_dict() for r in engine.rules.values()]).set_index("id")
+    st.dataframe(rules)
+
+    if st.button("Sprawdź alerty"):
+        try:
+            fired = check_alerts(engine)
+        except Exception as e:
+            st.error(f"Błąd pobierania danych: {e}")
+            fired = []
+        if fired:
+            st.warning(f"Wyzwolone alerty: {len(fired)}")
+        else:
+            st.success("✅ Brak nowych alertów")
+
+    events = list(engine.notifiers[0].events)
+    if events:
+        st.subheader("Historia alertów")
+        history = pd.DataFrame(events[::-1])
+        history["ts"] = pd.to_datetime(history["ts"], unit="s")
+        st.dataframe(history)
@@ -1,4 +1,94 @@
+import os
+
+import pandas as pd
+import plotly.graph_objects as go
 import streamlit as st
+from utils.data_cache import load_many
+from utils.montecarlo import BAND_QUANTILES, MIN_PATHS_PER_WORKER, MODELS, simulate_symbols
+from utils.risk_metrics import volatility_stats
+from utils.visuals import show_chart
+
+PATH_CHOICES = [10_000, 100_000, 250_000, 500_000, 1_000_000]
+# domyślnie tyle ścieżek, ile rdzenie policzą w kilka sekund (100k na 1 rdzeniu, 1M od 10 rdzeni)
+DEFAULT_PATHS = max(p for p in PATH_CHOICES if p <= (os.cpu_count() or 1) * MIN_PATHS_PER_WORKER)
+
 
 def analityka_tab():
-    st.write("✅ Zakładka Analityka działa!")
+    st.title("📐 Analityka ryzyka - Monte Carlo")
+    tickers = st.text_input("Symbole (oddzielone przecinkami):", "AAPL, MSFT, NVDA")
+    symbols = [t.strip().upper() for t in tickers.split(",") if t.strip()]
+    weights_text = st.text_input("Wagi (puste = równe):", "")
+    col1, col2, col3 = st.columns(3)
+    period = col1.selectbox("Historia do dopasowania:", ["1y", "2y", "5y", "10y"], index=2)
+    model = col2.selectbox("Model zwrotów:", MODELS, index=1)
+    n_paths = col3.select_slider("Liczba ścieżek:", PATH_CHOICES, value=DEFAULT_PATHS)
+    col1, col2, col3 = st.columns(3)
+    horizon = col1.slider("Horyzont (sesje)", 5, 252, 252)
+    seed = col2.number_input("Ziarno losowania", 0, 2 ** 31 - 1, 42)
+    block = col3.slider("Blok bootstrapu (sesje)", 1, 20, 5, disabled=model != "bootstrap")
+
+    if st.button("Symuluj"):
+        try:
+            weights = [float(w) for w in weights_text.split(",")] if weights_text.strip() else None
+            if weights is not None and len(weights) != len(symbols):
+                raise ValueError("Liczba wag musi odpowiadać liczbie symboli")
+            result, returns = simulate_symbols(symbols, weights, period=period, model=model, n_paths=n_paths,
+                                               horizon=horizon, seed=int(seed), block=block)
+        except ValueError as e:
+            st.error(str(e))
+            return
+        # kept across reruns so the charts do not trigger a new simulation
+        st.session_state["montecarlo"] = {"result": result, "symbols": list(returns.columns), "period": period}
+
+    run = st.session_state.get("montecarlo")
+    if not run:
+        return
+    result = run["result"]
+    s = result.summary()
+    st.caption(f"{s['paths']:,} ścieżek × {s['horizon']} sesji, model {result.model}, "
+               f"{', '.join(run['symbols'])}: {s['seconds']:.2f} s")
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("Średni zwrot", f"{s['mean_return']:.2%}")
+    c2.metric("Mediana zwrotu", f"{s['median_return']:.2%}")
+    c3.metric("P(strata)", f"{s['probability_of_loss']:.1%}")
+    c4.metric("Mediana maks. obsunięcia", f"{s['median_max_drawdown']:.2%}")
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("VaR 95%", f"{s['var_95']:.2%}")
+    c2.metric("CVaR 95%", f"{s['cvar_95']:.2%}")
+    c3.metric("VaR 99%", f"{s['var_99']:.2%}")
+    c4.metric("CVaR 99%", f"{s['cvar_99']:.2%}")
+    st.caption(f"Maks. obsunięcie: 5% ścieżek gorzej niż {s['max_drawdown_95']:.2%}, "
+               f"1% gorzej niż {s['max_drawdown_99']:.2%}")
+
+    # histograms are binned here; only bin counts go to the browser
+    col1, col2 = st.columns(2)
+    for col, values, title in ((col1, "returns", "Rozkład zwrotu na horyzoncie"),
+                               (col2, "drawdown", "Rozkład maks. obsunięcia")):
+        counts, edges = result.histogram(values)
+        fig = go.Figure(go.Bar(x=(edges[:-1] + edges[1:]) / 2, y=counts, width=edges[1] - edges[0]))
+        fig.update_layout(title=title, template="plotly_dark", height=350, xaxis_tickformat=".0%")
+        with col:
+            show_chart(fig)
+
+    x = list(range(1, result.horizon + 1))
+    fig = go.Figure()
+    for path in result.paths[:20]:
+        fig.add_trace(go.Scatter(x=x, y=path, mode="lines", line=dict(width=0.5), opacity=0.3,
+                                 showlegend=False))
+    for q, band in zip(BAND_QUANTILES, result.bands):
+        fig.add_trace(go.Scatter(x=x, y=band, name=f"Kwantyl {q:.0%}", line=dict(width=2)))
+    fig.update_layout(title="Wachlarz ścieżek (wartość 1 = start)", template="plotly_dark", height=450)
+    show_chart(fig)
+
+    # --- Zmienność historyczna ---
+    st.subheader("Zmienność historyczna")
+    frames = load_many(run["symbols"], period=run["period"])
+    rows = []
+    for sym, df in frames.items():
+        stats = volatility_stats(df, "Close") if df is not None and len(df) else None
+        if stats:
+            rows.append({"Symbol": sym, "Zmienność 30d": stats["volatility_30d"],
+                         "Zmienność roczna": stats["annual_volatility"], "Sharpe": stats["sharpe"],
+                         "Wysoka zmienność": stats["high_volatility"]})
+    if rows:
+        st.dataframe(pd.DataFrame(rows).set_index("Symbol"))
@@ -1,10 +1,52 @@
 import streamlit as st
-import yfinance as yf
 import pandas as pd
-import plotly.graph_objects as go
-from ta.trend import SMAIndicator, EMAIndicator, MACD, ADXIndicator
-from ta.momentum import RSIIndicator, StochasticOscillator
-from ta.volatility import BollingerBands, AverageTrueRange
+from functools import partial
+from utils.indicators import spec
+from utils.pipeline import run_analysis
+from utils.resample import load_resampled
+from utils.visuals import candlestick_figure, chart_window, show_chart
+from utils import resources
+from utils.live_feed import RingReader
+
+INDICATORS = [
+    spec("sma", "SMA20", window=20),
+    spec("sma", "SMA50", window=50),
+    spec("sma", "SMA200", window=200),
+    spec("ema", "EMA20", window=20),
+    spec("ema", "EMA50", window=50),
+    spec("rsi", "RSI14", window=14),
+    spec("macd", "MACD", "MACD_signal"),
+    spec("bbands", "BB_upper", "BB_lower"),
+    spec("atr", "ATR14", window=14),
+    spec("stoch", "Stochastic14", window=14),
+    spec("adx", "ADX14", window=14),
+]
+
+def _live_symbol(ticker):
+    base, _, quote = ticker.partition("-")
+    return f"{base}/{'USDT' if quote in ('', 'USD') else quote}"
+
+
+def _live_panel(exchange, symbol, timeframe):
+    # one ingestion thread per (giełda, para) for the whole server process; idle and failed feeds are stopped
+    feed = resources.live_feed(exchange, symbol)
+    reader = RingReader(feed.directory())
+    try:
+        if symbol not in reader.rings or not reader.rings[symbol].count:
+            st.info(f"Oczekiwanie na transakcje {symbol} z {exchange}...")
+            if feed.error:
+                st.error(f"Błąd strumienia: {feed.error}")
+            return
+        live = reader.bars(symbol, timeframe)
+        ts, price = reader.last(symbol)
+    finally:
+        reader.close()
+    st.metric(f"{symbol} (na żywo)", f"{price:,.2f}", f"{live['Close'].iloc[-1] / live['Open'].iloc[0] - 1:+.2%}")
+    fig = candlestick_figure(live, f"{symbol} - {timeframe} na żywo", height=400,
+                             increasing_color='lime', decreasing_color='red')
+    show_chart(fig)
+    st.caption(f"{feed.ticks} transakcji odebranych, ostatnia {pd.Timestamp(ts)} UTC")
+
 
 def krypto_tab():
     st.subheader("Zakładka Krypto - TradingRevolution Ultimate")
@@ -19,89 +61,46 @@ def krypto_tab():
         st.warning("Podaj ticker kryptowaluty")
         return
 
-    # --- Pobranie danych ---
+    # --- Pobranie danych, normalizacja i wskaźniki (wyniki etapów są zapamiętywane) ---
+    # wyższe interwały są liczone lokalnie z najdrobniejszych świec, bez ponownego pobierania
     try:
-        df = yf.download(ticker, start=start_date, end=end_date, interval=interval)
+        result = run_analysis(ticker, start=start_date, end=end_date, interval=interval, specs=INDICATORS,
+                              loader=partial(load_resampled, finest="1h"))
     except Exception as e:
         st.error(f"Błąd pobierania danych: {e}")
         return
 
+    df = result.frame
     if df.empty:
         st.warning(f"Brak danych dla {ticker}")
         return
 
-    df = df.copy()
-    df.index = pd.to_datetime(df.index)
-
-    # Spłaszczenie MultiIndex jeśli istnieje
-    if isinstance(df.columns, pd.MultiIndex):
-        df.columns = [' '.join(col).strip() for col in df.columns.values]
-
-    # Konwersja kolumn na float
-    for col in df.columns:
-        df[col] = pd.to_numeric(df[col], errors='coerce')
-
-    # --- Znalezienie wymaganych kolumn ---
-    def find_price_col(df, keyword):
-        for col in df.columns:
-            if keyword.lower() in col.lower():
-                return col
-        return None
-
-    open_col = find_price_col(df, 'Open')
-    high_col = find_price_col(df, 'High')
-    low_col = find_price_col(df, 'Low')
-    close_col = find_price_col(df, 'Close')
-    volume_col = find_price_col(df, 'Volume')
-
+    open_col, high_col, low_col, close_col, volume_col = result.columns
     if not all([open_col, high_col, low_col, close_col]):
         st.error(f"Brakuje wymaganych kolumn do wykresu świecowego")
         return
 
-    open_data = df[open_col]
-    high_data = df[high_col]
-    low_data = df[low_col]
     close_data = df[close_col]
     volume_data = df[volume_col] if volume_col else None
 
-    # --- Wskaźniki techniczne ---
-    df['SMA20'] = SMAIndicator(close_data, 20).sma_indicator()
-    df['SMA50'] = SMAIndicator(close_data, 50).sma_indicator()
-    df['SMA200'] = SMAIndicator(close_data, 200).sma_indicator()
-    df['EMA20'] = EMAIndicator(close_data, 20).ema_indicator()
-    df['EMA50'] = EMAIndicator(close_data, 50).ema_indicator()
-    df['RSI14'] = RSIIndicator(close_data, 14).rsi()
-    macd = MACD(close_data)
-    df['MACD'] = macd.macd()
-    df['MACD_signal'] = macd.macd_signal()
-    bb = BollingerBands(close_data)
-    df['BB_upper'] = bb.bollinger_hband()
-    df['BB_lower'] = bb.bollinger_lband()
-    df['ATR14'] = AverageTrueRange(high_data, low_data, close_data, 14).average_true_range()
-    df['Stochastic14'] = StochasticOscillator(high_data, low_data, close_data, 14).stoch()
-    df['ADX14'] = ADXIndicator(high_data, low_data, close_data, 14).adx()
-
-    # --- Wykres świecowy ---
-    fig_candle = go.Figure()
-    fig_candle.add_trace(go.Candlestick(
-        x=df.index,
-        open=open_data,
-        high=high_data,
-        low=low_data,
-        close=close_data,
-        increasing_line_color='lime',
-        decreasing_line_color='red',
-        name="Świece"
-    ))
-    fig_candle.add_trace(go.Scatter(x=df.index, y=df['SMA20'], line=dict(color='orange', width=1), name="SMA20"))
-    fig_candle.add_trace(go.Scatter(x=df.index, y=df['SMA50'], line=dict(color='yellow', width=1), name="SMA50"))
-    fig_candle.add_trace(go.Scatter(x=df.index, y=df['SMA200'], line=dict(color='purple', width=1), name="SMA200"))
-    fig_candle.add_trace(go.Scatter(x=df.index, y=df['EMA20'], line=dict(color='green', width=1), name="EMA20"))
-    fig_candle.add_trace(go.Scatter(x=df.index, y=df['EMA50'], line=dict(color='blue', width=1), name="EMA50"))
-    fig_candle.add_trace(go.Scatter(x=df.index, y=df['BB_upper'], line=dict(color='red', width=1, dash='dot'), name="BB Upper"))
-    fig_candle.add_trace(go.Scatter(x=df.index, y=df['BB_lower'], line=dict(color='red', width=1, dash='dot'), name="BB Lower"))
-    fig_candle.update_layout(title=f"{ticker} - Świece i wskaźniki", template="plotly_dark", xaxis_rangeslider_visible=False, height=600)
-    st.plotly_chart(fig_candle, use_container_width=True)
+    # --- Wykres świecowy (świece agregowane do rozdzielczości wykresu) ---
+    view_start, view_end = chart_window(df, key=f"window_{ticker}_{interval}")
+    fig_candle = candlestick_figure(
+        df, f"{ticker} - Świece i wskaźniki",
+        overlays=[
+            ('SMA20', dict(color='orange', width=1)),
+            ('SMA50', dict(color='yellow', width=1)),
+            ('SMA200', dict(color='purple', width=1)),
+            ('EMA20', dict(color='green', width=1)),
+            ('EMA50', dict(color='blue', width=1)),
+            ('BB_upper', dict(color='red', width=1, dash='dot')),
+            ('BB_lower', dict(color='red', width=1, dash='dot')),
+        ],
+        start=view_start, end=view_end,
+        open_col=open_col, high_col=high_col, low_col=low_col, close_col=close_col,
+        increasing_color='lime', decreasing_color='red',
+    )
+    show_chart(fig_candle)
 
     # --- Panel wskaźników ---
     st.subheader("Technical Analysis Panel")
@@ -116,7 +115,7 @@ def krypto_tab():
     last_price = safe_float(close_data.iloc[-1])
     last_rsi = safe_float(df['RSI14'].iloc[-1])
     last_macd = safe_float(df['MACD'].iloc[-1])
-    vol30 = safe_float(close_data.pct_change().dropna()[-30:].std() * 100 if len(close_data) >= 30 else 0.0)
+    vol30 = safe_float(result.metrics.get("volatility_window", 0.0) if len(close_data) >= 30 else 0.0)
 
     cols = st.columns(4)
     cols[0].metric("Price (USD)", f"${last_price:.2f}", key=f"price_{ticker}")
@@ -126,3 +125,15 @@ def krypto_tab():
 
     if vol30 > 10:
         st.warning("High volatility detected – expect larger price swings ⚠️")
+
+    # --- Notowania na żywo (strumień transakcji, odświeżany bez ponownego pobierania historii) ---
+    st.subheader("Na żywo")
+    if st.checkbox("Włącz podgląd na żywo", key=f"live_{ticker}"):
+        col1, col2 = st.columns(2)
+        exchange = col1.selectbox("Giełda:", ["binance", "kraken", "coinbase"], key=f"live_exchange_{ticker}")
+        timeframe = col2.selectbox("Świeca:", ["1m", "5m", "15m"], key=f"live_tf_{ticker}")
+        symbol = _live_symbol(ticker)
+        if hasattr(st, "fragment"):
+            st.fragment(run_every=2)(_live_panel)(exchange, symbol, timeframe)
+        else:
+            _live_panel(exchange, symbol, timeframe)
@@ -1,13 +1,46 @@
 import streamlit as st
-import pandas as pd
-from utils.risk_metrics import portfolio_summary
+import plotly.graph_objects as go
+from utils.portfolio import analyze_file
+from utils.visuals import show_chart
 
 def portfolio_tab():
     st.title("📁 Portfolio")
-    st.markdown("Wgraj CSV z kolumnami: symbol, quantity, price (opcjonalnie close)")
+    st.markdown("Wgraj CSV z kolumnami: symbol, quantity, price (opcjonalnie close). "
+                "Każdy wiersz to jedna pozycja (lot); pozycje są sumowane po symbolu.")
     uploaded = st.file_uploader("Wgraj CSV", type=["csv"])
+    col1, col2, col3 = st.columns(3)
+    period = col1.selectbox("Okres cen:", ["6mo", "1y", "2y", "5y"], index=1)
+    benchmark = col2.text_input("Benchmark (beta):", "SPY").strip().upper()
+    confidence = col3.selectbox("Poziom ufności VaR:", [0.9, 0.95, 0.99], index=1)
     if uploaded:
-        df = pd.read_csv(uploaded)
-        st.dataframe(df)
-        summary = portfolio_summary(df)
+        # the same file content is analysed once; reruns and re-uploads hit the cache
+        try:
+            report = analyze_file(uploaded.getvalue(), period=period, benchmark=benchmark or None,
+                                  confidence=confidence)
+        except ValueError as e:
+            st.error(str(e))
+            return
+        summary = report.summary()
+        m = report.metrics
+        c1, c2, c3, c4 = st.columns(4)
+        c1.metric("Wartość rynkowa", f"{summary['Total Market Value']:,.2f}")
+        c2.metric("Liczba pozycji", summary["Holdings Count"])
+        if m:
+            c3.metric("Zmienność roczna", f"{m['annual_volatility']:.2%}")
+            c4.metric("Sharpe", f"{m['sharpe']:.2f}")
+            c1, c2, c3, c4 = st.columns(4)
+            c1.metric(f"VaR hist. ({confidence:.0%})", f"{m['var_historical']:.2%}")
+            c2.metric(f"CVaR hist. ({confidence:.0%})", f"{m['cvar_historical']:.2%}")
+            c3.metric("VaR param.", f"{m['var_parametric']:.2%}")
+            c4.metric("Maks. obsunięcie", f"{m['max_drawdown']:.2%}")
+            if "beta" in m:
+                st.caption(f"Beta względem {benchmark}: {m['beta']:.2f}")
+        if report.missing:
+            st.warning(f"Brak notowań dla: {', '.join(report.missing[:20])}"
+                       + (" ..." if len(report.missing) > 20 else ""))
+        if len(report.equity):
+            fig = go.Figure(go.Scatter(x=report.equity.index, y=report.equity, name="Wartość"))
+            fig.update_layout(title="Wartość bieżących pozycji", template="plotly_dark", height=400)
+            show_chart(fig)
+        st.dataframe(report.positions)
         st.json(summary)
@@ -1,11 +1,66 @@
 import streamlit as st
+import plotly.graph_objects as go
 from utils.strategies import moving_average_strategy
+from utils.data_cache import load_bars
+from utils.backtest import run_backtest, sma_crossover, sma_grid
+from utils.orders import paper_trade
+from utils.visuals import show_chart
 
 def strategie_tab():
     st.title("⚙️ Strategie")
     symbol = st.text_input("Symbol:", "AAPL")
     short = st.slider("Szybka średnia", 5, 50, 10)
     long = st.slider("Wolna średnia", 20, 200, 50)
+    fee = st.number_input("Prowizja (%)", 0.0, 1.0, 0.1, step=0.05) / 100
+    slippage = st.number_input("Poślizg (%)", 0.0, 1.0, 0.05, step=0.05) / 100
     if st.button("Uruchom strategię MA"):
-        moving_average_strategy(symbol, short, long)
+        moving_average_strategy(symbol, short, long, fee=fee, slippage=slippage)
 
+    # --- Handel papierowy: ta sama strategia przez menedżera zleceń i symulowaną giełdę ---
+    st.subheader("Handel papierowy")
+    if st.button("Odtwórz strategię na giełdzie papierowej"):
+        df = load_bars(symbol, period="1y")
+        if df.empty:
+            st.error("Brak danych dla strategii")
+            return
+        trader, equity = paper_trade(df, symbol, sma_crossover, {"short_window": short, "long_window": long},
+                                     fee=fee, slippage=slippage)
+        backtest = run_backtest(df["Close"], sma_crossover(df["Close"], short, long), fee=fee, slippage=slippage)
+        stats = trader.manager.stats()
+        c1, c2, c3 = st.columns(3)
+        c1.metric("Wynik (papierowo)", f"{equity.iloc[-1] / equity.iloc[0] - 1:.2%}")
+        c2.metric("Wynik (backtest)", f"{backtest.metrics['total_return']:.2%}")
+        c3.metric("Zlecenia", stats["orders"])
+        fig = go.Figure()
+        fig.add_trace(go.Scatter(x=equity.index, y=equity, name="Giełda papierowa"))
+        fig.add_trace(go.Scatter(x=backtest.equity.index, y=backtest.equity, name="Backtest"))
+        fig.update_layout(title=f"{symbol} - kapitał: handel papierowy a backtest", template="plotly_dark",
+                          height=400)
+        show_chart(fig)
+        st.dataframe(trader.manager.book.frame())
+
+    # --- Siatka parametrów: Sharpe dla każdej pary średnich ---
+    st.subheader("Siatka parametrów")
+    short_range = st.slider("Zakres szybkiej średniej", 2, 100, (5, 50))
+    long_range = st.slider("Zakres wolnej średniej", 10, 300, (20, 200))
+    period = st.selectbox("Okres danych:", ["1y", "2y", "5y", "10y"], index=2)
+    if st.button("Przeszukaj siatkę"):
+        df = load_bars(symbol, period=period)
+        if df.empty:
+            st.error("Brak danych dla strategii")
+            return
+        grid = sma_grid(df["Close"], range(short_range[0], short_range[1] + 1),
+                        range(long_range[0], long_range[1] + 1), fee=fee, slippage=slippage)
+        table = grid.table("sharpe")
+        fig = go.Figure(go.Heatmap(z=table.values, x=table.columns, y=table.index,
+                                   colorscale="RdYlGn", zmid=0, colorbar=dict(title="Sharpe")))
+        if short_range[0] <= short <= short_range[1] and long_range[0] <= long <= long_range[1]:
+            fig.add_trace(go.Scatter(x=[long], y=[short], mode="markers", name="Wybrana para",
+                                     marker=dict(symbol="x", size=12, color="white")))
+        fig.update_layout(title=f"{symbol} - Sharpe dla SMA(szybka, wolna)", template="plotly_dark",
+                          xaxis_title="Wolna średnia", yaxis_title="Szybka średnia", height=600)
+        show_chart(fig)
+        best = grid.best("sharpe")
+        if best:
+            st.success(f"Najlepsza para: SMA{best[0]} / SMA{best[1]}, Sharpe "
+                       f"{table.loc[best[0], best[1]]:.2f} ({table.size} kombinacji w {grid.elapsed:.2f} s)")
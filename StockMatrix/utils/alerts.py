@@ -1,5 +1,367 @@
 # utils/alerts.py
+"""
+Event-driven alert engine.
 
-def check_alerts():
-    # Minimalna funkcja testowa, później możesz rozbudować
-    return "✅ Alerty działają poprawnie!"
+Rules (price crossing a level, RSI thresholds, the volatility flag of
+risk_metrics.analyze_volatility, ...) are indexed by (symbol, field) and kept
+in sorted threshold arrays per condition. A new tick only updates the fields
+that have rules for its symbol and binary-searches the thresholds between
+the previous and the new value, so the work per tick depends on the rules
+that can fire, not on the total number of rules.
+"""
+import argparse
+import itertools
+import json
+import math
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from utils.streaming_indicators import RSI
+
+CONDITIONS = ("cross_above", "cross_below", "above", "below")
+
+
+class RollingVolatility:
+    """Std of the last `window` close-to-close returns in percent (vol_30d of analyze_volatility)."""
+
+    def __init__(self, window=30):
+        self.window = window
+        self.prev = None
+        self.returns = deque(maxlen=window)
+        self.total = 0.0
+        self.total_sq = 0.0
+
+    def push(self, price, high=None, low=None):
+        if self.prev is None or self.prev == 0:
+            self.prev = price
+            return math.nan
+        r = price / self.prev - 1.0
+        self.prev = price
+        if len(self.returns) == self.window:
+            old = self.returns[0]
+            self.total -= old
+            self.total_sq -= old * old
+        self.returns.append(r)
+        self.total += r
+        self.total_sq += r * r
+        n = len(self.returns)
+        if n < 2:
+            return math.nan
+        var = (self.total_sq - self.total * self.total / n) / (n - 1)
+        return math.sqrt(max(var, 0.0)) * 100
+
+
+class _Price:
+    def push(self, price, high=None, low=None):
+        return price
+
+
+# field name -> factory of an object with push(price) -> value
+FIELDS = {
+    "price": _Price,
+    "rsi": lambda: RSI(14),
+    "volatility": lambda: RollingVolatility(30),
+}
+
+
+class AlertRule:
+    __slots__ = ("id", "symbol", "field", "condition", "threshold", "cooldown", "message")
+
+    def __init__(self, id, symbol, field, condition, threshold, cooldown=0.0, message=""):
+        if field not in FIELDS:
+            raise ValueError(f"Unknown alert field: {field}")
+        if condition not in CONDITIONS:
+            raise ValueError(f"Unknown alert condition: {condition}")
+        self.id = id
+        self.symbol = symbol
+        self.field = field
+        self.condition = condition
+        self.threshold = float(threshold)
+        self.cooldown = float(cooldown)
+        self.message = message
+
+    def as_dict(self):
+        return {k: getattr(self, k) for k in self.__slots__}
+
+
+class _ThresholdIndex:
+    """Rules of one (symbol, field), sorted by threshold per condition; arrays rebuilt lazily."""
+
+    def __init__(self):
+        self.rules = {c: {} for c in CONDITIONS}
+        self.arrays = {}
+
+    def add(self, rule):
+        self.rules[rule.condition][rule.id] = rule.threshold
+        self.arrays.pop(rule.condition, None)
+
+    def remove(self, rule):
+        self.rules[rule.condition].pop(rule.id, None)
+        self.arrays.pop(rule.condition, None)
+
+    def __len__(self):
+        return sum(len(r) for r in self.rules.values())
+
+    def _sorted(self, condition):
+        if condition not in self.arrays:
+            rules = self.rules[condition]
+            ids = np.array(list(rules.keys()), dtype=object)
+            thresholds = np.fromiter(rules.values(), dtype=float, count=len(rules))
+            order = np.argsort(thresholds, kind="stable")
+            self.arrays[condition] = (thresholds[order], ids[order])
+        return self.arrays[condition]
+
+    def candidates(self, prev, value):
+        """Ids of rules whose condition holds for the move prev -> value."""
+        out = []
+        if value != value:
+            return out
+        if self.rules["cross_above"] and prev is not None and value > prev:
+            th, ids = self._sorted("cross_above")
+            lo, hi = np.searchsorted(th, [prev, value], side="right")
+            out.extend(ids[lo:hi])
+        if self.rules["cross_below"] and prev is not None and value < prev:
+            th, ids = self._sorted("cross_below")
+            lo, hi = np.searchsorted(th, [value, prev], side="left")
+            out.extend(ids[lo:hi])
+        if self.rules["above"]:
+            th, ids = self._sorted("above")
+            out.extend(ids[:np.searchsorted(th, value, side="left")])
+        if self.rules["below"]:
+            th, ids = self._sorted("below")
+            out.extend(ids[np.searchsorted(th, value, side="right"):])
+        return out
+
+
+class Notifier:
+    """Receives the list of events fired by one tick."""
+
+    def notify(self, events):
+        raise NotImplementedError
+
+
+class MemoryNotifier(Notifier):
+    def __init__(self, maxlen=10_000):
+        self.events = deque(maxlen=maxlen)
+
+    def notify(self, events):
+        self.events.extend(events)
+
+
+class LogNotifier(Notifier):
+    """Appends events as JSON lines to a local file."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def notify(self, events):
+        with self._lock, open(self.path, "a") as fh:
+            for event in events:
+                fh.write(json.dumps(event, default=str) + "\n")
+
+
+class AlertEngine:
+    def __init__(self, notifiers=None):
+        self.notifiers = list(notifiers or [])
+        self.rules = {}
+        self._index = {}       # (symbol, field) -> _ThresholdIndex
+        self._fields = {}      # symbol -> {field: calculator}
+        self._last = {}        # (symbol, field) -> last value
+        self._last_fired = {}  # rule id -> ts of the last event
+        self._last_ts = {}     # (symbol, field) -> ts of the last value pushed
+        self._ids = itertools.count(1)
+        self._lock = threading.RLock()
+        self.ticks = 0
+        self.fired = 0
+
+    def add_rule(self, symbol, field, condition, threshold, cooldown=0.0, message="", rule_id=None):
+        with self._lock:
+            rule = AlertRule(rule_id if rule_id is not None else next(self._ids),
+                             symbol, field, condition, threshold, cooldown, message)
+            if rule.id in self.rules:
+                self.remove_rule(rule.id)
+            self.rules[rule.id] = rule
+            self._index.setdefault((symbol, field), _ThresholdIndex()).add(rule)
+            fields = self._fields.setdefault(symbol, {})
+            if field not in fields:
+                fields[field] = FIELDS[field]()
+            return rule
+
+    def remove_rule(self, rule_id):
+        with self._lock:
+            rule = self.rules.pop(rule_id, None)
+            if rule is None:
+                return
+            index = self._index[(rule.symbol, rule.field)]
+            index.remove(rule)
+            self._last_fired.pop(rule_id, None)
+            if not len(index):
+                del self._index[(rule.symbol, rule.field)]
+                del self._fields[rule.symbol][rule.field]
+                self._last.pop((rule.symbol, rule.field), None)
+                self._last_ts.pop((rule.symbol, rule.field), None)
+                if not self._fields[rule.symbol]:
+                    del self._fields[rule.symbol]
+
+    def symbols(self):
+        return list(self._fields)
+
+    def on_tick(self, symbol, price, ts):
+        """
+        Feed one price (tick or bar close) with its timestamp in seconds.
+        Returns the fired events; they are also sent to the notifiers.
+        """
+        with self._lock:
+            # a snapshot, so remove_rule on another thread cannot change it under _push
+            fields = list(self._fields.get(symbol, ()))
+            if not fields:
+                return []
+            self.ticks += 1
+            events = self._push(symbol, price, ts, fields, notify=True)
+        self._notify(events)
+        return events
+
+    def _push(self, symbol, price, ts, fields, notify):
+        """Update the calculators of `fields`; without `notify` only their state moves (warm-up)."""
+        events = []
+        for field in fields:
+            key = (symbol, field)
+            value = self._fields[symbol][field].push(price)
+            self._last_ts[key] = ts
+            prev = self._last.get(key)
+            if value == value:
+                self._last[key] = value
+            if not notify:
+                continue
+            for rule_id in self._index[key].candidates(prev, value):
+                rule = self.rules[rule_id]
+                last = self._last_fired.get(rule_id)
+                if last is not None and ts - last < rule.cooldown:
+                    continue
+                if last is not None and ts == last:
+                    continue  # same tick replayed
+                self._last_fired[rule_id] = ts
+                events.append({
+                    "rule_id": rule_id, "symbol": symbol, "field": field,
+                    "condition": rule.condition, "threshold": rule.threshold,
+                    "value": value, "ts": ts, "message": rule.message,
+                })
+        self.fired += len(events)
+        return events
+
+    def _notify(self, events):
+        if events:
+            for notifier in self.notifiers:
+                notifier.notify(events)
+
+    def on_bars(self, symbol, df, close_col="Close"):
+        """
+        Replay bars newer than the last value of each field of `symbol`. A
+        field that has seen nothing yet (first check, or the first rule on
+        it) is warmed up on the history without notifying; only its last
+        bar can fire.
+        """
+        if not len(df):
+            return []
+        ts = df.index.values.astype("datetime64[ns]").view("i8") / 1e9
+        closes = df[close_col].to_numpy(dtype=float)
+        events = []
+        with self._lock:
+            seen = {field: self._last_ts.get((symbol, field)) for field in self._fields.get(symbol, ())}
+            end = ts[-1]
+            for t, price in zip(ts.tolist(), closes.tolist()):
+                if price != price:
+                    continue
+                due = [f for f, last in seen.items() if last is None or t > last]
+                if not due:
+                    continue
+                self.ticks += 1
+                warm = [f for f in due if seen[f] is None and t < end]
+                live = [f for f in due if f not in warm]
+                if warm:
+                    self._push(symbol, price, t, warm, notify=False)
+                if live:
+                    events.extend(self._push(symbol, price, t, live, notify=True))
+        self._notify(events)
+        return events
+
+
+_default_engine = None
+
+
+def get_engine():
+    global _default_engine
+    if _default_engine is None:
+        _default_engine = AlertEngine([MemoryNotifier()])
+    return _default_engine
+
+
+def check_alerts(engine=None, period="3mo", interval="1d"):
+    """Feed the latest cached bars of every symbol with rules into the engine; returns fired events."""
+    from utils.data_cache import load_many
+    engine = engine or get_engine()
+    symbols = engine.symbols()
+    if not symbols:
+        return []
+    events = []
+    for symbol, df in load_many(symbols, period=period, interval=interval).items():
+        if len(df):
+            events.extend(engine.on_bars(symbol, df))
+    return events
+
+
+def benchmark(n_rules=100_000, n_symbols=500, n_ticks=200_000, seed=0):
+    """Replays a random-walk tick stream against random price/RSI/volatility rules."""
+    rng = np.random.default_rng(seed)
+    engine = AlertEngine()
+    symbols = [f"SYM{i}" for i in range(n_symbols)]
+    start = 100.0 * np.exp(rng.normal(0, 0.5, n_symbols))
+    t0 = time.perf_counter()
+    kinds = rng.integers(0, 10, n_rules)
+    sym = rng.integers(0, n_symbols, n_rules)
+    level = rng.normal(0, 0.05, n_rules)
+    for i in range(n_rules):
+        s = int(sym[i])
+        if kinds[i] < 7:
+            engine.add_rule(symbols[s], "price", "cross_above" if kinds[i] % 2 else "cross_below",
+                            start[s] * (1 + level[i]), cooldown=60)
+        elif kinds[i] < 9:
+            engine.add_rule(symbols[s], "rsi", "cross_below" if kinds[i] == 7 else "cross_above",
+                            30 if kinds[i] == 7 else 70, cooldown=300)
+        else:
+            engine.add_rule(symbols[s], "volatility", "cross_above", 10, cooldown=3600)
+    build = time.perf_counter() - t0
+
+    tick_sym = rng.integers(0, n_symbols, n_ticks)
+    steps = rng.normal(0, 0.002, n_ticks)
+    prices = start.copy()
+    sym_list = tick_sym.tolist()
+    step_list = steps.tolist()
+    t0 = time.perf_counter()
+    for i in range(n_ticks):
+        s = sym_list[i]
+        prices[s] *= 1.0 + step_list[i]
+        engine.on_tick(symbols[s], float(prices[s]), float(i))
+    elapsed = time.perf_counter() - t0
+    return {"rules": n_rules, "symbols": n_symbols, "ticks": n_ticks, "events": engine.fired,
+            "build_seconds": build, "seconds": elapsed, "ticks_per_second": n_ticks / elapsed}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Alert engine throughput on a replayed tick stream.")
+    parser.add_argument("--rules", type=int, default=100_000)
+    parser.add_argument("--symbols", type=int, default=500)
+    parser.add_argument("--ticks", type=int, default=200_000)
+    args = parser.parse_args(argv)
+    stats = benchmark(args.rules, args.symbols, args.ticks)
+    print(f"{stats['rules']} rules / {stats['symbols']} symbols built in {stats['build_seconds']:.2f} s; "
+          f"{stats['ticks']} ticks in {stats['seconds']:.2f} s "
+          f"({stats['ticks_per_second']:,.0f} ticks/s, {stats['events']} events)")
+
+
+if __name__ == "__main__":
+    main()
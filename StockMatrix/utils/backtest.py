@@ -0,0 +1,240 @@
+# utils/backtest.py
+"""
+Vectorized backtesting.
+
+Signals are position arrays (1 = long, 0 = flat, -1 = short, any float in
+between) decided on the close of bar t and held over the return from t to
+t+1. Every change of position pays fee + slippage on the traded fraction.
+
+`sma_grid` evaluates a whole (short_window, long_window) grid at once: the
+moving averages are computed once per distinct window from a cumulative sum
+and all pairs are compared in chunked (time x combination) matrices, so no
+Python loop runs per combination. `sweep` covers arbitrary signal
+generators and spreads the parameter sets over worker processes.
+"""
+import argparse
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+PERIODS_PER_YEAR = 252
+DEFAULT_FEE = 0.001
+DEFAULT_SLIPPAGE = 0.0005
+# elements per (time x combination) chunk, ~16 MB per float64 temporary
+CHUNK_ELEMENTS = 2_000_000
+
+METRICS = ("total_return", "cagr", "volatility", "sharpe", "max_drawdown", "trades")
+
+
+def rolling_means(close, windows):
+    """(T, len(windows)) simple moving averages, NaN until a window is full."""
+    close = np.asarray(close, dtype=float)
+    cs = np.concatenate([[0.0], np.cumsum(close)])
+    out = np.full((len(close), len(windows)), np.nan)
+    for j, w in enumerate(windows):
+        if w <= len(close):
+            out[w - 1:, j] = (cs[w:] - cs[:-w]) / w
+    return out
+
+
+def sma_crossover(close, short_window=10, long_window=50):
+    """Signal generator of utils.strategies.moving_average_strategy: long while SMA short > SMA long."""
+    means = rolling_means(close, [short_window, long_window])
+    return (means[:, 0] > means[:, 1]).astype(float)
+
+
+def _metrics_block(close, positions, fee, slippage, periods_per_year):
+    """
+    Metrics for every column of `positions` (T, P) at once.
+    Returns a dict of (P,) arrays keyed by METRICS.
+    """
+    close = np.asarray(close, dtype=float)
+    r = close[1:] / close[:-1] - 1.0
+    r = np.where(np.isfinite(r), r, 0.0)
+    held = positions[:-1]
+    prev = np.vstack([np.zeros((1, held.shape[1])), held[:-1]])
+    turnover = np.abs(held - prev)
+    ret = held * r[:, None] - (fee + slippage) * turnover
+
+    n = ret.shape[0]
+    mean = ret.mean(axis=0)
+    std = ret.std(axis=0)
+    log_eq = np.cumsum(np.log1p(np.maximum(ret, -0.999999)), axis=0)
+    peak = np.maximum.accumulate(np.maximum(log_eq, 0.0), axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sharpe = np.where(std > 0, mean / std * np.sqrt(periods_per_year), 0.0)
+    total = np.expm1(log_eq[-1]) if n else np.zeros(held.shape[1])
+    years = n / periods_per_year if n else np.nan
+    return {
+        "total_return": total,
+        "cagr": np.expm1(log_eq[-1] / years) if n else total,
+        "volatility": std * np.sqrt(periods_per_year),
+        "sharpe": sharpe,
+        "max_drawdown": np.expm1((log_eq - peak).min(axis=0)) if n else total,
+        # entries into a new non-zero position, one per row of run_backtest's trade list
+        "trades": np.count_nonzero((turnover != 0) & (held != 0), axis=0),
+    }
+
+
+class GridResult:
+    """Metrics of a (short_window x long_window) sweep as 2D arrays."""
+
+    def __init__(self, shorts, longs, metrics, elapsed):
+        self.shorts = np.asarray(shorts)
+        self.longs = np.asarray(longs)
+        self.metrics = metrics
+        self.elapsed = elapsed
+
+    def table(self, metric="sharpe"):
+        return pd.DataFrame(self.metrics[metric], index=pd.Index(self.shorts, name="short_window"),
+                            columns=pd.Index(self.longs, name="long_window"))
+
+    def best(self, metric="sharpe"):
+        values = self.metrics[metric]
+        if np.all(np.isnan(values)):
+            return None
+        i, j = np.unravel_index(np.nanargmax(values), values.shape)
+        return int(self.shorts[i]), int(self.longs[j])
+
+
+def sma_grid(close, shorts, longs, fee=DEFAULT_FEE, slippage=DEFAULT_SLIPPAGE,
+             periods_per_year=PERIODS_PER_YEAR, chunk_elements=CHUNK_ELEMENTS):
+    """
+    SMA crossover over every (short, long) pair. Pairs with short >= long are NaN.
+    """
+    t0 = time.perf_counter()
+    close = np.asarray(close, dtype=float)
+    shorts = np.asarray(list(shorts), dtype=int)
+    longs = np.asarray(list(longs), dtype=int)
+    windows = np.union1d(shorts, longs)
+    means = rolling_means(close, windows)
+
+    si, li = np.meshgrid(np.searchsorted(windows, shorts), np.searchsorted(windows, longs), indexing="ij")
+    valid = (shorts[:, None] < longs[None, :]).ravel()
+    si, li = si.ravel()[valid], li.ravel()[valid]
+
+    flat = {m: np.full(len(valid), np.nan) for m in METRICS}
+    step = max(1, chunk_elements // max(len(close), 1))
+    for lo in range(0, len(si), step):
+        hi = min(lo + step, len(si))
+        positions = (means[:, si[lo:hi]] > means[:, li[lo:hi]]).astype(float)
+        block = _metrics_block(close, positions, fee, slippage, periods_per_year)
+        rows = np.nonzero(valid)[0][lo:hi]
+        for m in METRICS:
+            flat[m][rows] = block[m]
+
+    shape = (len(shorts), len(longs))
+    metrics = {m: v.reshape(shape) for m, v in flat.items()}
+    return GridResult(shorts, longs, metrics, time.perf_counter() - t0)
+
+
+def _sweep_chunk(close, signal_fn, params, fee, slippage, periods_per_year):
+    positions = np.column_stack([np.asarray(signal_fn(close, **p), dtype=float) for p in params])
+    return _metrics_block(close, positions, fee, slippage, periods_per_year)
+
+
+def sweep(close, signal_fn, param_grid, fee=DEFAULT_FEE, slippage=DEFAULT_SLIPPAGE,
+          periods_per_year=PERIODS_PER_YEAR, workers=None, chunk=256):
+    """
+    Metrics for `signal_fn(close, **params)` over every combination of
+    `param_grid` ({name: values}). Chunks of parameter sets run in worker
+    processes; `signal_fn` must be a module-level function.
+    """
+    close = np.asarray(close, dtype=float)
+    names = list(param_grid)
+    params = [dict(zip(names, values)) for values in itertools.product(*param_grid.values())]
+    chunks = [params[i:i + chunk] for i in range(0, len(params), chunk)]
+    workers = min(workers or os.cpu_count() or 1, len(chunks))
+    if workers <= 1:
+        blocks = [_sweep_chunk(close, signal_fn, c, fee, slippage, periods_per_year) for c in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            blocks = list(pool.map(_sweep_chunk, *zip(*[(close, signal_fn, c, fee, slippage, periods_per_year)
+                                                        for c in chunks])))
+    table = pd.DataFrame(params)
+    for m in METRICS:
+        table[m] = np.concatenate([b[m] for b in blocks]) if blocks else []
+    return table
+
+
+class BacktestResult:
+    def __init__(self, equity, returns, positions, trades, metrics):
+        self.equity = equity
+        self.returns = returns
+        self.positions = positions
+        self.trades = trades
+        self.metrics = metrics
+
+
+def _trade_list(close, held, index):
+    """Segments of constant non-zero position: entry/exit bar, prices and gross return."""
+    trades = []
+    change = np.nonzero(np.diff(np.concatenate([[0.0], held, [0.0]])))[0]
+    for a, b in zip(change[:-1], change[1:]):
+        size = held[a]
+        if size == 0:
+            continue
+        # held[a] is the position over close[a] -> close[a+1]
+        entry, exit_ = close[a], close[b]
+        trades.append({
+            "entry_time": index[a], "exit_time": index[b], "size": size,
+            "entry_price": entry, "exit_price": exit_,
+            "return": size * (exit_ / entry - 1.0), "bars": b - a,
+        })
+    return pd.DataFrame(trades, columns=["entry_time", "exit_time", "size", "entry_price",
+                                         "exit_price", "return", "bars"])
+
+
+def run_backtest(close, positions, fee=DEFAULT_FEE, slippage=DEFAULT_SLIPPAGE, initial=10_000.0,
+                 periods_per_year=PERIODS_PER_YEAR):
+    """
+    Full result for one position series: equity curve, per-bar returns,
+    trade list and metrics. `close` may be a Series (its index is kept).
+    """
+    index = close.index if isinstance(close, pd.Series) else pd.RangeIndex(len(close))
+    close = np.asarray(close, dtype=float)
+    positions = np.nan_to_num(np.asarray(positions, dtype=float))
+    block = _metrics_block(close, positions[:, None], fee, slippage, periods_per_year)
+    metrics = {m: float(v[0]) for m, v in block.items()}
+    metrics["trades"] = int(metrics["trades"])
+
+    r = np.concatenate([[0.0], np.nan_to_num(close[1:] / close[:-1] - 1.0)])
+    held = np.concatenate([[0.0], positions[:-1]])
+    prev = np.concatenate([[0.0], held[:-1]])
+    ret = held * r - (fee + slippage) * np.abs(held - prev)
+    equity = pd.Series(initial * np.cumprod(1.0 + ret), index=index, name="equity")
+    return BacktestResult(equity, pd.Series(ret, index=index, name="returns"),
+                          pd.Series(positions, index=index, name="position"),
+                          _trade_list(close, positions[:-1], index), metrics)
+
+
+def synthetic_close(n_bars, seed=0):
+    rng = np.random.default_rng(seed)
+    return 100.0 * np.exp(np.cumsum(rng.normal(0.0003, 0.015, n_bars)))
+
+
+def benchmark(n_bars=10 * PERIODS_PER_YEAR, shorts=range(2, 102), longs=range(102, 202)):
+    """Times a full SMA grid sweep (default 100 x 100 = 10k pairs over 10 years of daily bars)."""
+    close = synthetic_close(n_bars)
+    result = sma_grid(close, shorts, longs)
+    combos = int(np.count_nonzero(~np.isnan(result.metrics["sharpe"])))
+    return {"bars": n_bars, "combinations": combos, "seconds": result.elapsed,
+            "combinations_per_second": combos / result.elapsed}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the vectorized SMA grid backtest.")
+    parser.add_argument("--bars", type=int, default=10 * PERIODS_PER_YEAR)
+    parser.add_argument("--grid", type=int, default=100, help="short and long windows per axis")
+    args = parser.parse_args(argv)
+    stats = benchmark(args.bars, range(2, 2 + args.grid), range(2 + args.grid, 2 + 2 * args.grid))
+    print(f"{stats['combinations']} combinations x {stats['bars']} bars: "
+          f"{stats['seconds']:.2f} s ({stats['combinations_per_second']:,.0f} combinations/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+# utils/bar_store.py
+"""
+Compact columnar store for the bars (and indicators) of many symbols.
+
+All symbols share one contiguous array per column, concatenated symbol after
+symbol; `offsets[i]:offsets[i + 1]` is the range of symbol i:
+
+    ts       int64 epoch nanoseconds
+    Open/High/Low/Close   float32 by default (price_dtype=np.float64 for full precision)
+    Volume   uint64 by default (volume_dtype=np.float64 for fractional crypto volume)
+    indicators            float32 block of shape (F, total bars), same offsets
+
+`bars(symbol, start, end)` returns a BarView whose arrays are slices of
+those columns, so indicator and chart code read them without copying;
+`BarView.frame()` wraps the same memory in a DataFrame. A store can be saved
+as one .npy file per column and opened again memory-mapped, and
+`from_frames(..., directory=...)` builds straight into memory-mapped files.
+
+Memory: a bar costs 8 + 4 * 4 + 8 = 32 bytes plus 4 bytes per indicator
+output. 5,000 symbols x 10 years of daily bars (12.6M bars) with the 13
+screener outputs take about 1.06 GB, against about 1.9 GB for the same data
+in float64 DataFrame columns before any intermediate copies.
+`max_bytes` caps what a store may allocate in process memory
+(memory-mapped columns are backed by the page cache and do not count).
+"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from utils.data_cache import FIELDS, load_many
+from utils.indicators import IndicatorEngine, IndicatorSpec
+
+PRICE_FIELDS = ("Open", "High", "Low", "Close")
+DEFAULT_MAX_BYTES = int(os.environ.get("STOCKMATRIX_STORE_MAX_BYTES", 2 * 1024 ** 3))
+# bars per indicator batch; bounds the float64 temporaries of the engine
+CHUNK_BARS = 500_000
+_META = "meta.json"
+
+
+def estimate_bytes(n_bars, n_indicators=0, price_dtype=np.float32, volume_dtype=np.uint64):
+    """Bytes needed for `n_bars` bars in total plus `n_indicators` indicator outputs."""
+    per_bar = 8 + len(PRICE_FIELDS) * np.dtype(price_dtype).itemsize + np.dtype(volume_dtype).itemsize
+    return n_bars * (per_bar + 4 * n_indicators)
+
+
+class BarView:
+    """Zero-copy slices of one symbol's columns."""
+
+    def __init__(self, symbol, columns, indicators):
+        self.symbol = symbol
+        self.columns = columns          # field -> array (including "ts")
+        self.indicators = indicators    # name -> array
+
+    def __len__(self):
+        return len(self.columns["ts"])
+
+    def __getitem__(self, name):
+        return self.columns[name] if name in self.columns else self.indicators[name]
+
+    @property
+    def ts(self):
+        return self.columns["ts"]
+
+    @property
+    def index(self):
+        return pd.DatetimeIndex(self.columns["ts"].view("datetime64[ns]"), name="Date")
+
+    def frame(self, fields=FIELDS, indicators=True):
+        """DataFrame over the same memory (no copy of the columns)."""
+        data = {field: self.columns[field] for field in fields}
+        if indicators:
+            data.update(self.indicators)
+        return pd.DataFrame(data, index=self.index, copy=False)
+
+
+class BarStore:
+    def __init__(self, symbols, offsets, columns, indicators=None, specs=(), directory=None,
+                 max_bytes=DEFAULT_MAX_BYTES):
+        self.symbols = list(symbols)
+        self.offsets = offsets
+        self.columns = columns
+        self.indicators = indicators
+        self.specs = tuple(specs)
+        self.names = [name for s in self.specs for name in s.outputs]
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._pos = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self._name_pos = {name: i for i, name in enumerate(self.names)}
+
+    # --- construction ---
+    @classmethod
+    def from_frames(cls, frames, price_dtype=np.float32, volume_dtype=np.uint64, directory=None,
+                    max_bytes=DEFAULT_MAX_BYTES):
+        """
+        Store built from {symbol: OHLCV DataFrame} (the layout of data_cache).
+        With `directory` the columns are written to memory-mapped .npy files.
+        """
+        symbols = [s for s, df in frames.items() if df is not None and len(df)]
+        lengths = np.array([len(frames[s]) for s in symbols], dtype=np.int64)
+        offsets = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+        total = int(offsets[-1])
+        if directory is None:
+            cls._check_budget(estimate_bytes(total, 0, price_dtype, volume_dtype), max_bytes)
+        else:
+            os.makedirs(directory, exist_ok=True)
+
+        dtypes = {"ts": np.int64, "Volume": volume_dtype, **{f: price_dtype for f in PRICE_FIELDS}}
+        columns = {name: _allocate(directory, name, (total,), dtype) for name, dtype in dtypes.items()}
+        for i, symbol in enumerate(symbols):
+            df = frames[symbol]
+            lo, hi = offsets[i], offsets[i + 1]
+            columns["ts"][lo:hi] = df.index.values.astype("datetime64[ns]").view("i8")
+            for field in PRICE_FIELDS:
+                columns[field][lo:hi] = df[field].to_numpy(dtype=float)
+            volume = np.nan_to_num(df["Volume"].to_numpy(dtype=float))
+            columns["Volume"][lo:hi] = volume if np.dtype(volume_dtype).kind == "f" else np.rint(volume)
+
+        store = cls(symbols, offsets, columns, directory=directory, max_bytes=max_bytes)
+        if directory is not None:
+            np.save(os.path.join(directory, "offsets.npy"), offsets)
+            store._write_meta()
+        return store
+
+    @classmethod
+    def from_cache(cls, tickers, start=None, end=None, interval="1d", period=None, **kwargs):
+        """Store of the cached bars of `tickers` (downloading what is missing)."""
+        return cls.from_frames(load_many(tickers, start=start, end=end, interval=interval, period=period),
+                               **kwargs)
+
+    @staticmethod
+    def _check_budget(nbytes, max_bytes):
+        if max_bytes is not None and nbytes > max_bytes:
+            raise MemoryError(f"Bar store needs {nbytes / 1024 ** 2:,.0f} MiB, budget is "
+                              f"{max_bytes / 1024 ** 2:,.0f} MiB; pass a directory to memory-map it")
+
+    # --- persistence ---
+    def _write_meta(self):
+        meta = {"symbols": self.symbols,
+                "columns": {name: np.dtype(arr.dtype).str for name, arr in self.columns.items()},
+                "specs": [[s.kind, list(s.outputs), [list(p) for p in s.params]] for s in self.specs]}
+        with open(os.path.join(self.directory, _META), "w") as fh:
+            json.dump(meta, fh)
+
+    def save(self, directory):
+        """Write every column as .npy plus meta.json; returns the store opened from there."""
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, "offsets.npy"), self.offsets)
+        for name, arr in self.columns.items():
+            np.save(os.path.join(directory, f"{name}.npy"), arr)
+        if self.indicators is not None:
+            np.save(os.path.join(directory, "indicators.npy"), self.indicators)
+        self.directory = directory
+        self._write_meta()
+        return BarStore.open(directory, max_bytes=self.max_bytes)
+
+    @classmethod
+    def open(cls, directory, mmap=True, max_bytes=DEFAULT_MAX_BYTES):
+        """Store saved in `directory`; columns are memory-mapped read-only unless mmap=False."""
+        with open(os.path.join(directory, _META)) as fh:
+            meta = json.load(fh)
+        mode = "r" if mmap else None
+        columns = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mode)
+                   for name in meta["columns"]}
+        path = os.path.join(directory, "indicators.npy")
+        indicators = np.load(path, mmap_mode=mode) if meta["specs"] and os.path.exists(path) else None
+        specs = [IndicatorSpec(kind, tuple(outputs), tuple(tuple(p) for p in params))
+                 for kind, outputs, params in meta["specs"]] if indicators is not None else ()
+        return cls(meta["symbols"], np.load(os.path.join(directory, "offsets.npy")), columns, indicators,
+                   specs, directory=directory if mmap else None, max_bytes=max_bytes)
+
+    # --- access ---
+    def __len__(self):
+        return len(self.symbols)
+
+    def __contains__(self, symbol):
+        return symbol in self._pos
+
+    @property
+    def n_bars(self):
+        return int(self.offsets[-1])
+
+    @property
+    def nbytes(self):
+        arrays = list(self.columns.values()) + ([self.indicators] if self.indicators is not None else [])
+        return sum(arr.nbytes for arr in arrays) + self.offsets.nbytes
+
+    @property
+    def resident_bytes(self):
+        """Bytes held in process memory (memory-mapped columns excluded)."""
+        arrays = list(self.columns.values()) + ([self.indicators] if self.indicators is not None else [])
+        return sum(arr.nbytes for arr in arrays if not isinstance(arr, np.memmap)) + self.offsets.nbytes
+
+    def _range(self, symbol, start=None, end=None):
+        i = self._pos[symbol]
+        lo, hi = int(self.offsets[i]), int(self.offsets[i + 1])
+        if start is not None or end is not None:
+            ts = self.columns["ts"][lo:hi]
+            if start is not None:
+                lo += int(np.searchsorted(ts, pd.Timestamp(start).value))
+            if end is not None:
+                hi = int(self.offsets[i]) + int(np.searchsorted(ts, pd.Timestamp(end).value, side="right"))
+        return lo, hi
+
+    def bars(self, symbol, start=None, end=None):
+        """BarView of `symbol` with bars in [start, end]."""
+        lo, hi = self._range(symbol, start, end)
+        columns = {name: arr[lo:hi] for name, arr in self.columns.items()}
+        indicators = {name: self.indicators[f, lo:hi] for f, name in enumerate(self.names)} \
+            if self.indicators is not None else {}
+        return BarView(symbol, columns, indicators)
+
+    def frame(self, symbol, start=None, end=None, indicators=True):
+        return self.bars(symbol, start, end).frame(indicators=indicators)
+
+    def indicator(self, symbol, name, start=None, end=None):
+        lo, hi = self._range(symbol, start, end)
+        return self.indicators[self._name_pos[name], lo:hi]
+
+    # --- indicators ---
+    def compute_indicators(self, specs, chunk_bars=CHUNK_BARS):
+        """
+        Run the indicator engine over every symbol into one float32 block
+        aligned with the bar columns. Runs of consecutive symbols with equal
+        length are computed together as (T, k) batches whose output is a
+        strided view of the block, so nothing is scattered afterwards.
+        """
+        engine = IndicatorEngine(specs)
+        total = self.n_bars
+        if self.directory is None:
+            self._check_budget(self.resident_bytes + 4 * len(engine.names) * total, self.max_bytes)
+        block = _allocate(self.directory, "indicators", (len(engine.names), total), np.float32)
+        lengths = np.diff(self.offsets)
+        close, high, low = (self.columns[f] for f in ("Close", "High", "Low"))
+        i = 0
+        while i < len(self.symbols):
+            length = int(lengths[i])
+            j = i + 1
+            while j < len(self.symbols) and lengths[j] == length and (j - i + 1) * length <= chunk_bars:
+                j += 1
+            lo, hi = int(self.offsets[i]), int(self.offsets[j])
+            if length:
+                k = j - i
+                inputs = [arr[lo:hi].reshape(k, length).T for arr in (close, high, low)]
+                out = block[:, lo:hi].reshape(len(engine.names), k, length).transpose(0, 2, 1)
+                engine.run(*inputs, out=out)
+            i = j
+        if isinstance(block, np.memmap):
+            block.flush()
+        self.indicators = block
+        self.specs = tuple(specs)
+        self.names = list(engine.names)
+        self._name_pos = {name: i for i, name in enumerate(self.names)}
+        if self.directory is not None:
+            self._write_meta()
+        return self
+
+
+def _allocate(directory, name, shape, dtype):
+    if directory is None:
+        return np.empty(shape, dtype=dtype)
+    return np.lib.format.open_memmap(os.path.join(directory, f"{name}.npy"), mode="w+", dtype=dtype,
+                                     shape=shape)
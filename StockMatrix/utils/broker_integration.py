@@ -1,13 +1,318 @@
-import ccxt
+"""
+Pooled asynchronous exchange access.
+
+One long-lived ccxt.async_support instance per (exchange, account) lives in
+an ExchangeRegistry together with a background event loop thread. Markets
+are loaded once per instance, quotes for many symbols are fetched
+concurrently (or with a single fetch_tickers call where the exchange has
+one), every request passes a client-side token bucket, and orders are
+submitted without blocking the caller: submit_order returns a
+concurrent.futures.Future.
+
+The bucket runs at the exchange's own limit (ccxt `rateLimit`, milliseconds
+between requests) unless a `rate` is given. It bounds the per-symbol path:
+quoting 50 symbols one request each at 20 requests/s takes about 1.5 s
+whatever the latency, while a single fetch_tickers call is one round trip.
+
+Tests and offline work pass `factory=MockExchange` (or any callable
+(name, config) -> exchange) instead of ccxt; the exchange name "paper" is
+the local utils.paper_exchange simulator.
+
+API keys come from the environment, never from code:
+STOCKMATRIX_<EXCHANGE>_API_KEY, _SECRET and (where the exchange needs it)
+_PASSWORD, e.g. STOCKMATRIX_BINANCE_API_KEY.
+"""
+import asyncio
+import itertools
+import os
+import threading
+import time
+
+CREDENTIAL_FIELDS = {'apiKey': 'API_KEY', 'secret': 'SECRET', 'password': 'PASSWORD'}
+DEFAULT_RATE = 10.0        # requests per second per exchange without a ccxt rateLimit
+DEFAULT_CONCURRENCY = 10   # requests in flight per exchange
+DEFAULT_TIMEOUT = 30.0
+
+
+def credentials_from_env(exchange_name, environ=None):
+    """ccxt credentials of `exchange_name` from STOCKMATRIX_<NAME>_* variables, or None if unset."""
+    environ = os.environ if environ is None else environ
+    prefix = f"STOCKMATRIX_{exchange_name.upper()}_"
+    found = {key: environ[prefix + var] for key, var in CREDENTIAL_FIELDS.items() if environ.get(prefix + var)}
+    return found or None
+
+
+class RateLimiter:
+    """Async token bucket: `rate` requests per second with bursts up to `burst`."""
+
+    def __init__(self, rate=DEFAULT_RATE, burst=None):
+        self.rate = float(rate)
+        self.capacity = float(burst or max(1.0, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = None
+
+    async def acquire(self, cost=1.0):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= cost:
+                    self.tokens -= cost
+                    return
+                await asyncio.sleep((cost - self.tokens) / self.rate)
+
+
+def exchange_rate(exchange):
+    """Requests per second allowed by a ccxt exchange (`rateLimit` is milliseconds per request)."""
+    rate_limit = getattr(exchange, 'rateLimit', None)
+    return 1000.0 / rate_limit if rate_limit else DEFAULT_RATE
+
+
+class ExchangeClient:
+    """
+    Wraps one async exchange instance; all calls are rate limited and markets
+    load once. `rate=None` takes the limit from the exchange (exchange_rate).
+    """
+
+    def __init__(self, name, exchange, rate=None, concurrency=DEFAULT_CONCURRENCY):
+        self.name = name
+        self.exchange = exchange
+        self.limiter = RateLimiter(rate or exchange_rate(exchange))
+        self.concurrency = concurrency
+        self._semaphore = None
+        self._markets_lock = None
+        self.requests = 0
+
+    async def _call(self, method, *args, **kwargs):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        await self.limiter.acquire()
+        async with self._semaphore:
+            self.requests += 1
+            return await getattr(self.exchange, method)(*args, **kwargs)
+
+    async def markets(self):
+        if self._markets_lock is None:
+            self._markets_lock = asyncio.Lock()
+        async with self._markets_lock:
+            if not getattr(self.exchange, 'markets', None):
+                await self._call('load_markets')
+        return self.exchange.markets
+
+    async def fetch_ticker(self, symbol):
+        await self.markets()
+        return await self._call('fetch_ticker', symbol)
+
+    async def fetch_tickers(self, symbols):
+        """{symbol: ticker}; symbols that fail are left out."""
+        await self.markets()
+        symbols = list(symbols)
+        if self.exchange.has.get('fetchTickers') and len(symbols) > 1:
+            try:
+                tickers = await self._call('fetch_tickers', symbols)
+                return {s: tickers[s] for s in symbols if s in tickers}
+            except Exception:
+                pass  # one bad symbol fails the whole batch: ask per symbol instead
+        results = await asyncio.gather(*(self._call('fetch_ticker', s) for s in symbols),
+                                       return_exceptions=True)
+        return {s: r for s, r in zip(symbols, results) if not isinstance(r, Exception)}
+
+    async def create_order(self, symbol, side, amount, price=None, params=None):
+        await self.markets()
+        if price:
+            return await self._call('create_limit_order', symbol, side, amount, price, params or {})
+        return await self._call('create_market_order', symbol, side, amount, None, params or {})
+
+    async def create_orders(self, orders):
+        """Batch of ccxt order dicts ('symbol', 'type', 'side', 'amount', 'price', 'params') in one request."""
+        await self.markets()
+        return await self._call('create_orders', orders)
+
+    async def fetch_order(self, order_id, symbol=None, params=None):
+        return await self._call('fetch_order', order_id, symbol, params or {})
+
+    async def fetch_open_orders(self, symbol=None):
+        return await self._call('fetch_open_orders', symbol)
+
+    async def cancel_order(self, order_id, symbol=None, params=None):
+        return await self._call('cancel_order', order_id, symbol, params or {})
+
+    async def close(self):
+        close = getattr(self.exchange, 'close', None)
+        if close is not None:
+            await close()
+
+
+def _ccxt_factory(name, config):
+    if name == 'paper':
+        from utils.paper_exchange import PaperExchange
+        return PaperExchange(name, config)
+    import ccxt.async_support as ccxt_async
+    return getattr(ccxt_async, name)(config)
+
+
+class ExchangeRegistry:
+    """
+    Process-wide pool of ExchangeClients driven by one background event loop.
+    Blocking helpers (`run`, `quote`) are for scripts and the Streamlit thread;
+    `submit*` return futures immediately. `rate` (requests per second) applies
+    to every exchange; None uses each exchange's own rateLimit.
+    """
+
+    def __init__(self, factory=None, rate=None, concurrency=DEFAULT_CONCURRENCY):
+        self.factory = factory or _ccxt_factory
+        self.rate = rate
+        self.concurrency = concurrency
+        self._clients = {}
+        self._lock = threading.Lock()
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run_loop, name="exchange-loop", daemon=True)
+        self._thread.start()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def client(self, exchange_name, credentials=None):
+        key = (exchange_name, (credentials or {}).get('apiKey'))
+        with self._lock:
+            if key not in self._clients:
+                config = dict(credentials or {})
+                exchange = self.factory(exchange_name, config)
+                self._clients[key] = ExchangeClient(exchange_name, exchange, self.rate, self.concurrency)
+            return self._clients[key]
+
+    def submit(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro, timeout=DEFAULT_TIMEOUT):
+        return self.submit(coro).result(timeout)
+
+    def quote(self, exchange_name, symbols, timeout=DEFAULT_TIMEOUT):
+        """{symbol: last price} for a watchlist, fetched concurrently."""
+        tickers = self.run(self.client(exchange_name).fetch_tickers(symbols), timeout)
+        return {s: t.get('last') for s, t in tickers.items()}
+
+    def submit_order(self, exchange_name, symbol, side, amount, price=None, credentials=None, params=None):
+        client = self.client(exchange_name, credentials or credentials_from_env(exchange_name))
+        return self.submit(client.create_order(symbol, side, amount, price, params))
+
+    def close(self):
+        with self._lock:
+            clients, self._clients = list(self._clients.values()), {}
+        if clients and self.loop.is_running():
+            self.run(_close_all(clients))
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout=5)
+
+
+async def _close_all(clients):
+    await asyncio.gather(*(c.close() for c in clients), return_exceptions=True)
+
+
+class MockExchange:
+    """
+    Local stand-in for a ccxt.async_support exchange: fixed markets, prices
+    that can be set by the test, optional latency, a ccxt-style rateLimit
+    (milliseconds per request) and a log of every call. Unknown symbols raise,
+    in fetch_tickers too, as in ccxt.
+    """
+
+    def __init__(self, name='mock', config=None, prices=None, latency=0.0, has_fetch_tickers=True, rate_limit=50):
+        self.id = name
+        self.rateLimit = rate_limit
+        self.config = dict(config or {})
+        self.prices = dict(prices or {'BTC/USDT': 60000.0, 'ETH/USDT': 3000.0})
+        self.latency = latency
+        self.has = {'fetchTickers': has_fetch_tickers}
+        self.markets = None
+        self.calls = []
+        self.orders = []
+        self._ids = itertools.count(1)
+
+    async def _wait(self, method):
+        self.calls.append(method)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    async def load_markets(self):
+        await self._wait('load_markets')
+        self.markets = {s: {'symbol': s} for s in self.prices}
+        return self.markets
+
+    def _ticker(self, symbol):
+        if symbol not in self.prices:
+            raise KeyError(f"{self.id} does not have market symbol {symbol}")
+        last = self.prices[symbol]
+        return {'symbol': symbol, 'last': last, 'bid': last, 'ask': last, 'timestamp': int(time.time() * 1000)}
+
+    async def fetch_ticker(self, symbol):
+        await self._wait('fetch_ticker')
+        return self._ticker(symbol)
+
+    async def fetch_tickers(self, symbols=None):
+        await self._wait('fetch_tickers')
+        return {s: self._ticker(s) for s in (symbols or self.prices)}
+
+    async def _order(self, symbol, type_, side, amount, price, params):
+        await self._wait(f'create_{type_}_order')
+        fill = price if price is not None else self.prices[symbol]
+        order = {'id': str(next(self._ids)), 'symbol': symbol, 'type': type_, 'side': side,
+                 'amount': amount, 'price': fill, 'filled': amount if type_ == 'market' else 0.0,
+                 'status': 'closed' if type_ == 'market' else 'open', 'info': dict(params or {})}
+        self.orders.append(order)
+        return order
+
+    async def create_limit_order(self, symbol, side, amount, price, params=None):
+        return await self._order(symbol, 'limit', side, amount, price, params)
+
+    async def create_market_order(self, symbol, side, amount, price=None, params=None):
+        return await self._order(symbol, 'market', side, amount, None, params)
+
+    async def close(self):
+        self.calls.append('close')
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = ExchangeRegistry()
+        return _registry
+
+
+def set_registry(registry):
+    """Swap the process-wide registry (e.g. for one built on MockExchange)."""
+    global _registry
+    with _registry_lock:
+        old, _registry = _registry, registry
+    if old is not None and old is not registry:
+        old.close()
+    return registry
+
 
 def fetch_live_price(exchange_name, symbol):
-    exchange_class = getattr(ccxt, exchange_name)()
-    ticker = exchange_class.fetch_ticker(symbol)
+    registry = get_registry()
+    ticker = registry.run(registry.client(exchange_name).fetch_ticker(symbol))
     return ticker['last']
 
+
+def fetch_live_prices(exchange_name, symbols):
+    return get_registry().quote(exchange_name, symbols)
+
+
+def submit_order(exchange_name, symbol, side, amount, price=None):
+    """Non-blocking: returns a Future resolving to the exchange's order dict."""
+    return get_registry().submit_order(exchange_name, symbol, side, amount, price)
+
+
 def place_order(exchange_name, symbol, side, amount, price=None):
-    exchange_class = getattr(ccxt, exchange_name)({'apiKey':'YOUR_KEY','secret':'YOUR_SECRET'})
-    if price:
-        return exchange_class.create_limit_order(symbol, side, amount, price)
-    else:
-        return exchange_class.create_market_order(symbol, side, amount)
+    return submit_order(exchange_name, symbol, side, amount, price).result(DEFAULT_TIMEOUT)
@@ -0,0 +1,223 @@
+# utils/correlation.py
+"""
+Incremental correlation matrices for large universes.
+
+CorrelationTracker keeps the running mean and co-moment matrix of N series,
+so a new bar costs one O(N^2) rank-1 update instead of a pass over the whole
+history. Three windows are supported:
+
+    expanding   (window=None, halflife=None) Welford / Chan updates
+    rolling     (window=W) add the new row, remove the row leaving the window
+    exponential (halflife=H) exponentially weighted mean and covariance
+
+Missing values are imputed with the running mean, i.e. they leave the
+co-moments unchanged. cluster_order and view prepare the matrix for
+rendering: hierarchical clustering order, top-K symbols and block-averaged
+downsampling to a fixed number of cells.
+"""
+import math
+
+import numpy as np
+
+
+class CorrelationTracker:
+    def __init__(self, symbols, window=None, halflife=None):
+        if window is not None and halflife is not None:
+            raise ValueError("window and halflife are mutually exclusive")
+        if window is not None and window < 2:
+            raise ValueError("window must be at least 2")
+        self.symbols = list(symbols)
+        self.window = window
+        self.halflife = halflife
+        self.alpha = 1.0 - math.exp(math.log(0.5) / halflife) if halflife else None
+        n = len(self.symbols)
+        self.count = 0
+        self.mean = np.zeros(n)
+        self.comoment = np.zeros((n, n))
+        self.last_prices = None
+        # rolling window: ring buffer of the (imputed) rows inside the window
+        self._buffer = np.zeros((window, n)) if window else None
+        self._pos = 0
+        self._updates = 0
+
+    def _impute(self, row):
+        row = np.asarray(row, dtype=float)
+        missing = ~np.isfinite(row)
+        if missing.any():
+            row = np.where(missing, self.mean, row)
+        return row
+
+    def update(self, row):
+        """Add one observation (length-N vector). O(N^2)."""
+        x = self._impute(row)
+        if self.alpha is not None:
+            if self.count == 0:
+                self.mean = x.copy()
+            else:
+                dx = x - self.mean
+                self.mean += self.alpha * dx
+                self.comoment = (1.0 - self.alpha) * (self.comoment + self.alpha * np.outer(dx, dx))
+            self.count += 1
+            return
+        if self.window is not None and self.count == self.window:
+            old = self._buffer[self._pos].copy()
+            self._remove(old)
+        self.count += 1
+        dx = x - self.mean
+        self.mean += dx / self.count
+        self.comoment += np.outer(dx, x - self.mean)
+        if self.window is not None:
+            self._buffer[self._pos] = x
+            self._pos = (self._pos + 1) % self.window
+            self._updates += 1
+            # rank-1 downdates accumulate rounding error; resync every few windows
+            if self._updates % (self.window * 8) == 0:
+                self._reset(self._rows())
+
+    def _remove(self, x):
+        n = self.count
+        if n <= 1:
+            self.count = 0
+            self.mean[:] = 0.0
+            self.comoment[:] = 0.0
+            return
+        mean_old = self.mean.copy()
+        self.mean = (n * mean_old - x) / (n - 1)
+        self.comoment -= np.outer(x - self.mean, x - mean_old)
+        self.count = n - 1
+
+    def _rows(self):
+        """Buffered rows in arrival order."""
+        if self.count < self.window:
+            return self._buffer[:self.count].copy()
+        return np.roll(self._buffer, -self._pos, axis=0)
+
+    def _reset(self, X):
+        self.count = len(X)
+        self.mean = X.mean(axis=0) if len(X) else np.zeros(len(self.symbols))
+        dev = X - self.mean
+        self.comoment = dev.T @ dev
+        if self.window is not None:
+            self._buffer[:] = 0.0
+            self._buffer[:len(X)] = X
+            self._pos = len(X) % self.window
+
+    def extend(self, X):
+        """Add many observations ((B, N) array). Expanding and rolling windows merge in one step."""
+        X = np.asarray(X, dtype=float)
+        if not len(X):
+            return
+        if self.alpha is not None:
+            for row in X:
+                self.update(row)
+            return
+        if self.window is not None:
+            if len(X) >= self.window:
+                X = np.where(np.isfinite(X), X, np.nanmean(X, axis=0))
+                self._reset(np.nan_to_num(X[-self.window:]))
+                return
+            for row in X:
+                self.update(row)
+            return
+        # expanding: merge the batch statistics (Chan et al. parallel update)
+        mean_b = np.nanmean(X, axis=0) if self.count == 0 else self.mean
+        X = np.where(np.isfinite(X), X, np.nan_to_num(mean_b))
+        nb = len(X)
+        mb = X.mean(axis=0)
+        dev = X - mb
+        cb = dev.T @ dev
+        na = self.count
+        delta = mb - self.mean
+        total = na + nb
+        self.comoment += cb + np.outer(delta, delta) * (na * nb / total)
+        self.mean += delta * (nb / total)
+        self.count = total
+
+    def update_prices(self, prices):
+        """Feed a row of prices; the tracker correlates their log returns."""
+        prices = np.asarray(prices, dtype=float)
+        if self.last_prices is not None:
+            with np.errstate(divide="ignore", invalid="ignore"):
+                self.update(np.log(prices / self.last_prices))
+        self.last_prices = np.where(np.isfinite(prices), prices, self.last_prices
+                                    if self.last_prices is not None else np.nan)
+
+    def covariance(self):
+        if self.alpha is not None:
+            return self.comoment.copy()
+        return self.comoment / max(self.count - 1, 1)
+
+    def correlation(self):
+        cov = self.covariance()
+        std = np.sqrt(np.clip(np.diag(cov), 0.0, None))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            corr = cov / np.outer(std, std)
+        corr[~np.isfinite(corr)] = np.nan
+        np.clip(corr, -1.0, 1.0, out=corr)
+        np.fill_diagonal(corr, np.where(std > 0, 1.0, np.nan))
+        return corr
+
+
+def cluster_order(corr):
+    """Leaf order of average-linkage clustering on sqrt((1 - corr) / 2)."""
+    n = len(corr)
+    if n < 3:
+        return np.arange(n)
+    c = np.nan_to_num(corr, nan=0.0)
+    dist = np.sqrt(np.clip((1.0 - c) / 2.0, 0.0, None))
+    np.fill_diagonal(dist, 0.0)
+    try:
+        from scipy.cluster.hierarchy import leaves_list, linkage
+        from scipy.spatial.distance import squareform
+    except ImportError:
+        # without scipy: sort along the leading eigenvector
+        _, vecs = np.linalg.eigh(c)
+        return np.argsort(vecs[:, -1])
+    return leaves_list(linkage(squareform(dist, checks=False), method="average"))
+
+
+def top_k(corr, k, focus=None):
+    """
+    Indices of k series: the ones most correlated with index `focus`, or
+    without a focus the ones with the highest mean absolute correlation.
+    """
+    c = np.abs(np.nan_to_num(corr, nan=0.0))
+    score = c[focus] if focus is not None else c.mean(axis=1)
+    order = np.argsort(-score, kind="stable")
+    return np.sort(order[:k])
+
+
+def downsample(corr, labels, max_size):
+    """Block-average an (N, N) matrix to at most max_size x max_size cells."""
+    n = len(corr)
+    if n <= max_size:
+        return corr, list(labels)
+    edges = np.linspace(0, n, max_size + 1).astype(int)
+    starts = edges[:-1]
+    c = np.nan_to_num(corr, nan=0.0)
+    sums = np.add.reduceat(np.add.reduceat(c, starts, axis=0), starts, axis=1)
+    sizes = np.diff(edges)
+    blocks = sums / np.outer(sizes, sizes)
+    names = [labels[a] if b - a == 1 else f"{labels[a]}…{labels[b - 1]}"
+             for a, b in zip(edges[:-1], edges[1:])]
+    return blocks, names
+
+
+def view(tracker_or_corr, symbols=None, max_size=100, k=None, focus=None, cluster=True):
+    """
+    Render-ready (matrix, labels): optional top-K selection, clustering
+    order, then downsampling to max_size cells per axis.
+    """
+    if isinstance(tracker_or_corr, CorrelationTracker):
+        corr, symbols = tracker_or_corr.correlation(), tracker_or_corr.symbols
+    else:
+        corr = np.asarray(tracker_or_corr, dtype=float)
+    symbols = list(symbols)
+    if k is not None and k < len(symbols):
+        pos = symbols.index(focus) if focus in symbols else None
+        keep = top_k(corr, k, pos)
+        corr, symbols = corr[np.ix_(keep, keep)], [symbols[i] for i in keep]
+    if cluster:
+        order = cluster_order(corr)
+        corr, symbols = corr[np.ix_(order, order)], [symbols[i] for i in order]
+    return downsample(corr, symbols, max_size)
@@ -0,0 +1,486 @@
+# utils/data_cache.py
+"""
+Local on-disk OHLCV cache shared by every data fetch path.
+
+Bars are stored per (ticker, interval) as a single structured NumPy file
+(timestamp + OHLCV columns) that is opened memory-mapped, so serving a date
+slice never touches the network. Only the bars after the last cached
+timestamp are downloaded and merged in. The total size on disk is bounded
+and the least recently used entries are evicted first.
+"""
+import json
+import os
+import threading
+import warnings
+from urllib.parse import quote, unquote
+
+import numpy as np
+import pandas as pd
+
+from utils import perf
+
+FIELDS = ("Open", "High", "Low", "Close", "Volume")
+BAR_DTYPE = np.dtype([("ts", "<i8")] + [(f, "<f8") for f in FIELDS])
+
+DEFAULT_CACHE_DIR = os.environ.get(
+    "STOCKMATRIX_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "stockmatrix", "bars"),
+)
+DEFAULT_MAX_BYTES = int(os.environ.get("STOCKMATRIX_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+# After a refresh that reached "now", further top-ups are skipped for this many seconds
+DEFAULT_REFRESH_SECONDS = 300
+
+_PERIOD_OFFSETS = {
+    "1d": pd.DateOffset(days=1),
+    "5d": pd.DateOffset(days=5),
+    "1mo": pd.DateOffset(months=1),
+    "3mo": pd.DateOffset(months=3),
+    "6mo": pd.DateOffset(months=6),
+    "1y": pd.DateOffset(years=1),
+    "2y": pd.DateOffset(years=2),
+    "5y": pd.DateOffset(years=5),
+    "10y": pd.DateOffset(years=10),
+}
+
+
+def is_intraday(interval):
+    return (interval.endswith("m") and not interval.endswith("mo")) or interval.endswith("h")
+
+
+def to_ns(value):
+    """Date-like (str, date, datetime, Timestamp) -> int64 epoch nanoseconds, UTC."""
+    ts = pd.Timestamp(value)
+    if ts.tzinfo is not None:
+        ts = ts.tz_convert("UTC").tz_localize(None)
+    return int(ts.value)
+
+
+def period_to_start(period, now=None):
+    now = pd.Timestamp.now(tz="UTC").tz_localize(None) if now is None else pd.Timestamp(now)
+    if period == "max":
+        return pd.Timestamp("1970-01-02")
+    if period == "ytd":
+        return pd.Timestamp(year=now.year, month=1, day=1)
+    if period not in _PERIOD_OFFSETS:
+        raise ValueError(f"Unsupported period: {period}")
+    return (now - _PERIOD_OFFSETS[period]).normalize()
+
+
+def _find_col(columns, keyword):
+    # exact match first, so "Close" wins over "Adj Close"
+    for col in columns:
+        if str(col).lower() == keyword.lower():
+            return col
+    for col in columns:
+        name = str(col).lower()
+        if keyword.lower() in name and not (keyword == "Close" and "adj" in name):
+            return col
+    for col in columns:
+        if keyword.lower() in str(col).lower():
+            return col
+    return None
+
+
+def normalize_ohlcv(df, ticker=None, interval="1d"):
+    """
+    Bring a provider frame to the cache layout: float columns Open/High/Low/Close/Volume,
+    sorted unique DatetimeIndex. Intraday bars are converted to naive UTC, daily and
+    longer bars keep their calendar date.
+    """
+    if df is None or df.empty:
+        return pd.DataFrame(columns=list(FIELDS), index=pd.DatetimeIndex([]), dtype=float)
+
+    if isinstance(df.columns, pd.MultiIndex):
+        # yfinance >= 0.2.40 returns (Price, Ticker) columns even for a single ticker
+        for level in range(df.columns.nlevels):
+            if ticker is not None and ticker in df.columns.get_level_values(level):
+                df = df.xs(ticker, axis=1, level=level)
+                break
+        else:
+            df = df.copy()
+            df.columns = [' '.join(str(c) for c in col).strip() for col in df.columns.values]
+
+    columns = {}
+    for field in FIELDS:
+        col = _find_col(df.columns, field)
+        if col is None:
+            columns[field] = np.full(len(df), np.nan)
+        elif pd.api.types.is_numeric_dtype(df[col]):
+            columns[field] = df[col].to_numpy(dtype=float)
+        else:
+            columns[field] = pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=float)
+    out = pd.DataFrame(columns, index=pd.to_datetime(df.index))
+
+    idx = out.index
+    if idx.tz is not None:
+        idx = idx.tz_convert("UTC").tz_localize(None) if is_intraday(interval) else idx.tz_localize(None)
+    out.index = idx
+    out = out[~out.index.duplicated(keep="last")].sort_index()
+    out = out.dropna(how="all", subset=["Open", "High", "Low", "Close"])
+    return out
+
+
+class BarProvider:
+    """
+    Source of raw bars for the cache. Subclasses implement `fetch` and return
+    a frame that `normalize_ohlcv` understands; start is inclusive, end exclusive.
+    """
+    name = "base"
+
+    def fetch(self, ticker, interval, start, end):
+        raise NotImplementedError
+
+    def fetch_many(self, tickers, interval, start, end):
+        return {ticker: self.fetch(ticker, interval, start, end) for ticker in tickers}
+
+
+class YFinanceProvider(BarProvider):
+    name = "yfinance"
+
+    def _bounds(self, interval, start, end):
+        if is_intraday(interval):
+            # tz-aware bounds, otherwise yfinance reads naive datetimes in exchange time
+            return pd.Timestamp(start, tz="UTC").to_pydatetime(), pd.Timestamp(end, tz="UTC").to_pydatetime()
+        return pd.Timestamp(start).strftime("%Y-%m-%d"), pd.Timestamp(end).strftime("%Y-%m-%d")
+
+    def fetch(self, ticker, interval, start, end):
+        import yfinance as yf
+        start, end = self._bounds(interval, start, end)
+        return yf.download(ticker, start=start, end=end, interval=interval, progress=False)
+
+    def fetch_many(self, tickers, interval, start, end, chunk_size=200):
+        """One multi-ticker download per `chunk_size` tickers instead of one call per ticker."""
+        import yfinance as yf
+        start, end = self._bounds(interval, start, end)
+        out = {}
+        for i in range(0, len(tickers), chunk_size):
+            chunk = list(tickers[i:i + chunk_size])
+            df = yf.download(chunk, start=start, end=end, interval=interval, group_by="ticker",
+                             threads=True, progress=False)
+            for ticker in chunk:
+                if isinstance(df.columns, pd.MultiIndex) and ticker in df.columns.get_level_values(0):
+                    out[ticker] = df[ticker]
+                else:
+                    out[ticker] = df if len(chunk) == 1 else pd.DataFrame()
+        return out
+
+
+class FrameProvider(BarProvider):
+    """
+    Offline provider serving bars from in-memory frames or from a directory of
+    CSV files named `<ticker>_<interval>.csv` or `<ticker>.csv`. Used as a
+    fixture source instead of yfinance.
+    """
+    name = "frames"
+
+    def __init__(self, frames=None, directory=None):
+        self.frames = dict(frames or {})
+        self.directory = directory
+        self.calls = []
+
+    def _frame(self, ticker, interval):
+        for key in ((ticker, interval), ticker):
+            if key in self.frames:
+                return self.frames[key]
+        if self.directory:
+            for name in (f"{ticker}_{interval}.csv", f"{ticker}.csv"):
+                path = os.path.join(self.directory, name)
+                if os.path.exists(path):
+                    return pd.read_csv(path, index_col=0, parse_dates=True)
+        return None
+
+    def fetch(self, ticker, interval, start, end):
+        self.calls.append((ticker, interval, pd.Timestamp(start), pd.Timestamp(end)))
+        df = self._frame(ticker, interval)
+        if df is None:
+            return pd.DataFrame()
+        df = normalize_ohlcv(df, ticker, interval)
+        return df[(df.index >= pd.Timestamp(start)) & (df.index < pd.Timestamp(end))]
+
+
+def _to_records(df):
+    rec = np.empty(len(df), dtype=BAR_DTYPE)
+    rec["ts"] = df.index.values.astype("datetime64[ns]").view("i8")
+    for field in FIELDS:
+        rec[field] = df[field].to_numpy(dtype=float)
+    return rec
+
+
+def _to_frame(rec, interval):
+    index = pd.DatetimeIndex(pd.to_datetime(np.asarray(rec["ts"]), unit="ns"),
+                             name="Datetime" if is_intraday(interval) else "Date")
+    return pd.DataFrame({field: np.array(rec[field]) for field in FIELDS}, index=index)
+
+
+class BarCache:
+    """
+    Size-bounded on-disk bar cache keyed by (ticker, interval).
+
+    `get` serves any [start, end) slice from disk and asks the provider only
+    for the part that is not covered yet: history before the first cached bar
+    and bars from the last cached timestamp onwards (the last bar is
+    re-downloaded because it may have been incomplete).
+
+    The lock only guards reading and writing the files; downloads run
+    without it, so a slow fetch does not hold up other readers. Writes merge
+    with what is on disk at that moment, so concurrent top-ups of the same
+    ticker do not drop each other's bars.
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, provider=None, max_bytes=DEFAULT_MAX_BYTES,
+                 refresh_seconds=DEFAULT_REFRESH_SECONDS):
+        self.directory = directory
+        self.provider = provider or YFinanceProvider()
+        self.max_bytes = max_bytes
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.RLock()
+        os.makedirs(directory, exist_ok=True)
+
+    # --- storage ---
+    def _paths(self, ticker, interval):
+        base = os.path.join(self.directory, f"{quote(ticker, safe='')}__{interval}")
+        return base + ".npy", base + ".json"
+
+    def _read_meta(self, ticker, interval):
+        _, meta_path = self._paths(ticker, interval)
+        try:
+            with open(meta_path) as fh:
+                return json.load(fh)
+        except (OSError, ValueError):
+            return None
+
+    def _read_records(self, ticker, interval):
+        data_path, meta_path = self._paths(ticker, interval)
+        try:
+            rec = np.load(data_path, mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+        try:
+            os.utime(meta_path)  # access time used for LRU eviction
+        except OSError:
+            pass
+        return rec
+
+    def _write(self, ticker, interval, df, meta):
+        data_path, meta_path = self._paths(ticker, interval)
+        tmp = f"{data_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as fh:
+            np.save(fh, _to_records(df))
+        os.replace(tmp, data_path)
+        meta["rows"] = len(df)
+        meta["nbytes"] = os.path.getsize(data_path)
+        tmp = f"{meta_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w") as fh:
+            json.dump(meta, fh)
+        os.replace(tmp, meta_path)
+
+    def entries(self):
+        """List of (ticker, interval, meta) for everything on disk."""
+        out = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            ticker, _, interval = name[:-5].rpartition("__")
+            meta = self._read_meta(unquote(ticker), interval)
+            if meta is not None:
+                out.append((unquote(ticker), interval, meta))
+        return out
+
+    def size_bytes(self):
+        return sum(meta.get("nbytes", 0) for _, _, meta in self.entries())
+
+    def evict(self, keep=()):
+        """Drop least recently used entries until the cache fits in max_bytes."""
+        with self._lock:
+            entries = []
+            for ticker, interval, meta in self.entries():
+                _, meta_path = self._paths(ticker, interval)
+                try:
+                    atime = os.path.getmtime(meta_path)
+                except OSError:
+                    continue
+                entries.append((atime, ticker, interval, meta.get("nbytes", 0)))
+            total = sum(e[3] for e in entries)
+            for _, ticker, interval, nbytes in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                if (ticker, interval) in keep:
+                    continue
+                self.remove(ticker, interval)
+                total -= nbytes
+
+    def remove(self, ticker, interval):
+        with self._lock:
+            for path in self._paths(ticker, interval):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def clear(self):
+        for ticker, interval, _ in self.entries():
+            self.remove(ticker, interval)
+
+    # --- fetching ---
+    def _missing_ranges(self, meta, rec, start, end, now):
+        if meta is None or rec is None:
+            return [(start, end)]
+        ranges = []
+        if start < meta["covered_start"]:
+            ranges.append((start, meta["covered_start"]))
+        if end > meta["covered_end"]:
+            fresh = (meta["covered_end"] >= meta["refreshed_at"]
+                     and now - meta["refreshed_at"] < self.refresh_seconds * 10**9)
+            if not fresh:
+                last = int(rec["ts"][-1]) if len(rec) else meta["covered_end"]
+                ranges.append((min(last, meta["covered_end"]), end))
+        return ranges
+
+    def _resolve(self, start, end, period):
+        now = to_ns(pd.Timestamp.now(tz="UTC"))
+        if start is None:
+            start = period_to_start(period or "1y")
+        end_ns = min(to_ns(end), now) if end is not None else now
+        return to_ns(start), end_ns, now
+
+    def get(self, ticker, start=None, end=None, interval="1d", period=None):
+        """
+        Bars for `ticker` in [start, end) as a DataFrame with Open/High/Low/Close/Volume.
+        `period` ("6mo", "1y", ...) may be given instead of `start`.
+        """
+        start_ns, end_ns, now = self._resolve(start, end, period)
+        with self._lock:
+            meta = self._read_meta(ticker, interval)
+            rec = self._read_records(ticker, interval)
+        missing = self._missing_ranges(meta, rec, start_ns, end_ns, now)
+        perf.cache("bars", not missing)
+        if missing:
+            try:
+                with perf.span(f"fetch.{self.provider.name}"):
+                    frames = [self.provider.fetch(ticker, interval, pd.Timestamp(lo), pd.Timestamp(hi))
+                              for lo, hi in missing]
+            except Exception as e:
+                if rec is None:
+                    raise
+                warnings.warn(f"Serving cached bars for {ticker} ({interval}): {e}")
+            else:
+                with self._lock:
+                    rec = self._store(ticker, interval, missing, frames, now)
+                self._evict_after_write({(ticker, interval)})
+        return self._slice(rec, start_ns, end_ns, interval)
+
+    def get_many(self, tickers, start=None, end=None, interval="1d", period=None):
+        """
+        Same as `get` for a list of tickers, returned as {ticker: DataFrame}. Missing
+        ranges are grouped so the provider sees one batched `fetch_many` call per
+        group instead of one request per ticker. Tickers whose download fails keep
+        their cached bars (or come back empty).
+        """
+        start_ns, end_ns, now = self._resolve(start, end, period)
+        tickers = list(dict.fromkeys(tickers))
+        state = {}
+        groups = {}
+        with self._lock:
+            for ticker in tickers:
+                state[ticker] = (self._read_meta(ticker, interval), self._read_records(ticker, interval))
+        for ticker in tickers:
+            meta, rec = state[ticker]
+            missing = self._missing_ranges(meta, rec, start_ns, end_ns, now)
+            state[ticker] = (rec, missing)
+            perf.cache("bars", not missing)
+            for lo, hi in missing:
+                # new tickers, tails up to `end` and heads back to `start` are fetched together;
+                # widening a range only re-downloads bars that are merged away
+                kind = "new" if rec is None else ("tail" if hi == end_ns else "head")
+                bounds, names = groups.setdefault(kind, ([lo, hi], []))
+                bounds[0], bounds[1] = min(bounds[0], lo), max(bounds[1], hi)
+                names.append(ticker)
+
+        fetched = {ticker: [] for ticker in tickers}
+        failed = set()
+        for (lo, hi), names in groups.values():
+            try:
+                with perf.span(f"fetch_many.{self.provider.name}"):
+                    frames = self.provider.fetch_many(names, interval, pd.Timestamp(lo), pd.Timestamp(hi))
+            except Exception as e:
+                warnings.warn(f"Batch download of {len(names)} tickers ({interval}) failed: {e}")
+                failed.update(names)
+                continue
+            for ticker in names:
+                fetched[ticker].append(frames.get(ticker))
+
+        written = set()
+        records = {}
+        with self._lock:
+            for ticker in tickers:
+                rec, missing = state[ticker]
+                if missing and ticker not in failed:
+                    rec = self._store(ticker, interval, missing, fetched[ticker], now)
+                    written.add((ticker, interval))
+                records[ticker] = rec
+        if written:
+            self._evict_after_write(written)
+        return {ticker: self._slice(rec, start_ns, end_ns, interval) for ticker, rec in records.items()}
+
+    def _slice(self, rec, start_ns, end_ns, interval):
+        if rec is None or not len(rec):
+            return _to_frame(np.empty(0, dtype=BAR_DTYPE), interval)
+        lo, hi = np.searchsorted(rec["ts"], [start_ns, end_ns])
+        return _to_frame(rec[lo:hi], interval)
+
+    def _store(self, ticker, interval, missing, frames, now):
+        """Merge `frames` into the bars on disk now (another thread may have written since they were read)."""
+        meta = self._read_meta(ticker, interval)
+        rec = self._read_records(ticker, interval)
+        parts = [] if rec is None else [_to_frame(rec, interval)]
+        parts += [normalize_ohlcv(f, ticker, interval) for f in frames]
+        nonempty = [p for p in parts if len(p)]
+        merged = pd.concat(nonempty) if nonempty else normalize_ohlcv(None)
+        merged = merged[~merged.index.duplicated(keep="last")].sort_index()
+        meta = dict(meta or {})
+        meta["covered_start"] = min([lo for lo, _ in missing] + ([meta["covered_start"]] if "covered_start" in meta else []))
+        meta["covered_end"] = max([hi for _, hi in missing] + ([meta["covered_end"]] if "covered_end" in meta else []))
+        meta["refreshed_at"] = now
+        meta["provider"] = self.provider.name
+        self._write(ticker, interval, merged, meta)
+        return self._read_records(ticker, interval)
+
+    def _evict_after_write(self, keep):
+        if self.max_bytes:
+            self.evict(keep=keep)
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_cache():
+    """Process-wide cache used by the tabs and the utils fetch helpers."""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = BarCache()
+        return _default_cache
+
+
+def configure_cache(directory=None, provider=None, max_bytes=None, refresh_seconds=None):
+    """Replace the process-wide cache, e.g. to point it at a FrameProvider in tests."""
+    global _default_cache
+    with _default_lock:
+        _default_cache = BarCache(
+            directory=directory or DEFAULT_CACHE_DIR,
+            provider=provider,
+            max_bytes=DEFAULT_MAX_BYTES if max_bytes is None else max_bytes,
+            refresh_seconds=DEFAULT_REFRESH_SECONDS if refresh_seconds is None else refresh_seconds,
+        )
+        return _default_cache
+
+
+@perf.traced("data.load_bars")
+def load_bars(ticker, start=None, end=None, interval="1d", period=None):
+    return get_cache().get(ticker, start=start, end=end, interval=interval, period=period)
+
+
+@perf.traced("data.load_many")
+def load_many(tickers, start=None, end=None, interval="1d", period=None):
+    return get_cache().get_many(tickers, start=start, end=end, interval=interval, period=period)
@@ -1,21 +1,17 @@
-import yfinance as yf
 import pandas as pd
+from utils.data_cache import load_bars
 
 # Funkcja do pobierania danych akcji
 def get_stock_data(ticker, period="6mo", interval="1d"):
     try:
-        df = yf.download(ticker, period=period, interval=interval, progress=False)
-        df = df.reset_index().set_index("Date")
-        return df
+        return load_bars(ticker, period=period, interval=interval)
     except:
         return pd.DataFrame()
 
 # Funkcja do pobierania danych kryptowalut
 def get_crypto_data(ticker, period="6mo", interval="1d"):
     try:
-        df = yf.download(ticker+"-USD", period=period, interval=interval, progress=False)
-        df = df.reset_index().set_index("Date")
-        return df
+        return load_bars(ticker+"-USD", period=period, interval=interval)
     except:
         return pd.DataFrame()
 
@@ -1,12 +1,61 @@
-import plotly.figure_factory as ff
+import hashlib
+from collections import OrderedDict
+
+import plotly.graph_objects as go
 import numpy as np
 import streamlit as st
+from utils.correlation import CorrelationTracker, view
+from utils.visuals import show_chart
+
+# cells per axis above which the matrix is block-averaged before rendering
+MAX_CELLS = 120
+# matrices up to this size get the values printed in the cells
+ANNOTATE_MAX = 20
+
+# trackers kept for reuse (least recently used are dropped)
+MAX_TRACKERS = 16
+
+# (columns, window, halflife) -> (tracker, digest of the rows fed into it, number of rows)
+_trackers = OrderedDict()
+
+
+def _digest(values):
+    return hashlib.blake2b(np.ascontiguousarray(values).tobytes(), digest_size=16).hexdigest()
+
+
+def correlation_tracker(df, window=None, halflife=None):
+    """
+    Tracker over the columns of `df`, reused across calls: when `df` is the
+    previous input plus new rows at the end (same start, same earlier
+    values), just the new rows are fed in; otherwise it starts over.
+    """
+    key = (tuple(df.columns), window, halflife)
+    values = df.to_numpy(dtype=float)
+    tracker, digest, fed = _trackers.pop(key, (None, None, 0))
+    if tracker is not None and (fed > len(values) or _digest(values[:fed]) != digest):
+        tracker = None
+    if tracker is None:
+        tracker, fed = CorrelationTracker(df.columns, window=window, halflife=halflife), 0
+    tracker.extend(values[fed:])
+    _trackers[key] = (tracker, _digest(values), len(values))
+    while len(_trackers) > MAX_TRACKERS:
+        _trackers.popitem(last=False)
+    return tracker
+
 
-def show_correlation_heatmap(df):
-    corr = df.corr()
-    z = np.array(corr)
-    fig = ff.create_annotated_heatmap(
-        z, x=list(corr.columns), y=list(corr.columns),
-        colorscale='Viridis'
-    )
-    st.plotly_chart(fig, use_container_width=True)
+def show_correlation_heatmap(df, window=None, halflife=None, top_k=None, focus=None, cluster=True,
+                             max_cells=MAX_CELLS):
+    """
+    Correlation of the columns of `df` (rolling `window`, exponential
+    `halflife` or full history), ordered by clustering and reduced to at
+    most `max_cells` cells per axis.
+    """
+    tracker = correlation_tracker(df, window, halflife)
+    z, labels = view(tracker, max_size=max_cells, k=top_k, focus=focus, cluster=cluster)
+    heatmap = go.Heatmap(z=z, x=labels, y=labels, colorscale='Viridis', zmin=-1, zmax=1)
+    if len(labels) <= ANNOTATE_MAX:
+        heatmap.update(text=np.round(z, 2), texttemplate="%{text}")
+    fig = go.Figure(heatmap)
+    fig.update_layout(yaxis=dict(autorange="reversed"), height=max(400, min(900, 12 * len(labels))))
+    show_chart(fig)
+    return tracker
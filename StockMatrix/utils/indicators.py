@@ -1,30 +1,394 @@
-import ta
+"""
+Vectorized indicator engine.
+
+Indicators are declared as a list of specs, e.g.
+
+    INDICATORS = [spec("sma", "SMA20", window=20), spec("rsi", "RSI"),
+                  spec("macd", "MACD", "MACD_signal")]
+
+and computed in one pass over contiguous float64 arrays of shape (T,) for a
+single ticker or (T, N) for N tickers side by side. Intermediates such as
+the true range, cumulative sums and gain/loss EMAs are computed once and
+shared between specs, and every output is written into one preallocated
+block of shape (F, T, N). Results follow the formulas of the `ta` package
+(including its zero warm-up for ATR and ADX).
+
+NaN inside a close series (a missing bar) is handled like `ta` for the
+EWM-based indicators: EMA and MACD keep the last value over the gap and
+weight the next close as pandas' ewm(adjust=False) does, and RSI counts
+the gap bars as zero moves. Each column starts at its first valid value,
+where `ta` would also feed leading NaNs in as zero moves. ATR and ADX
+carry their smoothed value across a gap the same way, while `ta`'s
+recursive loops turn NaN for the rest of the series; SMA, Bollinger
+Bands and the Stochastic are NaN for windows that contain a gap, as in
+`ta`.
+"""
+from collections import namedtuple
+
+import numpy as np
 import pandas as pd
-from ta.trend import SMAIndicator, EMAIndicator, MACD, ADXIndicator
-from ta.momentum import RSIIndicator, StochasticOscillator
-from ta.volatility import BollingerBands, AverageTrueRange
 
+from utils import perf
+
+IndicatorSpec = namedtuple("IndicatorSpec", "kind outputs params")
+
+# kind -> (default params, output names, needs high/low)
+_KINDS = {
+    "sma": ({"window": 20}, ("SMA{window}",), False),
+    "ema": ({"window": 20}, ("EMA{window}",), False),
+    "rsi": ({"window": 14}, ("RSI",), False),
+    "macd": ({"fast": 12, "slow": 26, "signal": 9}, ("MACD", "MACD_signal", "MACD_diff"), False),
+    "bbands": ({"window": 20, "dev": 2}, ("BB_upper", "BB_lower", "BB_mid"), False),
+    "atr": ({"window": 14}, ("ATR",), True),
+    "stoch": ({"window": 14}, ("Stochastic",), True),
+    "adx": ({"window": 14}, ("ADX",), True),
+}
+
+
+def spec(kind, *outputs, **params):
+    """
+    Declare one indicator. `outputs` name the produced columns in the order
+    of the kind's outputs (MACD: macd, signal, diff; bbands: upper, lower, mid);
+    fewer names than outputs means only the first ones are computed.
+    """
+    if kind not in _KINDS:
+        raise ValueError(f"Unknown indicator: {kind}")
+    defaults, default_names, _ = _KINDS[kind]
+    unknown = set(params) - set(defaults)
+    if unknown:
+        raise ValueError(f"Unknown parameters for {kind}: {sorted(unknown)}")
+    merged = dict(defaults, **params)
+    if not outputs:
+        outputs = tuple(name.format(**merged) for name in default_names)
+    if len(outputs) > len(default_names):
+        raise ValueError(f"{kind} has only {len(default_names)} outputs")
+    return IndicatorSpec(kind, tuple(outputs), tuple(sorted(merged.items())))
+
+
+def needs_high_low(specs):
+    return any(_KINDS[s.kind][2] for s in specs)
+
+
+# --- kernels on (T, N) float64 arrays ---
+
+def _ewm(x, alpha, out):
+    """
+    y = (1 - alpha) * y + alpha * x per column, started at the first valid
+    value. A NaN input carries the previous value forward and decays its
+    weight, so after k missing bars y = (w * y + alpha * x) / (w + alpha)
+    with w = (1 - alpha) ** (k + 1), as pandas' ewm(adjust=False).
+    """
+    beta = 1.0 - alpha
+    T, N = x.shape
+    if N == 1:
+        # plain float loop is much faster than per-row numpy calls for a single ticker
+        y = np.nan
+        w = beta
+        res = []
+        append = res.append
+        for v in x[:, 0].tolist():
+            if v == v:
+                y = v if y != y else (w * y + alpha * v) / (w + alpha)
+                w = beta
+            elif y == y:
+                w *= beta
+            append(y)
+        out[:, 0] = res
+        return out
+    prev = np.full(N, np.nan)
+    w = np.full(N, beta)
+    for t in range(T):
+        row = x[t]
+        cur = (w * prev + alpha * row) / (w + alpha)
+        np.copyto(cur, row, where=np.isnan(prev))
+        missing = np.isnan(row)
+        np.copyto(cur, prev, where=missing)
+        w = np.where(missing, w * beta, beta)
+        out[t] = cur
+        prev = cur
+    return out
+
+
+def _padded_cumsum(x):
+    """Cumulative sum with a leading zero row, NaN counted as 0."""
+    cs = np.zeros((x.shape[0] + 1, x.shape[1]))
+    np.cumsum(np.where(np.isnan(x), 0.0, x), axis=0, out=cs[1:])
+    return cs
+
+
+def _first_valid(x):
+    valid = ~np.isnan(x)
+    return np.where(valid.any(axis=0), valid.argmax(axis=0), x.shape[0])
+
+
+def _wilder(x, window, out):
+    """Wilder smoothing seeded with the mean of the first `window` valid values (NaN before)."""
+    T, N = x.shape
+    first = _first_valid(x)
+    seed_at = first + window - 1
+    cs = _padded_cumsum(x)
+    seeded = np.where(np.arange(T)[:, None] > seed_at[None, :], x, np.nan)
+    cols = np.nonzero(seed_at < T)[0]
+    rows = seed_at[cols]
+    seeded[rows, cols] = (cs[rows + 1, cols] - cs[first[cols], cols]) / window
+    return _ewm(seeded, 1.0 / window, out)
+
+
+class _Context:
+    """Inputs plus intermediates shared between the specs of one run."""
+
+    def __init__(self, close, high, low):
+        self.close = close
+        self.high = high
+        self.low = low
+        self.T, self.N = close.shape
+        self._cache = {}
+
+    def get(self, key, build):
+        if key not in self._cache:
+            self._cache[key] = build()
+        return self._cache[key]
+
+    def empty(self):
+        return np.empty((self.T, self.N))
+
+    def valid_count(self, name, x):
+        return self.get(("count", name), lambda: np.cumsum(~np.isnan(x), axis=0))
+
+    def cumsum(self):
+        return self.get(("cumsum", "close"), lambda: _padded_cumsum(self.close))
+
+    def rolling_mean(self, window):
+        def build():
+            out = np.full((self.T, self.N), np.nan)
+            if window > self.T:
+                return out
+            cs = self.cumsum()
+            valid = np.zeros((self.T + 1, self.N))
+            valid[1:] = self.valid_count("close", self.close)
+            full = (valid[window:] - valid[:-window]) == window
+            out[window - 1:] = np.where(full, (cs[window:] - cs[:-window]) / window, np.nan)
+            return out
+        return self.get(("mean", window), build)
+
+    def ema(self, window):
+        """ta-style EMA: span `window`, NaN until `window` valid values were seen."""
+        def build():
+            out = _ewm(self.close, 2.0 / (window + 1), self.empty())
+            out[self.valid_count("close", self.close) < window] = np.nan
+            return out
+        return self.get(("ema", window), build)
+
+    def true_range(self):
+        def build():
+            prev = np.empty_like(self.close)
+            prev[0] = np.nan
+            prev[1:] = self.close[:-1]
+            return np.fmax(self.high - self.low,
+                           np.fmax(np.abs(self.high - prev), np.abs(self.low - prev)))
+        return self.get(("tr",), build)
+
+    def gain_loss(self, window):
+        def build():
+            diff = np.empty_like(self.close)
+            diff[0] = np.nan
+            diff[1:] = self.close[1:] - self.close[:-1]
+            # as in ta, a move into or out of a missing bar counts as zero
+            rows = np.arange(self.T)[:, None] - _first_valid(self.close)[None, :]
+            started = rows >= 0
+            up = np.where(started, np.where(diff > 0, diff, 0.0), np.nan)
+            down = np.where(started, np.where(diff < 0, -diff, 0.0), np.nan)
+            alpha = 1.0 / window
+            up_ema = _ewm(up, alpha, self.empty())
+            down_ema = _ewm(down, alpha, self.empty())
+            warm = rows < window - 1
+            up_ema[warm] = np.nan
+            down_ema[warm] = np.nan
+            return up_ema, down_ema
+        return self.get(("gain_loss", window), build)
+
+    def rolling_extreme(self, x, window, fn):
+        out = np.full((self.T, self.N), np.nan)
+        if window > self.T:
+            return out
+        acc = x[window - 1:].copy()
+        for k in range(1, window):
+            fn(acc, x[window - 1 - k:self.T - k], out=acc)
+        out[window - 1:] = acc
+        return out
+
+
+def _sma(ctx, p, outs):
+    outs[0][:] = ctx.rolling_mean(p["window"])
+
+
+def _ema(ctx, p, outs):
+    outs[0][:] = ctx.ema(p["window"])
+
+
+def _rsi(ctx, p, outs):
+    up, down = ctx.gain_loss(p["window"])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        outs[0][:] = np.where(down == 0, 100.0, 100.0 - 100.0 / (1.0 + up / down))
+
+
+def _macd(ctx, p, outs):
+    macd = ctx.ema(p["fast"]) - ctx.ema(p["slow"])
+    outs[0][:] = macd
+    if len(outs) > 1:
+        signal = _ewm(macd, 2.0 / (p["signal"] + 1), ctx.empty())
+        signal[np.cumsum(~np.isnan(macd), axis=0) < p["signal"]] = np.nan
+        outs[1][:] = signal
+        if len(outs) > 2:
+            outs[2][:] = macd - signal
+
+
+def _bbands(ctx, p, outs):
+    window = p["window"]
+    mid = ctx.rolling_mean(window)
+    std = np.full((ctx.T, ctx.N), np.nan)
+    if window <= ctx.T:
+        x = ctx.close
+        m = mid[window - 1:]
+        acc = np.zeros_like(m)
+        for k in range(window):
+            d = x[window - 1 - k:ctx.T - k] - m
+            acc += d * d
+        std[window - 1:] = np.sqrt(acc / window)
+    outs[0][:] = mid + p["dev"] * std
+    if len(outs) > 1:
+        outs[1][:] = mid - p["dev"] * std
+    if len(outs) > 2:
+        outs[2][:] = mid
+
+
+def _atr(ctx, p, outs):
+    out = _wilder(ctx.true_range(), p["window"], outs[0])
+    np.copyto(out, 0.0, where=np.isnan(out))
+
+
+def _stoch(ctx, p, outs):
+    lowest = ctx.rolling_extreme(ctx.low, p["window"], np.minimum)
+    highest = ctx.rolling_extreme(ctx.high, p["window"], np.maximum)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        outs[0][:] = 100.0 * (ctx.close - lowest) / (highest - lowest)
+
+
+def _adx(ctx, p, outs):
+    window = p["window"]
+    T = ctx.T
+    # directional movement needs the previous bar, so the first bar is dropped as in ta
+    tr = ctx.true_range().copy()
+    first = _first_valid(tr)
+    cols = np.nonzero(first < T)[0]
+    tr[first[cols], cols] = np.nan
+
+    up = np.full_like(tr, np.nan)
+    down = np.full_like(tr, np.nan)
+    up[1:] = ctx.high[1:] - ctx.high[:-1]
+    down[1:] = ctx.low[:-1] - ctx.low[1:]
+    pos = np.where(np.isnan(up), np.nan, np.where((up > down) & (up > 0), up, 0.0))
+    neg = np.where(np.isnan(down), np.nan, np.where((down > up) & (down > 0), down, 0.0))
+
+    tr_s = _wilder(tr, window, ctx.empty())
+    pos_s = _wilder(pos, window, ctx.empty())
+    neg_s = _wilder(neg, window, ctx.empty())
+    with np.errstate(divide="ignore", invalid="ignore"):
+        di_pos = np.where(tr_s != 0, 100.0 * pos_s / tr_s, 0.0)
+        di_neg = np.where(tr_s != 0, 100.0 * neg_s / tr_s, 0.0)
+        di_sum = di_pos + di_neg
+        dx = np.where(di_sum != 0, 100.0 * np.abs(di_pos - di_neg) / di_sum, 0.0)
+    dx[np.isnan(tr_s)] = np.nan
+
+    out = _wilder(dx, window, outs[0])
+    np.copyto(out, 0.0, where=np.isnan(out))
+
+
+_KERNELS = {
+    "sma": _sma,
+    "ema": _ema,
+    "rsi": _rsi,
+    "macd": _macd,
+    "bbands": _bbands,
+    "atr": _atr,
+    "stoch": _stoch,
+    "adx": _adx,
+}
+
+
+def _as_2d(values):
+    if values is None:
+        return None
+    arr = np.asarray(values, dtype=np.float64)
+    if arr.ndim == 1:
+        arr = arr.reshape(-1, 1)
+    return np.ascontiguousarray(arr)
+
+
+class IndicatorEngine:
+    """Computes a fixed list of specs; `names` gives the field order of the output block."""
+
+    def __init__(self, specs):
+        self.specs = tuple(specs)
+        self.names = [name for s in self.specs for name in s.outputs]
+        if len(set(self.names)) != len(self.names):
+            raise ValueError("Duplicate indicator output names")
+        self.needs_high_low = needs_high_low(self.specs)
+
+    def run(self, close, high=None, low=None, out=None):
+        """
+        close/high/low: arrays of shape (T,) or (T, N).
+        Returns the output block of shape (F, T, N), F = len(self.names).
+        `out` may be any writable (F, T, N) array, e.g. a float32 or strided
+        view into a larger block (see utils.bar_store).
+        """
+        close = _as_2d(close)
+        high, low = _as_2d(high), _as_2d(low)
+        if self.needs_high_low and (high is None or low is None):
+            raise ValueError("High and Low are required for ATR, Stochastic and ADX")
+        T, N = close.shape
+        if out is None:
+            out = np.empty((len(self.names), T, N))
+        elif out.shape != (len(self.names), T, N):
+            raise ValueError(f"Output block must have shape {(len(self.names), T, N)}")
+
+        ctx = _Context(close, high, low)
+        i = 0
+        for s in self.specs:
+            n = len(s.outputs)
+            _KERNELS[s.kind](ctx, dict(s.params), [out[i + k] for k in range(n)])
+            i += n
+        return out
+
+
+@perf.traced("indicators.compute_frame")
+def compute_frame(df, specs, close_col, high_col=None, low_col=None):
+    """Adds one column per spec output to `df` (in place) and returns it."""
+    engine = IndicatorEngine(specs)
+    block = engine.run(
+        df[close_col].to_numpy(dtype=float),
+        df[high_col].to_numpy(dtype=float) if high_col else None,
+        df[low_col].to_numpy(dtype=float) if low_col else None,
+    )
+    for i, name in enumerate(engine.names):
+        df[name] = block[i, :, 0]
+    return df
+
+
+@perf.traced("indicators.compute_indicators")
 def compute_indicators(df, close_col, high_col=None, low_col=None, sma_window=20, ema_window=50):
-    # ensure col names exist
-    close = df[close_col]
-    # SMA, EMA
-    df['SMA'] = SMAIndicator(close, sma_window).sma_indicator()
-    df['EMA'] = EMAIndicator(close, ema_window).ema_indicator()
-    # RSI
-    df['RSI'] = RSIIndicator(close, 14).rsi()
-    # MACD
-    macd = MACD(close)
-    df['MACD'] = macd.macd()
-    df['MACD_signal'] = macd.macd_signal()
-    # Bollinger
-    bb = BollingerBands(close)
-    df['BB_upper'] = bb.bollinger_hband()
-    df['BB_lower'] = bb.bollinger_lband()
+    specs = [
+        spec("sma", "SMA", window=sma_window),
+        spec("ema", "EMA", window=ema_window),
+        spec("rsi", "RSI", window=14),
+        spec("macd", "MACD", "MACD_signal"),
+        spec("bbands", "BB_upper", "BB_lower"),
+    ]
     # ATR, Stochastic, ADX if possible
     if high_col and low_col:
-        high = df[high_col]
-        low = df[low_col]
-        df['ATR'] = AverageTrueRange(high, low, close, 14).average_true_range()
-        df['Stochastic'] = StochasticOscillator(high, low, close, 14).stoch()
-        df['ADX'] = ADXIndicator(high, low, close, 14).adx()
-    return df
+        specs += [
+            spec("atr", "ATR", window=14),
+            spec("stoch", "Stochastic", window=14),
+            spec("adx", "ADX", window=14),
+        ]
+    return compute_frame(df, specs, close_col, high_col, low_col)
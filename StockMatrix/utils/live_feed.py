@@ -0,0 +1,412 @@
+# utils/live_feed.py
+"""
+Live tick ingestion into shared-memory ring buffers.
+
+A LiveFeed runs a background event loop that consumes a tick source (an
+exchange trade stream through ccxt.pro, or a ReplaySource for tests and
+offline work) and writes every batch of trades into a fixed-size ring per
+symbol. A ring is one SharedMemory block:
+
+    int64[3] header: committed count, capacity, reserved count
+    int64[capacity] timestamps (epoch ns), float64[capacity] prices, float64[capacity] sizes
+
+Ticks are written with vectorized slice assignment; nothing is allocated
+per tick. Readers (the Streamlit session, or another process) attach to a
+ring by name and take consistent snapshots without locking: the writer
+reserves slots before filling them and commits the count after, and a
+reader drops the slots that may have been overwritten while it copied.
+`bars` turns a snapshot into OHLCV bars on the fly.
+
+CLI (standalone ingestion process the app can attach to):
+    python -m utils.live_feed binance BTC/USDT ETH/USDT
+"""
+import argparse
+import asyncio
+import re
+import sys
+import threading
+import time
+import uuid
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_CAPACITY = 1 << 16
+DEFAULT_PREFIX = "smx_"
+_HEADER = 3
+# rings created by this process; attaching to them must keep the tracker registration
+_owned = set()
+_UNITS = {"s": 1_000_000_000, "m": 60_000_000_000, "h": 3_600_000_000_000, "d": 86_400_000_000_000}
+
+
+def timeframe_ns(timeframe):
+    """'1s', '5m', '1h', ... -> nanoseconds."""
+    match = re.fullmatch(r"(\d+)([smhd])", timeframe)
+    if not match:
+        raise ValueError(f"Unsupported timeframe: {timeframe}")
+    return int(match.group(1)) * _UNITS[match.group(2)]
+
+
+def ring_name(symbol, prefix=DEFAULT_PREFIX, source=""):
+    """
+    Unique shared memory name for one ring: two feeds of the same pair (other
+    exchanges, a CLI process) never share or replace each other's block.
+    Kept under 31 characters for macOS.
+    """
+    source, symbol = (re.sub(r"[^A-Za-z0-9]", "_", text)[:n] for text, n in ((source, 6), (symbol, 10)))
+    return f"{prefix}{source}_{symbol}_{uuid.uuid4().hex[:8]}"
+
+
+def _attach(name):
+    shm = shared_memory.SharedMemory(name=name)
+    if sys.version_info < (3, 13) and name not in _owned:
+        # readers must not let the resource tracker unlink the writer's block at exit
+        from multiprocessing import resource_tracker
+        try:
+            resource_tracker.unregister(shm._name, "shared_memory")
+        except Exception:
+            pass
+    return shm
+
+
+class TickRing:
+    """Fixed-size ring of (ts, price, size) in one shared memory block."""
+
+    def __init__(self, shm, owner=False):
+        self.shm = shm
+        self.owner = owner
+        self.header = np.ndarray((_HEADER,), dtype=np.int64, buffer=shm.buf)
+        cap = int(self.header[1])
+        self.capacity = cap
+        offset = _HEADER * 8
+        self.ts = np.ndarray((cap,), dtype=np.int64, buffer=shm.buf, offset=offset)
+        self.price = np.ndarray((cap,), dtype=np.float64, buffer=shm.buf, offset=offset + 8 * cap)
+        self.size = np.ndarray((cap,), dtype=np.float64, buffer=shm.buf, offset=offset + 16 * cap)
+
+    @classmethod
+    def create(cls, name, capacity=DEFAULT_CAPACITY):
+        # FileExistsError if the name is taken: another process's block is never replaced
+        shm = shared_memory.SharedMemory(name=name, create=True, size=8 * (_HEADER + 3 * capacity))
+        header = np.ndarray((_HEADER,), dtype=np.int64, buffer=shm.buf)
+        header[:] = (0, capacity, 0)
+        del header
+        _owned.add(name)
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name):
+        return cls(_attach(name))
+
+    @property
+    def count(self):
+        """Ticks written since creation (monotonic)."""
+        return int(self.header[0])
+
+    def append(self, ts, price, size=0.0):
+        count = int(self.header[0])
+        self.header[2] = count + 1
+        i = count % self.capacity
+        self.ts[i] = ts
+        self.price[i] = price
+        self.size[i] = size
+        self.header[0] = count + 1
+
+    def append_many(self, ts, price, size):
+        n = len(ts)
+        if not n:
+            return
+        count = int(self.header[0])
+        self.header[2] = count + n
+        if n > self.capacity:
+            skip = n - self.capacity
+            ts, price, size = ts[skip:], price[skip:], size[skip:]
+            count += skip
+            n = self.capacity
+        start = count % self.capacity
+        first = min(n, self.capacity - start)
+        for dst, src in ((self.ts, ts), (self.price, price), (self.size, size)):
+            dst[start:start + first] = src[:first]
+            dst[:n - first] = src[first:]
+        self.header[0] = count + n
+
+    def snapshot(self, n=None):
+        """Copies of the last `n` (default: all retained) ticks in arrival order: (ts, price, size)."""
+        before = self.count
+        ts, price, size = self.ts.copy(), self.price.copy(), self.size.copy()
+        reserved = int(self.header[2])
+        # slots of sequence numbers < reserved - capacity may have been rewritten during the copy
+        lo = max(0, before - self.capacity, reserved - self.capacity)
+        if n is not None:
+            lo = max(lo, before - n)
+        seq = np.arange(lo, before)
+        idx = seq % self.capacity
+        return ts[idx], price[idx], size[idx]
+
+    def last(self):
+        count = self.count
+        if not count:
+            return None
+        i = (count - 1) % self.capacity
+        return int(self.ts[i]), float(self.price[i])
+
+    def close(self):
+        del self.header, self.ts, self.price, self.size
+        self.shm.close()
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+            _owned.discard(self.shm.name)
+
+
+def bars(ts, price, size, timeframe="1m"):
+    """OHLCV bars from tick arrays, stamped with the bucket start (naive UTC)."""
+    if not len(ts):
+        return pd.DataFrame(columns=["Open", "High", "Low", "Close", "Volume"],
+                            index=pd.DatetimeIndex([], name="Datetime"), dtype=float)
+    width = timeframe_ns(timeframe)
+    order = np.argsort(ts, kind="stable")
+    ts, price, size = ts[order], price[order], size[order]
+    bucket = ts - ts % width
+    starts = np.flatnonzero(np.concatenate([[True], bucket[1:] != bucket[:-1]]))
+    ends = np.concatenate([starts[1:], [len(ts)]]) - 1
+    return pd.DataFrame({
+        "Open": price[starts],
+        "High": np.maximum.reduceat(price, starts),
+        "Low": np.minimum.reduceat(price, starts),
+        "Close": price[ends],
+        "Volume": np.add.reduceat(size, starts),
+    }, index=pd.DatetimeIndex(bucket[starts].astype("datetime64[ns]"), name="Datetime"))
+
+
+class TickSource:
+    """Async iterator of (symbol, ts_ns array, price array, size array) batches."""
+    name = "feed"
+    symbols = ()
+
+    def __aiter__(self):
+        return self.batches()
+
+    async def batches(self):
+        raise NotImplementedError
+        yield
+
+    async def close(self):
+        pass
+
+
+class ReplaySource(TickSource):
+    """
+    Replays recorded ticks: a DataFrame with symbol, ts (datetime or epoch ns),
+    price and optional size columns. `speed` > 0 replays in scaled real time
+    (2.0 = twice as fast), None as fast as possible. `batch` ticks per write.
+    """
+
+    name = "replay"
+
+    def __init__(self, ticks, speed=None, batch=256, loop=False):
+        ticks = ticks.sort_values("ts", kind="stable")
+        self.symbols = list(dict.fromkeys(ticks["symbol"]))
+        ts = ticks["ts"]
+        self._ts = ts.to_numpy(dtype=np.int64) if not pd.api.types.is_datetime64_any_dtype(ts) \
+            else ts.values.astype("datetime64[ns]").view("i8")
+        self._price = ticks["price"].to_numpy(dtype=float)
+        self._size = ticks["size"].to_numpy(dtype=float) if "size" in ticks else np.zeros(len(ticks))
+        self._symbol = ticks["symbol"].to_numpy()
+        self.speed = speed
+        self.batch = batch
+        self.loop = loop
+
+    async def batches(self):
+        shift = 0
+        span = int(self._ts[-1] - self._ts[0]) + 1 if len(self._ts) else 0
+        while True:
+            t0 = time.monotonic()
+            for lo in range(0, len(self._ts), self.batch):
+                hi = min(lo + self.batch, len(self._ts))
+                if self.speed:
+                    due = (self._ts[lo] - self._ts[0]) / 1e9 / self.speed
+                    delay = due - (time.monotonic() - t0)
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                else:
+                    await asyncio.sleep(0)
+                sym = self._symbol[lo:hi]
+                for symbol in dict.fromkeys(sym):
+                    mask = sym == symbol
+                    yield symbol, self._ts[lo:hi][mask] + shift, self._price[lo:hi][mask], self._size[lo:hi][mask]
+            if not self.loop or not span:
+                return
+            shift += span
+
+
+class CcxtProSource(TickSource):
+    """Public trade streams of one exchange through ccxt.pro websockets."""
+
+    def __init__(self, exchange_name, symbols, config=None):
+        self.exchange_name = exchange_name
+        self.name = exchange_name
+        self.symbols = list(symbols)
+        self.config = dict(config or {})
+        self.exchange = None
+
+    async def batches(self):
+        import ccxt.pro as ccxtpro
+        from ccxt.base.errors import NetworkError
+        self.exchange = getattr(ccxtpro, self.exchange_name)(self.config)
+        queue = asyncio.Queue(maxsize=1024)
+
+        async def pump(symbol):
+            while True:
+                try:
+                    trades = await self.exchange.watch_trades(symbol)
+                except asyncio.CancelledError:
+                    raise
+                except NetworkError:
+                    await asyncio.sleep(1.0)  # reconnect with a pause
+                    continue
+                except Exception as e:
+                    # BadSymbol, authentication, ...: retrying cannot help, fail the feed
+                    await queue.put(e)
+                    return
+                if trades:
+                    await queue.put((symbol,
+                                     np.fromiter((t["timestamp"] for t in trades), np.int64, len(trades)) * 1_000_000,
+                                     np.fromiter((t["price"] for t in trades), np.float64, len(trades)),
+                                     np.fromiter((t["amount"] or 0.0 for t in trades), np.float64, len(trades))))
+
+        tasks = [asyncio.ensure_future(pump(s)) for s in self.symbols]
+        try:
+            while True:
+                item = await queue.get()
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def close(self):
+        if self.exchange is not None:
+            await self.exchange.close()
+
+
+class LiveFeed:
+    """Background ingestion of one TickSource into per-symbol TickRings."""
+
+    def __init__(self, source, capacity=DEFAULT_CAPACITY, prefix=DEFAULT_PREFIX):
+        self.source = source
+        self.capacity = capacity
+        self.prefix = prefix
+        self.rings = {s: TickRing.create(ring_name(s, prefix, source.name), capacity) for s in source.symbols}
+        self.ticks = 0
+        self.error = None
+        self.failed_at = None                 # time.monotonic() when the source failed
+        self.last_used = time.monotonic()     # touched by readers; resources stops idle feeds
+        self._loop = None
+        self._task = None
+        self._thread = None
+        self._done = threading.Event()
+
+    def directory(self):
+        """{symbol: shared memory name} for readers in other sessions or processes."""
+        return {s: r.shm.name for s, r in self.rings.items()}
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="live-feed", daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._task = self._loop.create_task(self._consume())
+        try:
+            self._loop.run_until_complete(self._task)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self._loop.run_until_complete(self.source.close())
+            self._loop.close()
+            self._done.set()
+
+    async def _consume(self):
+        try:
+            async for symbol, ts, price, size in self.source:
+                ring = self.rings.get(symbol)
+                if ring is None:
+                    ring = self.rings[symbol] = TickRing.create(ring_name(symbol, self.prefix, self.source.name),
+                                                                self.capacity)
+                ring.append_many(ts, price, size)
+                self.ticks += len(ts)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.failed_at = time.monotonic()
+            self.error = e
+
+    def wait(self, timeout=None):
+        """Block until the source is exhausted (replays) or the feed stopped."""
+        return self._done.wait(timeout)
+
+    def stop(self):
+        if self._loop is not None and self._task is not None and not self._done.is_set():
+            self._loop.call_soon_threadsafe(self._task.cancel)
+            self._done.wait(5)
+        for ring in self.rings.values():
+            ring.close()
+        self.rings = {}
+
+    def bars(self, symbol, timeframe="1m", last_ticks=None):
+        return bars(*self.rings[symbol].snapshot(last_ticks), timeframe)
+
+
+class RingReader:
+    """Read-only access to the rings of a feed, by the names from LiveFeed.directory()."""
+
+    def __init__(self, directory):
+        self.rings = {}
+        for symbol, name in directory.items():
+            try:
+                self.rings[symbol] = TickRing.attach(name)
+            except FileNotFoundError:
+                continue
+
+    def last(self, symbol):
+        ring = self.rings.get(symbol)
+        return ring.last() if ring is not None else None
+
+    def bars(self, symbol, timeframe="1m", last_ticks=None):
+        return bars(*self.rings[symbol].snapshot(last_ticks), timeframe)
+
+    def close(self):
+        for ring in self.rings.values():
+            ring.close()
+        self.rings = {}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ingest exchange trade streams into shared-memory rings.")
+    parser.add_argument("exchange", help="ccxt.pro exchange id, e.g. binance")
+    parser.add_argument("symbols", nargs="+", help="e.g. BTC/USDT ETH/USDT")
+    parser.add_argument("--capacity", type=int, default=DEFAULT_CAPACITY)
+    parser.add_argument("--prefix", default=DEFAULT_PREFIX)
+    args = parser.parse_args(argv)
+    feed = LiveFeed(CcxtProSource(args.exchange, args.symbols), args.capacity, args.prefix).start()
+    print("rings:", feed.directory(), file=sys.stderr)
+    try:
+        while not feed.wait(10):
+            last = {s: r.last() for s, r in feed.rings.items()}
+            print(f"{feed.ticks} ticks; last: {last}", file=sys.stderr)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        feed.stop()
+
+
+if __name__ == "__main__":
+    main()
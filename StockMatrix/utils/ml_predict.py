@@ -1,25 +1,290 @@
+"""
+Walk-forward trend forecaster.
+
+Features are lagged log returns plus normalized indicators from the
+utils/indicators engine; the target is the next bar's log return. Models
+are standardized ridge regressions whose coefficients are folded back onto
+the raw features, so a fitted model is just (coef, intercept): inference
+for many symbols is one vectorized row-wise dot product.
+
+Fitted models are cached by (symbol, feature set, training end date) and
+are only refit when a newer bar arrives. predict_trend without a symbol
+keys the cache on a digest of the closes.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
 import numpy as np
-from sklearn.linear_model import LinearRegression
 
-def predict_trend(df, close_col):
+from utils import perf
+from utils.indicators import IndicatorEngine, spec
+
+FEATURE_INDICATORS = [
+    spec("sma", "SMA20", window=20),
+    spec("sma", "SMA50", window=50),
+    spec("rsi", "RSI", window=14),
+    spec("macd", "MACD", "MACD_signal", "MACD_diff"),
+    spec("bbands", "BB_upper", "BB_lower", "BB_mid"),
+    spec("atr", "ATR", window=14),
+    spec("stoch", "Stochastic", window=14),
+    spec("adx", "ADX", window=14),
+]
+FEATURE_SETS = ("lags", "technical")
+DEFAULT_WINDOW = 250
+DEFAULT_REFIT_EVERY = 20
+MIN_TRAIN = 60
+MIN_TREND_BARS = 10    # predict_trend below this returns "Not enough data"
+
+
+def build_features(close, high=None, low=None, feature_set="technical", lags=5):
     """
-    Lightweight trend predictor using linear regression on index -> price.
+    Returns (X, y, names): X[t] uses data up to bar t, y[t] = log(close[t+1] / close[t]).
+    """
+    close = np.asarray(close, dtype=float)
+    logret = np.full(len(close), np.nan)
+    logret[1:] = np.log(close[1:] / close[:-1])
+    y = np.full(len(close), np.nan)
+    y[:-1] = logret[1:]
+
+    cols, names = [], []
+    for k in range(lags):
+        lagged = np.full(len(close), np.nan)
+        lagged[k:] = logret[:len(close) - k]
+        cols.append(lagged)
+        names.append(f"ret_lag{k}")
+
+    if feature_set == "technical":
+        specs = FEATURE_INDICATORS if high is not None and low is not None else FEATURE_INDICATORS[:5]
+        engine = IndicatorEngine(specs)
+        block = engine.run(close, high, low)
+        ind = {name: block[i, :, 0] for i, name in enumerate(engine.names)}
+        with np.errstate(divide="ignore", invalid="ignore"):
+            cols += [close / ind["SMA20"] - 1, close / ind["SMA50"] - 1, ind["RSI"] / 100 - 0.5,
+                     ind["MACD_diff"] / close,
+                     (close - ind["BB_mid"]) / (ind["BB_upper"] - ind["BB_lower"])]
+            names += ["sma20_gap", "sma50_gap", "rsi", "macd_hist", "bb_pos"]
+            if "ATR" in ind:
+                cols += [ind["ATR"] / close, ind["Stochastic"] / 100 - 0.5, ind["ADX"] / 100]
+                names += ["atr_pct", "stoch", "adx"]
+    elif feature_set != "lags":
+        raise ValueError(f"Unknown feature set: {feature_set}")
+
+    X = np.column_stack(cols)
+    X[~np.isfinite(X)] = np.nan
+    return X, y, names
+
+
+def fit_linear(X, y, alpha=1.0):
+    """Standardized ridge fit folded back to raw-feature (coef, intercept)."""
+    from sklearn.linear_model import Ridge  # imported on first fit: sklearn takes over a second to load
+    mu = X.mean(axis=0)
+    sd = X.std(axis=0)
+    sd[sd == 0] = 1.0
+    model = Ridge(alpha=alpha).fit((X - mu) / sd, y)
+    coef = model.coef_ / sd
+    return coef, float(model.intercept_ - mu @ coef)
+
+
+def walk_forward(X, y, window=DEFAULT_WINDOW, refit_every=DEFAULT_REFIT_EVERY, min_train=MIN_TRAIN, alpha=1.0):
+    """
+    Out-of-sample predictions: before bar s the model is fit on the (at most
+    `window`, None = expanding) last rows whose target is already known, then
+    used for bars s .. s + refit_every - 1.
+    """
+    T = len(y)
+    rows_ok = np.isfinite(X).all(axis=1)
+    trainable = rows_ok & np.isfinite(y)
+    preds = np.full(T, np.nan)
+    fits = 0
+    start = int(np.argmax(trainable)) + min_train if trainable.any() else T
+    for s in range(start, T, refit_every):
+        lo = 0 if window is None else max(0, s - window)
+        # y[t] needs close[t + 1], so only rows t < s are known at bar s
+        train = np.nonzero(trainable[lo:s])[0] + lo
+        if len(train) < min_train:
+            continue
+        coef, intercept = fit_linear(X[train], y[train], alpha)
+        fits += 1
+        block = np.arange(s, min(s + refit_every, T))
+        block = block[rows_ok[block]]
+        preds[block] = X[block] @ coef + intercept
+    return preds, fits
+
+
+def evaluate(preds, y):
+    ok = np.isfinite(preds) & np.isfinite(y) & (y != 0)
+    if not ok.any():
+        return {"hit_rate": np.nan, "mae": np.nan, "predictions": 0}
+    return {
+        "hit_rate": float(np.mean(np.sign(preds[ok]) == np.sign(y[ok]))),
+        "mae": float(np.mean(np.abs(preds[ok] - y[ok]))),
+        "predictions": int(ok.sum()),
+    }
+
+
+class ModelCache:
+    """LRU of fitted (coef, intercept) keyed by (symbol, feature set id, training end)."""
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._models = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            model = self._models.get(key)
+            perf.cache("models", model is not None)
+            if model is None:
+                self.misses += 1
+                return None
+            self._models.move_to_end(key)
+            self.hits += 1
+            return model
+
+    def put(self, key, model):
+        with self._lock:
+            self._models[key] = model
+            self._models.move_to_end(key)
+            while len(self._models) > self.maxsize:
+                self._models.popitem(last=False)
+
+
+class Forecaster:
+    def __init__(self, feature_set="technical", lags=5, window=DEFAULT_WINDOW,
+                 refit_every=DEFAULT_REFIT_EVERY, alpha=1.0, cache=None):
+        if feature_set not in FEATURE_SETS:
+            raise ValueError(f"Unknown feature set: {feature_set}")
+        self.feature_set = feature_set
+        self.lags = lags
+        self.window = window
+        self.refit_every = refit_every
+        self.alpha = alpha
+        self.cache = cache if cache is not None else ModelCache()
+        self.latency = None  # seconds per prediction of the last predict/predict_many call
+
+    @property
+    def feature_id(self):
+        return f"{self.feature_set}:lags={self.lags}:window={self.window}:alpha={self.alpha}"
+
+    def _features(self, df, close_col="Close", high_col="High", low_col="Low"):
+        high = df[high_col].to_numpy(dtype=float) if high_col in df else None
+        low = df[low_col].to_numpy(dtype=float) if low_col in df else None
+        return build_features(df[close_col].to_numpy(dtype=float), high, low, self.feature_set, self.lags)
+
+    def model(self, symbol, df, close_col="Close", features=None):
+        """Fitted model for the latest data of `symbol`, from cache unless a new bar arrived."""
+        X, y, names = features or self._features(df, close_col)
+        # the column list is part of the key: frames without High/Low get fewer features
+        key = (symbol, self.feature_id, len(names), str(df.index[-1]))
+        model = self.cache.get(key)
+        if model is None:
+            train = np.nonzero(np.isfinite(X).all(axis=1) & np.isfinite(y))[0]
+            if self.window is not None:
+                train = train[-self.window:]
+            if len(train) < MIN_TRAIN:
+                return None
+            with perf.span("ml.fit"):
+                model = fit_linear(X[train], y[train], self.alpha)
+            self.cache.put(key, model)
+        return model
+
+    def predict(self, symbol, df, close_col="Close"):
+        """Predicted next-bar log return for one symbol (None when there is too little data)."""
+        return self.predict_many({symbol: df}, close_col).get(symbol)
+
+    @perf.traced("ml.predict_many")
+    def predict_many(self, frames, close_col="Close"):
+        """
+        {symbol: predicted next-bar log return}. Features and models come per
+        symbol (models mostly from cache); inference is one vectorized call.
+        """
+        t0 = time.perf_counter()
+        rows, coefs, intercepts, symbols = [], [], [], []
+        for symbol, df in frames.items():
+            if df is None or len(df) < MIN_TRAIN + 2:
+                continue
+            features = self._features(df, close_col)
+            model = self.model(symbol, df, close_col, features)
+            X = features[0]
+            if model is None or not np.isfinite(X[-1]).all():
+                continue
+            rows.append(X[-1])
+            coefs.append(model[0])
+            intercepts.append(model[1])
+            symbols.append(symbol)
+        if not symbols:
+            self.latency = None
+            return {}
+        preds = np.einsum("nk,nk->n", np.vstack(rows), np.vstack(coefs)) + np.asarray(intercepts)
+        self.latency = (time.perf_counter() - t0) / len(symbols)
+        return dict(zip(symbols, preds.tolist()))
+
+    @perf.traced("ml.backtest")
+    def backtest(self, df, close_col="Close"):
+        """Walk-forward evaluation: out-of-sample predictions, hit rate, MAE and timing."""
+        X, y, names = self._features(df, close_col)
+        t0 = time.perf_counter()
+        preds, fits = walk_forward(X, y, self.window, self.refit_every, alpha=self.alpha)
+        elapsed = time.perf_counter() - t0
+        report = evaluate(preds, y)
+        report.update({"fits": fits, "seconds": elapsed, "features": names,
+                       "latency_per_prediction": elapsed / max(report["predictions"], 1)})
+        return preds, y, report
+
+
+_default_forecaster = Forecaster()
+
+
+def get_forecaster():
+    return _default_forecaster
+
+
+def signal_label(last, next_pred):
+    if next_pred > last * 1.001:    # small threshold
+        return "BUY"
+    elif next_pred < last * 0.999:
+        return "SELL"
+    return "HOLD"
+
+
+def _series_key(close_col, values):
+    """Cache key for an unnamed series: a digest of its closes, so two series never share a model."""
+    return f"{close_col}@{hashlib.blake2b(values.tobytes(), digest_size=16).hexdigest()}"
+
+
+def linear_trend(values):
+    """Next value of the least-squares line through `values` (the fallback for short histories)."""
+    slope, intercept = np.polyfit(np.arange(len(values)), values, 1)
+    return float(slope * len(values) + intercept)
+
+
+def predict_trend(df, close_col, symbol=None):
+    """
+    Next-bar price forecast from the cached walk-forward model; series with
+    fewer than MIN_TRAIN + 2 bars (but at least MIN_TREND_BARS) fall back
+    to a linear trend over the bar index.
     Returns (predicted_price, signal_label)
     """
     try:
-        data = df[close_col].dropna().values
-        if len(data) < 10:
+        data = df[[close_col]].dropna()
+        values = data[close_col].to_numpy(dtype=float)
+        if len(values) < MIN_TREND_BARS:
+            return (None, "Not enough data")
+        last = float(values[-1])
+        if len(values) < MIN_TRAIN + 2:
+            next_pred = linear_trend(values)
+            return (round(next_pred, 4), signal_label(last, next_pred))
+        frame = df.loc[data.index]
+        symbol = symbol or _series_key(close_col, values)
+        forecaster = get_forecaster()
+        pred = forecaster.predict(symbol, frame, close_col)
+        if pred is None:
             return (None, "Not enough data")
-        X = np.arange(len(data)).reshape(-1,1)
-        y = data
-        model = LinearRegression().fit(X, y)
-        next_pred = model.predict([[len(data)]])[0]
-        last = data[-1]
-        if next_pred > last * 1.001:    # small threshold
-            return (round(next_pred,4), "BUY")
-        elif next_pred < last * 0.999:
-            return (round(next_pred,4), "SELL")
-        else:
-            return (round(next_pred,4), "HOLD")
+        next_pred = last * float(np.exp(pred))
+        return (round(next_pred, 4), signal_label(last, next_pred))
     except Exception as e:
         return (None, "Error")
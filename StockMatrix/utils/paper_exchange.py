@@ -0,0 +1,318 @@
+# utils/paper_exchange.py
+"""
+Local paper-trading exchange with the ccxt.async_support interface used by
+broker_integration and utils/orders.
+
+Orders fill against historical bars, either taken from the bar cache
+(load_bars) or passed in as {symbol: OHLCV DataFrame}. The exchange clock
+`now` decides which bar is current:
+
+    live-like   (start=None) the clock sits on the latest cached bar, so
+                market orders fill at the last close
+    replay      (start=...)  the clock starts there and `step()` /
+                `advance(ts)` move it forward bar by bar; resting limit
+                orders fill when a new bar trades through their price
+
+Market orders fill at the current close moved against the taker by
+`slippage`; every fill pays `fee` on its notional. Buys need the cash,
+sells may take a position short. `latency` seconds are awaited on every
+call, and `failure_rate` makes order calls raise RequestTimeout after the
+order was accepted (a lost response), which is what client order IDs
+protect against. Error classes carry the ccxt names
+so callers can handle both alike.
+
+    registry = ExchangeRegistry(factory=lambda name, config: PaperExchange(name, config, bars=frames))
+"""
+import asyncio
+import itertools
+import random
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_CASH = 100_000.0
+DEFAULT_FEE = 0.001
+DEFAULT_SLIPPAGE = 0.0005
+
+
+class ExchangeError(Exception):
+    pass
+
+
+class NetworkError(ExchangeError):
+    pass
+
+
+class RequestTimeout(NetworkError):
+    pass
+
+
+class BadSymbol(ExchangeError):
+    pass
+
+
+class InsufficientFunds(ExchangeError):
+    pass
+
+
+class InvalidOrder(ExchangeError):
+    pass
+
+
+class OrderNotFound(InvalidOrder):
+    pass
+
+
+class DuplicateOrderId(InvalidOrder):
+    pass
+
+
+def bar_ticker(symbol):
+    """Cache ticker of an exchange symbol: BTC/USDT -> BTC-USD, AAPL -> AAPL."""
+    base, _, quote = symbol.partition("/")
+    if not quote:
+        return base
+    return f"{base}-{'USD' if quote in ('USDT', 'USD') else quote}"
+
+
+class PaperExchange:
+    def __init__(self, name="paper", config=None, bars=None, period="1y", interval="1d", start=None,
+                 latency=0.0, slippage=DEFAULT_SLIPPAGE, fee=DEFAULT_FEE, cash=DEFAULT_CASH, currency="USD",
+                 failure_rate=0.0, seed=None):
+        config = dict(config or {})
+        self.id = name
+        self.config = config
+        self.period = config.get("period", period)
+        self.interval = config.get("interval", interval)
+        self.latency = float(config.get("latency", latency))
+        self.slippage = float(config.get("slippage", slippage))
+        self.fee = float(config.get("fee", fee))
+        self.failure_rate = float(config.get("failure_rate", failure_rate))
+        self.currency = currency
+        self.cash = float(config.get("cash", cash))
+        self.positions = {}
+        self.has = {"fetchTickers": True, "createOrders": True, "fetchOrder": True, "cancelOrder": True,
+                    "fetchOpenOrders": True}
+        self.markets = None
+        self.now = pd.Timestamp(start) if start is not None else None
+        self.orders = {}            # exchange id -> order dict
+        self.calls = 0
+        self._frames = {}
+        self._arrays = {}
+        self._by_client_id = {}
+        self._ids = itertools.count(1)
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        for symbol, df in (bars or {}).items():
+            self._add_bars(symbol, df)
+
+    # --- bars and clock ---
+    def _add_bars(self, symbol, df):
+        if df is None or df.empty:
+            raise BadSymbol(f"{self.id} has no bars for {symbol}")
+        self._frames[symbol] = df
+        self._arrays[symbol] = (df.index.values.astype("datetime64[ns]"),
+                                *(df[f].to_numpy(dtype=float) for f in ("Open", "High", "Low", "Close")))
+
+    async def _ensure_bars(self, symbol):
+        if symbol not in self._arrays:
+            from utils.data_cache import load_bars
+            df = await asyncio.to_thread(load_bars, bar_ticker(symbol), period=self.period, interval=self.interval)
+            with self._lock:
+                if symbol not in self._arrays:
+                    self._add_bars(symbol, df)
+
+    def _position(self, symbol):
+        """Index of the current bar of `symbol` (the last one at or before the clock), -1 before the first."""
+        ts = self._arrays[symbol][0]
+        if self.now is None:
+            return len(ts) - 1
+        return int(np.searchsorted(ts, np.datetime64(self.now.to_datetime64(), "ns"), side="right")) - 1
+
+    def _bar(self, symbol):
+        i = self._position(symbol)
+        if i < 0:
+            raise InvalidOrder(f"No {symbol} bar at or before {self.now}")
+        return i
+
+    def step(self):
+        """Move the clock to the next bar of any symbol; returns the new time (None at the end)."""
+        with self._lock:
+            if self.now is None:
+                return None
+            nxt = []
+            for symbol, (ts, *_) in self._arrays.items():
+                i = self._position(symbol) + 1
+                if i < len(ts):
+                    nxt.append(ts[i])
+        return self.advance(min(nxt)) if nxt else None
+
+    def advance(self, ts):
+        """Move the clock forward to `ts` and fill resting limit orders against the bars passed."""
+        ts = pd.Timestamp(ts)
+        with self._lock:
+            before = {s: self._position(s) for s in self._arrays}
+            self.now = ts
+            for order in self.orders.values():
+                if order["status"] == "open":
+                    self._match(order, before[order["symbol"]] + 1, self._position(order["symbol"]))
+        return ts
+
+    def _match(self, order, lo, hi):
+        _, o, h, l, _ = self._arrays[order["symbol"]]
+        for i in range(max(lo, 0), hi + 1):
+            if order["side"] == "buy" and l[i] <= order["price"]:
+                self._fill(order, min(order["price"], o[i]), i)
+                return
+            if order["side"] == "sell" and h[i] >= order["price"]:
+                self._fill(order, max(order["price"], o[i]), i)
+                return
+
+    def _fill(self, order, price, bar):
+        amount = order["amount"]
+        cost = amount * price
+        fee = cost * self.fee
+        sign = 1.0 if order["side"] == "buy" else -1.0
+        self.cash -= sign * cost + fee
+        self.positions[order["symbol"]] = self.positions.get(order["symbol"], 0.0) + sign * amount
+        ts = self._arrays[order["symbol"]][0][bar]
+        order.update({"status": "closed", "filled": amount, "remaining": 0.0, "average": price, "cost": cost,
+                      "fee": {"cost": fee, "currency": self.currency},
+                      "lastTradeTimestamp": int(ts.astype("datetime64[ms]").astype(np.int64))})
+
+    # --- ccxt interface ---
+    async def _wait(self):
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    async def load_markets(self, reload=False):
+        await self._wait()
+        self.markets = {s: {"symbol": s, "type": "spot"} for s in self._arrays}
+        return self.markets
+
+    def _ticker(self, symbol):
+        ts, o, h, l, c = self._arrays[symbol]
+        i = self._bar(symbol)
+        return {"symbol": symbol, "last": c[i], "close": c[i], "open": o[i], "high": h[i], "low": l[i],
+                "bid": c[i], "ask": c[i], "timestamp": int(ts[i].astype("datetime64[ms]").astype(np.int64))}
+
+    async def fetch_ticker(self, symbol, params=None):
+        await self._wait()
+        await self._ensure_bars(symbol)
+        with self._lock:
+            return self._ticker(symbol)
+
+    async def fetch_tickers(self, symbols=None, params=None):
+        await self._wait()
+        symbols = list(symbols or self._arrays)
+        await asyncio.gather(*(self._ensure_bars(s) for s in symbols))
+        with self._lock:
+            return {s: self._ticker(s) for s in symbols}
+
+    async def create_order(self, symbol, type, side, amount, price=None, params=None):
+        await self._wait()
+        await self._ensure_bars(symbol)
+        order = self._accept(symbol, type, side, amount, price, params or {})
+        if self.failure_rate and self._random.random() < self.failure_rate:
+            raise RequestTimeout(f"{self.id} create_order timed out")
+        return dict(order)
+
+    def _accept(self, symbol, type_, side, amount, price, params):
+        if side not in ("buy", "sell") or type_ not in ("market", "limit"):
+            raise InvalidOrder(f"Unsupported order {type_} {side}")
+        if not amount or amount <= 0:
+            raise InvalidOrder(f"Invalid amount {amount}")
+        if type_ == "limit" and not price:
+            raise InvalidOrder("Limit order without price")
+        client_id = params.get("clientOrderId")
+        with self._lock:
+            if client_id is not None and client_id in self._by_client_id:
+                raise DuplicateOrderId(f"Duplicate clientOrderId {client_id}")
+            i = self._bar(symbol)
+            close = self._arrays[symbol][4][i]
+            if side == "buy":
+                estimate = amount * (price if type_ == "limit" else close * (1 + self.slippage))
+                if estimate * (1 + self.fee) > self.cash:
+                    raise InsufficientFunds(f"{self.id} needs {estimate:,.2f} {self.currency}, has {self.cash:,.2f}")
+            now = int(time.time() * 1000)
+            order = {"id": str(next(self._ids)), "clientOrderId": client_id, "symbol": symbol, "type": type_,
+                     "side": side, "amount": float(amount), "price": float(price) if price else None,
+                     "average": None, "filled": 0.0, "remaining": float(amount), "cost": 0.0, "fee": None,
+                     "status": "open", "timestamp": now, "lastTradeTimestamp": None}
+            self.orders[order["id"]] = order
+            if client_id is not None:
+                self._by_client_id[client_id] = order["id"]
+            if type_ == "market":
+                sign = 1.0 if side == "buy" else -1.0
+                self._fill(order, close * (1 + sign * self.slippage), i)
+            elif (side == "buy" and close <= price) or (side == "sell" and close >= price):
+                self._fill(order, close, i)    # marketable limit order
+        return order
+
+    async def create_orders(self, orders, params=None):
+        """Batch of {'symbol', 'type', 'side', 'amount', 'price', 'params'}; one request, one order each."""
+        await self._wait()
+        for o in orders:
+            await self._ensure_bars(o["symbol"])
+        out = []
+        for o in orders:
+            try:
+                out.append(dict(self._accept(o["symbol"], o["type"], o["side"], o["amount"], o.get("price"),
+                                             o.get("params") or {})))
+            except ExchangeError as e:
+                out.append({"clientOrderId": (o.get("params") or {}).get("clientOrderId"), "status": "rejected",
+                            "info": {"error": str(e)}})
+        if self.failure_rate and self._random.random() < self.failure_rate:
+            raise RequestTimeout(f"{self.id} create_orders timed out")
+        return out
+
+    async def create_limit_order(self, symbol, side, amount, price, params=None):
+        return await self.create_order(symbol, "limit", side, amount, price, params)
+
+    async def create_market_order(self, symbol, side, amount, price=None, params=None):
+        return await self.create_order(symbol, "market", side, amount, None, params)
+
+    def _find(self, id, params):
+        client_id = (params or {}).get("clientOrderId")
+        if id is None and client_id is not None:
+            id = self._by_client_id.get(client_id)
+        if id not in self.orders:
+            raise OrderNotFound(f"{self.id} has no order {id or client_id}")
+        return self.orders[id]
+
+    async def fetch_order(self, id, symbol=None, params=None):
+        await self._wait()
+        with self._lock:
+            return dict(self._find(id, params))
+
+    async def fetch_open_orders(self, symbol=None, since=None, limit=None, params=None):
+        await self._wait()
+        with self._lock:
+            return [dict(o) for o in self.orders.values()
+                    if o["status"] == "open" and (symbol is None or o["symbol"] == symbol)]
+
+    async def cancel_order(self, id, symbol=None, params=None):
+        await self._wait()
+        with self._lock:
+            order = self._find(id, params)
+            if order["status"] != "open":
+                raise OrderNotFound(f"Order {id} is {order['status']}")
+            order["status"] = "canceled"
+            return dict(order)
+
+    async def fetch_balance(self, params=None):
+        await self._wait()
+        with self._lock:
+            total = {self.currency: self.cash, **self.positions}
+            return {"free": dict(total), "total": total}
+
+    def equity(self):
+        """Cash plus positions at the current closes."""
+        with self._lock:
+            return self.cash + sum(q * self._arrays[s][4][self._bar(s)] for s, q in self.positions.items() if q)
+
+    async def close(self):
+        pass
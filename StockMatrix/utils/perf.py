@@ -0,0 +1,276 @@
+# utils/perf.py
+"""
+Lightweight tracing for the hot paths: call latency histograms, cache
+hit/miss counters and payload sizes.
+
+    @perf.traced("indicators.compute_frame")
+    def compute_frame(...): ...
+
+    with perf.span("fetch.yfinance"):
+        ...
+    perf.cache("figures", hit)
+    perf.observe_size("figure_json", len(payload))
+
+Measurements go to the registry bound to the current context (app.py binds
+one per Streamlit session, kept in st.session_state) and to the
+process-wide `PROCESS` registry. When tracing is disabled
+(STOCKMATRIX_PERF=0 or `enable(False)`) a traced call costs one global
+lookup and `span` returns a shared no-op context manager.
+
+Nothing here imports Streamlit. `to_prometheus` renders a registry in the
+Prometheus text exposition format.
+"""
+import contextvars
+import functools
+import os
+import threading
+from bisect import bisect_left
+from time import perf_counter
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = tuple(1024 * 4 ** i for i in range(10))  # 1 KiB .. 256 MiB
+METRIC_PREFIX = "stockmatrix"
+
+_enabled = os.environ.get("STOCKMATRIX_PERF", "1") not in ("0", "false", "no")
+
+
+class Histogram:
+    """Fixed-bucket histogram (upper bounds in `bounds`, plus +Inf)."""
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        """Estimate by linear interpolation inside the bucket holding the q-th observation."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                lo = self.bounds[i - 1] if i else 0.0
+                hi = self.bounds[i] if i < len(self.bounds) else self.max
+                return min(lo + (hi - lo) * (rank - seen) / n, self.max)
+            seen += n
+        return self.max
+
+    def cumulative(self):
+        total = 0
+        for bound, n in zip(self.bounds + (float("inf"),), self.counts):
+            total += n
+            yield bound, total
+
+
+class Registry:
+    """Latency and size histograms plus counters, keyed by name (and labels for counters)."""
+
+    def __init__(self):
+        self.latency = {}
+        self.sizes = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name, seconds):
+        with self._lock:
+            hist = self.latency.get(name)
+            if hist is None:
+                hist = self.latency[name] = Histogram(LATENCY_BUCKETS)
+            hist.observe(seconds)
+
+    def observe_size(self, name, nbytes):
+        with self._lock:
+            hist = self.sizes.get(name)
+            if hist is None:
+                hist = self.sizes[name] = Histogram(SIZE_BUCKETS)
+            hist.observe(nbytes)
+
+    def count(self, name, n=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + n
+
+    def reset(self):
+        with self._lock:
+            self.latency.clear()
+            self.sizes.clear()
+            self.counters.clear()
+
+    def latency_rows(self):
+        """One dict per traced name, slowest total first (times in milliseconds)."""
+        with self._lock:
+            items = list(self.latency.items())
+        rows = [{"name": name, "calls": h.count, "total_ms": h.sum * 1e3, "mean_ms": h.sum / h.count * 1e3,
+                 "p50_ms": h.quantile(0.5) * 1e3, "p95_ms": h.quantile(0.95) * 1e3, "max_ms": h.max * 1e3}
+                for name, h in items]
+        return sorted(rows, key=lambda r: -r["total_ms"])
+
+    def cache_rows(self):
+        """Hits, misses and hit rate per cache name."""
+        caches = {}
+        with self._lock:
+            for (name, labels), n in self.counters.items():
+                labels = dict(labels)
+                if name == "cache_requests_total":
+                    caches.setdefault(labels["cache"], {"hits": 0, "misses": 0})[
+                        "hits" if labels["result"] == "hit" else "misses"] += n
+        return [{"cache": name, **c, "hit_rate": c["hits"] / (c["hits"] + c["misses"])}
+                for name, c in sorted(caches.items())]
+
+    def size_rows(self):
+        with self._lock:
+            items = list(self.sizes.items())
+        return [{"name": name, "count": h.count, "mean_kb": h.sum / h.count / 1024, "max_kb": h.max / 1024,
+                 "total_mb": h.sum / 1024 ** 2} for name, h in sorted(items)]
+
+
+PROCESS = Registry()
+_current = contextvars.ContextVar("stockmatrix_perf_registry", default=None)
+
+
+def enable(flag=True):
+    global _enabled
+    _enabled = bool(flag)
+
+
+def enabled():
+    return _enabled
+
+
+def bind(registry):
+    """Record measurements of the current context (thread, Streamlit session) into `registry` too."""
+    _current.set(registry)
+    return registry
+
+
+def current():
+    """Registry of the current context, or the process registry when none is bound."""
+    return _current.get() or PROCESS
+
+
+def _targets():
+    session = _current.get()
+    return (PROCESS,) if session is None or session is PROCESS else (PROCESS, session)
+
+
+def observe(name, seconds):
+    if _enabled:
+        for registry in _targets():
+            registry.observe(name, seconds)
+
+
+def observe_size(name, nbytes):
+    if _enabled:
+        for registry in _targets():
+            registry.observe_size(name, nbytes)
+
+
+def count(name, n=1, **labels):
+    if _enabled:
+        for registry in _targets():
+            registry.count(name, n, **labels)
+
+
+def cache(name, hit):
+    """One lookup in cache `name`."""
+    count("cache_requests_total", cache=name, result="hit" if hit else "miss")
+
+
+class _Span:
+    __slots__ = ("name", "t0")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.t0 = perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe(self.name, perf_counter() - self.t0)
+        return False
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name):
+    """Context manager timing its block under `name`."""
+    return _Span(name) if _enabled else _NULL_SPAN
+
+
+def traced(name=None):
+    """Decorator timing every call under `name` (default: module.qualname)."""
+    def decorate(func):
+        label = name or f"{func.__module__}.{func.__qualname__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            t0 = perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                observe(label, perf_counter() - t0)
+        return wrapper
+    return decorate
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels):
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _format_bound(bound):
+    return "+Inf" if bound == float("inf") else repr(float(bound))
+
+
+def _histogram_lines(metric, help_text, hists):
+    lines = [f"# HELP {metric} {help_text}", f"# TYPE {metric} histogram"]
+    for name, hist in sorted(hists.items()):
+        for bound, total in hist.cumulative():
+            lines.append(f"{metric}_bucket{_labels(name=name, le=_format_bound(bound))} {total}")
+        lines.append(f"{metric}_sum{_labels(name=name)} {hist.sum!r}")
+        lines.append(f"{metric}_count{_labels(name=name)} {hist.count}")
+    return lines
+
+
+def to_prometheus(registry=None, prefix=METRIC_PREFIX):
+    """Text exposition of `registry` (default: the process registry)."""
+    registry = registry or PROCESS
+    with registry._lock:
+        latency = dict(registry.latency)
+        sizes = dict(registry.sizes)
+        counters = dict(registry.counters)
+    lines = _histogram_lines(f"{prefix}_call_seconds", "Latency of traced calls.", latency)
+    lines += _histogram_lines(f"{prefix}_payload_bytes", "Size of serialized payloads.", sizes)
+    by_name = {}
+    for (name, labels), n in counters.items():
+        by_name.setdefault(name, []).append((labels, n))
+    for name, samples in sorted(by_name.items()):
+        metric = f"{prefix}_{name}"
+        lines += [f"# TYPE {metric} counter"]
+        lines += [f"{metric}{_labels(**dict(labels)) if labels else ''} {n}" for labels, n in sorted(samples)]
+    return "\n".join(lines) + "\n"
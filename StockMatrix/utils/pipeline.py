@@ -0,0 +1,263 @@
+# utils/pipeline.py
+"""
+Headless analysis pipeline: fetch -> normalize -> indicators -> metrics.
+
+Every stage declares what it produces and how its output depends on its
+input, so results are content addressed: a stage key is the hash of the
+stage name, version, parameters and the key of its input, and the fetch
+stage is keyed by a hash of the bars it returned. When a Streamlit rerun
+(or a batch job) asks for the same ticker and range again, unchanged bars
+give the same keys and the normalized frame, indicators and metrics are
+served from the memo store without recomputation.
+
+Nothing here imports Streamlit.
+
+    from utils.pipeline import run_analysis
+    result = run_analysis("AAPL", period="1y", specs=INDICATORS)
+    result.frame, result.columns.close, result.metrics["last_close"]
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+import pandas as pd
+
+from utils import perf
+from utils.data_cache import load_bars
+from utils.indicators import compute_frame
+
+PriceColumns = namedtuple("PriceColumns", ["open", "high", "low", "close", "volume"])
+Normalized = namedtuple("Normalized", ["frame", "columns"])
+
+MEMO_SIZE = 256
+
+
+def find_price_columns(df):
+    """First column containing Open/High/Low/Close/Volume (case-insensitive); None when absent."""
+    def find_col(keyword):
+        for col in df.columns:
+            if keyword.lower() in str(col).lower():
+                return col
+        return None
+    return PriceColumns(find_col("Open"), find_col("High"), find_col("Low"), find_col("Close"),
+                        find_col("Volume"))
+
+
+def frame_digest(df):
+    """Content hash of a DataFrame (index, columns and values)."""
+    h = hashlib.sha256()
+    h.update(repr(tuple(map(str, df.columns))).encode())
+    if len(df):
+        h.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+def _key(*parts):
+    return hashlib.sha256(repr(parts).encode()).hexdigest()
+
+
+class MemoStore:
+    """LRU of stage outputs keyed by content address."""
+
+    def __init__(self, maxsize=MEMO_SIZE):
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            hit = key in self._items
+            perf.cache("pipeline", hit)
+            if hit:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return True, self._items[key]
+            self.misses += 1
+            return False, None
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+class Stage:
+    """
+    One pipeline step. `run(value)` maps the previous stage's output to this
+    stage's output (`produces` names its type); `params()` are the settings
+    that change the result and `version` is bumped when the code does.
+    """
+    name = "stage"
+    version = 1
+    produces = object
+
+    def params(self):
+        return ()
+
+    def key(self, input_key):
+        return _key(self.name, self.version, self.params(), input_key)
+
+    def run(self, value):
+        raise NotImplementedError
+
+
+class FetchStage(Stage):
+    """Bars for one request from the bar cache. Keyed by the content it returns."""
+    name = "fetch"
+    produces = pd.DataFrame
+
+    def __init__(self, loader=load_bars):
+        self.loader = loader
+
+    def run(self, request):
+        return self.loader(request["ticker"], start=request.get("start"), end=request.get("end"),
+                           interval=request.get("interval", "1d"), period=request.get("period"))
+
+
+class NormalizeStage(Stage):
+    """DatetimeIndex, flat column names, numeric values and located price columns."""
+    name = "normalize"
+    produces = Normalized
+
+    def run(self, df):
+        # shallow: only the index and the non-numeric columns are replaced
+        df = df.copy(deep=False)
+        df.index = pd.to_datetime(df.index)
+        if isinstance(df.columns, pd.MultiIndex):
+            df.columns = [' '.join(col).strip() for col in df.columns.values]
+        for col in df.columns:
+            if not pd.api.types.is_numeric_dtype(df[col]):
+                df[col] = pd.to_numeric(df[col], errors='coerce')
+        return Normalized(df, find_price_columns(df))
+
+
+class IndicatorStage(Stage):
+    """Indicator columns from utils.indicators appended to the normalized frame."""
+    name = "indicators"
+    produces = Normalized
+
+    def __init__(self, specs):
+        self.specs = tuple(specs)
+
+    def params(self):
+        return self.specs
+
+    def run(self, normalized):
+        df, cols = normalized
+        if not self.specs or cols.close is None:
+            return normalized
+        # compute_frame adds columns in place: never into the memoized normalized frame
+        return Normalized(compute_frame(df.copy(deep=False), list(self.specs), cols.close, cols.high, cols.low),
+                          cols)
+
+
+class MetricsStage(Stage):
+    """Latest value of every column plus return statistics of the close."""
+    name = "metrics"
+    produces = dict
+
+    def __init__(self, vol_window=30, periods_per_year=252):
+        self.vol_window = vol_window
+        self.periods_per_year = periods_per_year
+
+    def params(self):
+        return (self.vol_window, self.periods_per_year)
+
+    def run(self, normalized):
+        df, cols = normalized
+        metrics = {"bars": len(df)}
+        if not len(df) or cols.close is None:
+            return metrics
+        last = df.iloc[-1]
+        metrics.update({str(col): float(last[col]) for col in df.columns
+                        if pd.api.types.is_numeric_dtype(df[col])})
+        metrics["last_close"] = float(df[cols.close].iloc[-1])
+        returns = df[cols.close].pct_change().dropna()
+        if len(returns) >= 2:
+            std = returns.std()
+            metrics["volatility_window"] = float(returns[-self.vol_window:].std() * 100)
+            metrics["annual_volatility"] = float(std * np.sqrt(self.periods_per_year) * 100)
+            metrics["sharpe"] = float(returns.mean() / std * np.sqrt(self.periods_per_year)) if std else 0.0
+        return metrics
+
+
+class PipelineResult:
+    def __init__(self, outputs, keys, timings, cached):
+        self.outputs = outputs    # stage name -> output
+        self.keys = keys          # stage name -> content address
+        self.timings = timings    # stage name -> seconds (0 when served from the memo)
+        self.cached = cached      # stage name -> True when reused
+
+    @property
+    def frame(self):
+        last = self.outputs.get("indicators") or self.outputs.get("normalize")
+        return last.frame if last is not None else self.outputs["fetch"]
+
+    @property
+    def columns(self):
+        return self.outputs["normalize"].columns
+
+    @property
+    def metrics(self):
+        return self.outputs.get("metrics", {})
+
+
+class Pipeline:
+    def __init__(self, stages, store=None):
+        self.stages = list(stages)
+        self.store = store if store is not None else _default_store
+
+    def run(self, request):
+        """Run the stages on `request` (a dict for the first stage), reusing memoized outputs."""
+        outputs, keys, timings, cached = {}, {}, {}, {}
+        value = request
+        input_key = None
+        for i, stage in enumerate(self.stages):
+            t0 = time.perf_counter()
+            if i == 0:
+                # the source depends on external state: key it by what it returned
+                value = stage.run(value)
+                key = _key(stage.name, stage.version, frame_digest(value))
+                hit = False
+            else:
+                key = stage.key(input_key)
+                hit, memo = self.store.get(key)
+                if hit:
+                    value = memo
+                else:
+                    value = stage.run(value)
+                    self.store.put(key, value)
+            outputs[stage.name] = value
+            keys[stage.name] = key
+            timings[stage.name] = time.perf_counter() - t0
+            perf.observe(f"pipeline.{stage.name}", timings[stage.name])
+            cached[stage.name] = hit
+            input_key = key
+        return PipelineResult(outputs, keys, timings, cached)
+
+
+_default_store = MemoStore()
+
+
+def analysis_pipeline(specs=(), loader=load_bars, store=None):
+    return Pipeline([FetchStage(loader), NormalizeStage(), IndicatorStage(specs), MetricsStage()], store)
+
+
+def run_analysis(ticker, start=None, end=None, interval="1d", period=None, specs=(), loader=load_bars,
+                 store=None):
+    """
+    fetch -> normalize -> indicators -> metrics for one ticker. `loader` has
+    the signature of data_cache.load_bars (e.g. a resample.load_resampled partial).
+    """
+    request = {"ticker": ticker, "start": start, "end": end, "interval": interval, "period": period}
+    return analysis_pipeline(specs, loader=loader, store=store).run(request)
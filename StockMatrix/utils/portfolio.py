@@ -0,0 +1,195 @@
+# utils/portfolio.py
+"""
+Portfolio analytics for large holdings files.
+
+A holdings CSV (one row per lot: symbol, quantity, optional price/cost) is
+read in chunks and reduced to one row per symbol as it streams, so a book
+with 100k+ lots never sits in memory as a whole. Positions are joined with
+cached daily closes into one aligned returns matrix and every risk number
+comes from risk_metrics.portfolio_risk in matrix form.
+
+Reports are memoized by the SHA-256 of the file content, so uploading the
+same file again (or a Streamlit rerun) does not parse or fetch anything.
+A memoized report lives for one refresh window of the bar cache
+(refresh_seconds), after which the next call picks up new closes.
+"""
+import hashlib
+import io
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from utils.data_cache import get_cache, load_many
+from utils.risk_metrics import portfolio_risk
+
+# accepted header spellings -> canonical column
+COLUMN_ALIASES = {
+    "symbol": "symbol", "ticker": "symbol",
+    "quantity": "quantity", "qty": "quantity", "shares": "quantity", "amount": "quantity",
+    "price": "price", "cost": "price", "cost_basis": "price", "close": "price",
+}
+DEFAULT_CHUNKSIZE = 50_000
+DEFAULT_BENCHMARK = "SPY"
+REPORT_CACHE_SIZE = 32
+
+
+def file_digest(source, block_size=1 << 20):
+    """SHA-256 of a path, bytes or binary file object (whose position is restored)."""
+    h = hashlib.sha256()
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        h.update(source)
+        return h.hexdigest()
+    if isinstance(source, str):
+        with open(source, "rb") as fh:
+            for block in iter(lambda: fh.read(block_size), b""):
+                h.update(block)
+        return h.hexdigest()
+    pos = source.tell()
+    source.seek(0)
+    for block in iter(lambda: source.read(block_size), b""):
+        h.update(block)
+    source.seek(pos)
+    return h.hexdigest()
+
+
+def _canonical(columns):
+    mapping = {}
+    for col in columns:
+        name = COLUMN_ALIASES.get(str(col).strip().lower())
+        if name and name not in mapping.values():
+            mapping[col] = name
+    return mapping
+
+
+def read_holdings(source, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Lots from a CSV path/buffer aggregated per symbol while streaming.
+    Returns a DataFrame indexed by symbol with quantity, cost (sum of
+    quantity * price; NaN unless every lot has a price), avg_price (over
+    the lots that have a price) and lots.
+    """
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    partials = []
+    for chunk in pd.read_csv(source, chunksize=chunksize, skipinitialspace=True):
+        mapping = _canonical(chunk.columns)
+        if "symbol" not in mapping.values() or "quantity" not in mapping.values():
+            raise ValueError("holdings file needs symbol and quantity columns")
+        chunk = chunk[list(mapping)].rename(columns=mapping)
+        chunk["symbol"] = chunk["symbol"].astype(str).str.strip().str.upper()
+        chunk["quantity"] = pd.to_numeric(chunk["quantity"], errors="coerce").fillna(0.0)
+        price = pd.to_numeric(chunk["price"], errors="coerce") if "price" in chunk else np.nan
+        cost = chunk["quantity"] * price
+        chunk = chunk.assign(cost=cost, priced=chunk["quantity"].where(cost.notna(), 0.0),
+                             unpriced=cost.isna().astype(int), lots=1)
+        partials.append(chunk.groupby("symbol")[["quantity", "cost", "priced", "unpriced", "lots"]]
+                        .sum(min_count=1))
+    if not partials:
+        return pd.DataFrame(columns=["quantity", "cost", "avg_price", "lots"], index=pd.Index([], name="symbol"))
+    holdings = pd.concat(partials).groupby(level=0).sum(min_count=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        holdings["avg_price"] = (holdings["cost"] / holdings["priced"]).where(holdings["priced"] != 0)
+    # the cost basis of a symbol is known only when all of its lots have a price
+    holdings["cost"] = holdings["cost"].where(holdings["unpriced"] == 0)
+    holdings["lots"] = holdings["lots"].astype(int)
+    holdings = holdings[["quantity", "cost", "avg_price", "lots"]]
+    return holdings[holdings["quantity"] != 0]
+
+
+def price_matrix(frames, symbols, close_col="Close"):
+    """(T, N) DataFrame of closes for `symbols` aligned on the union of dates."""
+    closes = {s: frames[s][close_col] for s in symbols if s in frames and len(frames[s])}
+    if not closes:
+        return pd.DataFrame(columns=list(symbols), dtype=float)
+    return pd.DataFrame(closes).sort_index().reindex(columns=list(symbols))
+
+
+def returns_matrix(prices):
+    """Simple returns of forward-filled closes; bars before a symbol's first close are 0."""
+    values = prices.ffill().to_numpy(dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        r = values[1:] / values[:-1] - 1.0
+    r[~np.isfinite(r)] = 0.0
+    return pd.DataFrame(r, index=prices.index[1:], columns=prices.columns)
+
+
+class PortfolioReport:
+    def __init__(self, digest, positions, metrics, equity, missing):
+        self.digest = digest
+        self.positions = positions   # per symbol: quantity, price, market_value, weight, ...
+        self.metrics = metrics
+        self.equity = equity         # daily value of the current positions
+        self.missing = missing       # symbols without cached prices
+
+    def summary(self):
+        return {"Total Market Value": float(self.positions["market_value"].sum()),
+                "Holdings Count": len(self.positions), **self.metrics}
+
+
+def analyze(holdings, period="1y", benchmark=DEFAULT_BENCHMARK, confidence=0.95, digest=None):
+    """Join aggregated holdings with cached prices and compute the risk report."""
+    symbols = list(holdings.index)
+    wanted = symbols + ([benchmark] if benchmark and benchmark not in symbols else [])
+    frames = load_many(wanted, period=period)
+    prices = price_matrix(frames, symbols)
+    missing = [s for s in symbols if s not in prices or prices[s].isna().all()]
+
+    last = prices.ffill().iloc[-1] if len(prices) else pd.Series(np.nan, index=symbols)
+    # fall back to the average lot price from the file where no market price is cached
+    positions = holdings.copy()
+    positions["price"] = last.reindex(symbols).fillna(holdings["avg_price"])
+    positions["market_value"] = positions["quantity"] * positions["price"]
+    positions["pnl"] = positions["market_value"] - positions["cost"]
+    # weights cover only symbols with a market price; the returns matrix has no others
+    priced = [s for s in symbols if s not in missing]
+    total = positions.loc[priced, "market_value"].sum()
+    positions["weight"] = np.nan
+    positions.loc[priced, "weight"] = positions.loc[priced, "market_value"] / total if total else 0.0
+    metrics, per_symbol = {}, {}
+    equity = pd.Series(dtype=float, name="value")
+    if priced and len(prices) > 2:
+        returns = returns_matrix(prices[priced])
+        bench = None
+        if benchmark and benchmark in frames and len(frames[benchmark]):
+            bench_close = frames[benchmark]["Close"].reindex(prices.index).ffill()
+            bench = returns_matrix(bench_close.to_frame()).to_numpy()[:, 0]
+        weights = positions.loc[priced, "weight"].to_numpy(dtype=float)
+        metrics, per_symbol = portfolio_risk(returns.to_numpy(), weights, bench, confidence)
+        equity = (prices[priced].ffill().fillna(0.0) * positions.loc[priced, "quantity"]).sum(axis=1)
+        equity.name = "value"
+    for name, values in per_symbol.items():
+        positions.loc[priced, name] = values
+    return PortfolioReport(digest, positions.sort_values("market_value", ascending=False),
+                           metrics, equity, missing)
+
+
+_reports = OrderedDict()
+_reports_lock = threading.Lock()
+
+
+def analyze_file(source, period="1y", benchmark=DEFAULT_BENCHMARK, confidence=0.95,
+                 chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Report for a holdings file (path, bytes or binary buffer). Returns the
+    memoized report when a file with the same content was analyzed with the
+    same settings within the current refresh window of the bar cache.
+    """
+    digest = file_digest(source)
+    cache = get_cache()
+    bucket = int(time.time() // cache.refresh_seconds) if cache.refresh_seconds else time.time()
+    key = (digest, period, benchmark, confidence, id(cache), bucket)
+    with _reports_lock:
+        if key in _reports:
+            _reports.move_to_end(key)
+            return _reports[key]
+    if hasattr(source, "seek"):
+        source.seek(0)
+    report = analyze(read_holdings(source, chunksize), period, benchmark, confidence, digest)
+    with _reports_lock:
+        _reports[key] = report
+        while len(_reports) > REPORT_CACHE_SIZE:
+            _reports.popitem(last=False)
+    return report
@@ -0,0 +1,194 @@
+# utils/resample.py
+"""
+Higher timeframes derived locally from one base series.
+
+Only the finest bars (1h for crypto, 1d for stocks) are fetched and cached;
+1h/4h/1d/1wk/1mo bars are built from them with vectorized OHLCV
+aggregation (first open, max high, min low, last close, summed volume).
+
+Bucket boundaries:
+    1h, 4h   multiples of the period since midnight in `tz` (UTC by default)
+    1d       calendar day in `tz` (pass the exchange zone, e.g.
+             "America/New_York", to group hourly stock bars by session)
+    1wk      weeks starting Monday
+    1mo      calendar months
+Intraday results keep naive-UTC stamps like the bar cache; daily and
+longer results are labeled with the naive date that starts the bucket.
+
+Derived frames are cached per (ticker, base interval, tz) and extended
+incrementally: new base bars only rebuild the last (partial) bucket and
+append the new ones. Buckets cut by the start of the requested range are
+partial as well.
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from utils.data_cache import FIELDS, is_intraday, load_bars, period_to_start
+
+HOUR_NS = 3_600 * 1_000_000_000
+DAY_NS = 24 * HOUR_NS
+MAX_TZ_OFFSET = 15 * HOUR_NS
+TIMEFRAMES = ("1h", "4h", "1d", "1wk", "1mo")
+# yfinance serves hourly bars for about the last two years only
+INTRADAY_HISTORY = pd.Timedelta(days=729)
+SERIES_CACHE_SIZE = 64
+
+
+def _local_ns(ts_ns, tz):
+    """Wall-clock nanoseconds in `tz` for naive-UTC epoch nanoseconds."""
+    if tz is None or tz == "UTC":
+        return ts_ns
+    idx = pd.DatetimeIndex(ts_ns.astype("datetime64[ns]")).tz_localize("UTC").tz_convert(tz)
+    return idx.tz_localize(None).values.astype("datetime64[ns]").view("i8")
+
+
+def bucket_starts(ts_ns, timeframe, tz=None, base_intraday=True):
+    """
+    Bucket label (epoch ns) for every bar. Intraday timeframes return the
+    UTC start of the bucket, daily and longer the local midnight that opens it.
+    """
+    ts_ns = np.asarray(ts_ns, dtype=np.int64)
+    local = _local_ns(ts_ns, tz) if base_intraday else ts_ns
+    if timeframe.endswith("h"):
+        width = int(timeframe[:-1]) * HOUR_NS
+        return ts_ns - (local % width)
+    days = local // DAY_NS
+    if timeframe == "1d":
+        return days * DAY_NS
+    if timeframe == "1wk":
+        # 1970-01-01 was a Thursday: shift so weeks start on Monday
+        return (days - (days + 3) % 7) * DAY_NS
+    if timeframe == "1mo":
+        months = days.astype("datetime64[D]").astype("datetime64[M]")
+        return months.astype("datetime64[D]").astype(np.int64) * DAY_NS
+    raise ValueError(f"Unsupported timeframe: {timeframe}")
+
+
+def aggregate(df, labels):
+    """OHLCV of consecutive runs of equal labels (df sorted by time)."""
+    if not len(df):
+        return df.iloc[:0]
+    labels = np.asarray(labels)
+    starts = np.flatnonzero(np.concatenate([[True], labels[1:] != labels[:-1]]))
+    ends = np.concatenate([starts[1:], [len(labels)]]) - 1
+    out = {
+        "Open": df["Open"].to_numpy(dtype=float)[starts],
+        "High": np.fmax.reduceat(df["High"].to_numpy(dtype=float), starts),
+        "Low": np.fmin.reduceat(df["Low"].to_numpy(dtype=float), starts),
+        "Close": df["Close"].to_numpy(dtype=float)[ends],
+        "Volume": np.add.reduceat(np.nan_to_num(df["Volume"].to_numpy(dtype=float)), starts),
+    }
+    return pd.DataFrame(out, index=pd.DatetimeIndex(labels[starts].astype("datetime64[ns]")),
+                        columns=list(FIELDS))
+
+
+def resample_bars(df, timeframe, tz=None, base_interval="1h"):
+    """Bars of `df` (base_interval) aggregated to `timeframe`."""
+    ts = df.index.values.astype("datetime64[ns]").view("i8")
+    out = aggregate(df, bucket_starts(ts, timeframe, tz, is_intraday(base_interval)))
+    out.index.name = "Datetime" if is_intraday(timeframe) else "Date"
+    return out
+
+
+class MultiTimeframe:
+    """One base series and the timeframes derived from it so far."""
+
+    def __init__(self, base, base_interval, tz=None):
+        self.base = base
+        self.base_interval = base_interval
+        self.tz = tz
+        self.derived = {}
+
+    def get(self, timeframe):
+        if timeframe == self.base_interval:
+            return self.base
+        if timeframe not in self.derived:
+            self.derived[timeframe] = resample_bars(self.base, timeframe, self.tz, self.base_interval)
+        return self.derived[timeframe]
+
+    def extend(self, new_bars):
+        """
+        Append base bars from the last one on; the last base bar is replaced by
+        its new copy (a partial bar the cache downloaded again). Derived frames
+        only redo their tail.
+        """
+        if not len(new_bars):
+            return 0
+        base = self.base
+        if len(base):
+            last = base.index[-1]
+            new_bars = new_bars[new_bars.index >= last]
+            if len(new_bars) and new_bars.index[0] == last:
+                if len(new_bars) == 1 and new_bars.iloc[0].equals(base.iloc[-1]):
+                    return 0
+                base = base.iloc[:-1]
+        if not len(new_bars):
+            return 0
+        self.base = pd.concat([base, new_bars])
+        ts = self.base.index.values.astype("datetime64[ns]").view("i8")
+        intraday = is_intraday(self.base_interval)
+        for timeframe, frame in self.derived.items():
+            if not len(frame):
+                self.derived[timeframe] = resample_bars(self.base, timeframe, self.tz, self.base_interval)
+                continue
+            # the last derived bucket may grow: rebuild from its first base bar.
+            # Local-time buckets start at most MAX_TZ_OFFSET away from their UTC label.
+            last_label = frame.index[-1].value
+            lo = int(np.searchsorted(ts, last_label - MAX_TZ_OFFSET))
+            labels = bucket_starts(ts[lo:], timeframe, self.tz, intraday)
+            first = lo + int(np.searchsorted(labels, last_label))
+            tail = resample_bars(self.base.iloc[first:], timeframe, self.tz, self.base_interval)
+            self.derived[timeframe] = pd.concat([frame.iloc[:-1], tail])
+        return len(new_bars)
+
+
+_series = OrderedDict()
+_series_lock = threading.Lock()
+
+
+def base_interval_for(interval, start, finest="1d"):
+    """Finest interval that can serve `interval` from `start` on."""
+    if is_intraday(interval):
+        return "1h" if interval in ("1h", "4h") else interval
+    if finest != "1d" and is_intraday(finest):
+        if pd.Timestamp(start) >= pd.Timestamp.now() - INTRADAY_HISTORY:
+            return finest
+    return "1d"
+
+
+def load_resampled(ticker, start=None, end=None, interval="1d", period=None, finest="1d", tz=None):
+    """
+    Bars of `ticker` in `interval`, derived from the finest cached bars.
+    Signature-compatible with data_cache.load_bars (plus `finest` and `tz`),
+    so it can be passed to the pipeline as its loader.
+    """
+    if start is None:
+        start = period_to_start(period or "1y")
+    base_interval = base_interval_for(interval, start, finest)
+    base = load_bars(ticker, start=start, end=end, interval=base_interval)
+    if interval == base_interval:
+        return base
+
+    key = (ticker, base_interval, tz)
+    with _series_lock:
+        series = _series.get(key)
+        if series is not None and len(series.base) and len(base) and \
+                series.base.index[0] <= base.index[0] <= series.base.index[-1]:
+            series.extend(base)
+            _series.move_to_end(key)
+        else:
+            series = MultiTimeframe(base, base_interval, tz)
+            _series[key] = series
+            while len(_series) > SERIES_CACHE_SIZE:
+                _series.popitem(last=False)
+        frame = series.get(interval)
+
+    # the cached series may reach further back or ahead than this request
+    if len(base):
+        ts = base.index.values.astype("datetime64[ns]").view("i8")[[0, -1]]
+        first, last = bucket_starts(ts, interval, tz, is_intraday(base_interval))
+        frame = frame[(frame.index >= pd.Timestamp(first)) & (frame.index <= pd.Timestamp(last))]
+    return frame
@@ -0,0 +1,238 @@
+# utils/resources.py
+"""
+Process-wide shared resources and startup timing.
+
+Expensive objects (the bar cache, the exchange registry, order managers
+and their order books, forecasters and their fitted models, live feeds,
+the ticker universe) are created at most once per server process, on first
+use, and then shared by every session:
+
+    forecaster = resources.get("forecaster", "technical", 5, 250, 20)
+    exchanges = resources.get("exchanges")
+
+A resource is identified by its name plus the arguments passed to its
+factory. Factories import their modules when called, so registering them
+costs nothing at startup. `prewarm` creates resources and imports modules
+(tab modules, sklearn, ccxt) in a daemon thread, typically after the
+first page has been sent, so that the first visit to another tab does not
+pay for them. Creation and import times go to utils.perf.
+
+CLI (cold import cost of each module in a fresh interpreter):
+    python -m utils.resources tabs.akcje_tab tabs.ai_tab
+
+Live feeds are taken through `live_feed(exchange, symbol)`, which stops
+feeds nobody read for FEED_IDLE_SECONDS and rebuilds a feed whose stream
+failed once FEED_RETRY_SECONDS have passed (the error stays visible until
+then).
+"""
+import argparse
+import importlib
+import os
+import subprocess
+import sys
+import threading
+import time
+
+from utils import perf
+
+DEFAULT_UNIVERSE = ("AAPL", "MSFT", "NVDA", "AMZN", "GOOGL", "META", "TSLA", "BTC-USD", "ETH-USD")
+FEED_IDLE_SECONDS = 600
+FEED_RETRY_SECONDS = 30
+
+
+class ResourceRegistry:
+    def __init__(self):
+        self._factories = {}
+        self._items = {}
+        self._seconds = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+        self._prewarm_thread = None
+
+    def register(self, name, factory):
+        """`factory(*args)` builds resource `name` for those arguments."""
+        with self._lock:
+            self._factories[name] = factory
+
+    def get(self, name, *args):
+        key = (name,) + args
+        item = self._items.get(key, _MISSING)
+        if item is not _MISSING:
+            return item
+        with self._lock:
+            if name not in self._factories:
+                raise KeyError(f"Unknown resource: {name}")
+            lock = self._locks.setdefault(key, threading.Lock())
+        # per-key lock: a slow factory does not block other resources
+        with lock:
+            item = self._items.get(key, _MISSING)
+            if item is _MISSING:
+                t0 = time.perf_counter()
+                item = self._factories[name](*args)
+                self._seconds[key] = time.perf_counter() - t0
+                perf.observe(f"resource.{name}", self._seconds[key])
+                self._items[key] = item
+        return item
+
+    def created(self, name, *args):
+        return ((name,) + args) in self._items
+
+    def drop(self, name, *args):
+        """Forget a resource so the next `get` builds it again (returns it, or None)."""
+        with self._lock:
+            self._seconds.pop((name,) + args, None)
+            return self._items.pop((name,) + args, None)
+
+    def evict(self, predicate):
+        """Forget every resource for which `predicate(key, item)` holds; returns the evicted items."""
+        with self._lock:
+            keys = [key for key, item in list(self._items.items()) if predicate(key, item)]
+            for key in keys:
+                self._seconds.pop(key, None)
+            return [self._items.pop(key) for key in keys]
+
+    def stats(self):
+        """One row per created resource with the seconds its factory took."""
+        return [{"resource": ":".join(map(str, key)), "seconds": self._seconds.get(key)}
+                for key in list(self._items)]
+
+    def prewarm(self, modules=(), resources=()):
+        """
+        Import `modules` and create `resources` (names, or (name, *args)
+        tuples) in a daemon thread. Only the first call per process starts
+        one; later calls return the same thread.
+        """
+        with self._lock:
+            if self._prewarm_thread is not None:
+                return self._prewarm_thread
+            self._prewarm_thread = threading.Thread(target=self._prewarm, args=(tuple(modules), tuple(resources)),
+                                                    name="resource-prewarm", daemon=True)
+        self._prewarm_thread.start()
+        return self._prewarm_thread
+
+    def _prewarm(self, modules, resources):
+        for module in modules:
+            try:
+                import_module(module)
+            except Exception:
+                pass  # the tab reports the problem when it is opened
+        for resource in resources:
+            name, *args = (resource,) if isinstance(resource, str) else resource
+            try:
+                self.get(name, *args)
+            except Exception:
+                pass
+
+
+_MISSING = object()
+
+
+def import_module(name):
+    """importlib.import_module, timed as import.<name> the first time."""
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    with perf.span(f"import.{name}"):
+        return importlib.import_module(name)
+
+
+def _bar_cache():
+    from utils.data_cache import get_cache
+    return get_cache()
+
+
+def _exchanges():
+    from utils.broker_integration import get_registry
+    return get_registry()
+
+
+def _forecaster(*config):
+    from utils.ml_predict import Forecaster, get_forecaster
+    if not config:
+        return get_forecaster()
+    feature_set, lags, window, refit_every = config
+    return Forecaster(feature_set=feature_set, lags=lags, window=window, refit_every=refit_every)
+
+
+def _order_manager(exchange="paper"):
+    from utils.orders import OrderManager
+    return OrderManager(exchange, _exchanges())
+
+
+def _live_feed(exchange, *symbols):
+    from utils.live_feed import CcxtProSource, LiveFeed
+    return LiveFeed(CcxtProSource(exchange, list(symbols))).start()
+
+
+def _stale_feed(now):
+    def stale(key, feed):
+        if key[0] != "live_feed":
+            return False
+        if feed.error is not None:
+            return now - feed.failed_at >= FEED_RETRY_SECONDS
+        return now - feed.last_used >= FEED_IDLE_SECONDS
+    return stale
+
+
+def live_feed(exchange, symbol):
+    """
+    Shared LiveFeed of `symbol` on `exchange`. Feeds that failed a while ago
+    or went unused are stopped first (their threads and rings released), so
+    a failed pair recovers and typed-in pairs do not pile up.
+    """
+    now = time.monotonic()
+    for feed in registry.evict(_stale_feed(now)):
+        feed.stop()
+    feed = registry.get("live_feed", exchange, symbol)
+    feed.last_used = now
+    return feed
+
+
+def _ticker_universe(path=None):
+    """Tickers from STOCKMATRIX_UNIVERSE (a file for screener.read_universe) or DEFAULT_UNIVERSE."""
+    path = path or os.environ.get("STOCKMATRIX_UNIVERSE")
+    if not path:
+        return DEFAULT_UNIVERSE
+    from utils.screener import read_universe
+    return tuple(read_universe(path))
+
+
+registry = ResourceRegistry()
+registry.register("bar_cache", _bar_cache)
+registry.register("exchanges", _exchanges)
+registry.register("forecaster", _forecaster)
+registry.register("live_feed", _live_feed)
+registry.register("order_manager", _order_manager)
+registry.register("ticker_universe", _ticker_universe)
+
+register = registry.register
+get = registry.get
+prewarm = registry.prewarm
+stats = registry.stats
+
+
+def import_cost(module, python=sys.executable):
+    """Seconds to import `module` in a fresh interpreter (run from this directory)."""
+    code = f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    proc = subprocess.run([python, "-c", code], capture_output=True, text=True, cwd=root)
+    if proc.returncode:
+        raise ImportError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else module)
+    return float(proc.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cold import cost of StockMatrix modules.")
+    parser.add_argument("modules", nargs="*", default=["utils.data_cache", "utils.pipeline", "utils.visuals",
+                                                       "utils.ml_predict", "tabs.akcje_tab", "tabs.krypto_tab",
+                                                       "tabs.ai_tab", "app"])
+    args = parser.parse_args(argv)
+    for module in args.modules:
+        try:
+            print(f"{module:24s} {import_cost(module) * 1e3:8.0f} ms")
+        except ImportError as e:
+            print(f"{module:24s} failed: {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,106 @@
 import numpy as np
 
-def analyze_volatility(df, close_col):
-    res = {}
+from utils import perf
+
+def volatility_stats(df, close_col, window=30, periods_per_year=252):
+    """
+    Numeric historical volatility of the closes: the last `window` bars and
+    annualized stdev of simple returns (fractions), annualized Sharpe ratio and
+    a high-volatility flag. None when there are no returns.
+    """
     returns = df[close_col].pct_change().dropna()
     if returns.empty:
+        return None
+    vol_window = float(returns[-window:].std())
+    sd = float(returns.std())
+    return {
+        "volatility_30d": vol_window,
+        "annual_volatility": sd * np.sqrt(periods_per_year),
+        "sharpe": float(returns.mean() / sd * np.sqrt(periods_per_year)) if sd else 0.0,
+        "high_volatility": bool(vol_window > 0.10),
+    }
+
+@perf.traced("risk.analyze_volatility")
+def analyze_volatility(df, close_col):
+    stats = volatility_stats(df, close_col)
+    if stats is None:
         return {"error":"not enough data"}
-    vol_30d = returns[-30:].std() * 100
-    annual_vol = returns.std() * np.sqrt(252) * 100
-    sharpe = (returns.mean()/returns.std()) * np.sqrt(252) if returns.std() != 0 else 0
-    res["Volatility 30d (%)"] = f"{vol_30d:.2f}%"
-    res["Annualized Volatility (%)"] = f"{annual_vol:.2f}%"
-    res["Sharpe Ratio"] = f"{sharpe:.2f}"
-    res["Volatility Flag"] = "High" if vol_30d > 10 else "Normal"
+    res = {}
+    res["Volatility 30d (%)"] = f"{stats['volatility_30d'] * 100:.2f}%"
+    res["Annualized Volatility (%)"] = f"{stats['annual_volatility'] * 100:.2f}%"
+    res["Sharpe Ratio"] = f"{stats['sharpe']:.2f}"
+    res["Volatility Flag"] = "High" if stats["high_volatility"] else "Normal"
     return res
 
 def portfolio_summary(df):
     # expects columns: symbol, quantity, price (or Close)
-    df = df.copy()
     if "price" in df.columns:
-        df["market_value"] = df["quantity"] * df["price"]
+        market_value = df["quantity"] * df["price"]
     elif "Close" in df.columns and "quantity" in df.columns:
-        df["market_value"] = df["quantity"] * df["Close"]
+        market_value = df["quantity"] * df["Close"]
     else:
         return {"error":"insufficient columns"}
-    total = df["market_value"].sum()
+    total = market_value.sum()
     return {"Total Market Value": total, "Holdings Count": len(df)}
+
+def _drawdown(returns):
+    """Max drawdown of the compounded return series (negative fraction)."""
+    equity = np.cumprod(1.0 + returns)
+    peak = np.maximum.accumulate(np.maximum(equity, 1.0))
+    return float((equity / peak - 1.0).min()) if len(equity) else 0.0
+
+@perf.traced("risk.portfolio_risk")
+def portfolio_risk(returns, weights, benchmark=None, confidence=0.95, periods_per_year=252, risk_free=0.0):
+    """
+    Portfolio metrics from a (T, N) matrix of per-bar simple returns and (N,)
+    weights; `benchmark` is an optional (T,) return series for beta.
+    Returns (metrics, per-symbol dict of arrays).
+    """
+    from statistics import NormalDist
+    R = np.nan_to_num(np.asarray(returns, dtype=float))
+    w = np.asarray(weights, dtype=float)
+    port = R @ w
+    n = len(port)
+    if n < 2:
+        return {"error": "not enough data"}, {}
+    mean = port.mean()
+    std = port.std(ddof=1)
+    cov = np.cov(R, rowvar=False, ddof=1).reshape(len(w), len(w))
+    marginal = cov @ w
+    port_var = float(w @ marginal)
+
+    # historical VaR / CVaR as positive loss fractions per bar
+    var_hist = -np.quantile(port, 1 - confidence)
+    tail = port[port <= -var_hist]
+    cvar_hist = -tail.mean() if len(tail) else var_hist
+    z = NormalDist().inv_cdf(1 - confidence)
+    var_param = -(mean + z * std)
+    cvar_param = -(mean - std * NormalDist().pdf(z) / (1 - confidence))
+
+    metrics = {
+        "total_return": float(np.prod(1.0 + port) - 1.0),
+        "annual_return": float(mean * periods_per_year),
+        "annual_volatility": float(std * np.sqrt(periods_per_year)),
+        "sharpe": float((mean - risk_free / periods_per_year) / std * np.sqrt(periods_per_year)) if std > 0 else 0.0,
+        "var_historical": float(var_hist),
+        "cvar_historical": float(cvar_hist),
+        "var_parametric": float(var_param),
+        "cvar_parametric": float(cvar_param),
+        "max_drawdown": _drawdown(port),
+        "confidence": confidence,
+        "observations": n,
+    }
+    per_symbol = {
+        "volatility": np.sqrt(np.diag(cov) * periods_per_year),
+        # share of portfolio variance carried by each position (sums to 1)
+        "risk_contribution": w * marginal / port_var if port_var > 0 else np.zeros_like(w),
+    }
+    if benchmark is not None:
+        b = np.nan_to_num(np.asarray(benchmark, dtype=float))
+        b_dev = b - b.mean()
+        b_var = b_dev @ b_dev
+        if b_var > 0:
+            betas = (R - R.mean(axis=0)).T @ b_dev / b_var
+            per_symbol["beta"] = betas
+            metrics["beta"] = float(betas @ w)
+    return metrics, per_symbol
@@ -0,0 +1,287 @@
+# utils/screener.py
+"""
+Cross-sectional screener: runs the indicator engine over a whole universe.
+
+Bars for all tickers come from the cache in batched downloads (or are read
+in place from a BarStore, e.g. one memory-mapped from disk), are aligned
+on a common time axis into one (field, time, symbol) block and the
+indicators are computed by worker processes that write straight into a
+shared-memory copy of that block. The result is a Panel plus a ranked table
+of the latest values that can be filtered with expressions such as
+"RSI < 30 and ADX > 25".
+
+CLI:
+    python -m utils.screener universe.txt --filter "RSI < 30 and ADX > 25" --sort RSI
+    python -m utils.screener universe.txt --store data/store --sort RSI
+"""
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from utils.bar_store import BarStore, BarView
+from utils.data_cache import load_many, period_to_start
+from utils.indicators import IndicatorEngine, spec
+
+PRICE_FIELDS = ("Close", "High", "Low", "Volume")
+
+SCREENER_INDICATORS = [
+    spec("sma", "SMA20", window=20),
+    spec("sma", "SMA50", window=50),
+    spec("sma", "SMA200", window=200),
+    spec("ema", "EMA20", window=20),
+    spec("ema", "EMA50", window=50),
+    spec("rsi", "RSI", window=14),
+    spec("macd", "MACD", "MACD_signal"),
+    spec("bbands", "BB_upper", "BB_lower"),
+    spec("atr", "ATR", window=14),
+    spec("stoch", "Stochastic", window=14),
+    spec("adx", "ADX", window=14),
+]
+
+# below this many symbols the process pool costs more than it saves
+MIN_SYMBOLS_PER_WORKER = 32
+
+
+class Panel:
+    """
+    Field x time x symbol block of float64 values.
+
+    `values[f, t, n]` is contiguous per field, so `field("RSI")` is a (T, N)
+    view; `as_array()` gives the symbol x time x field view of the same memory.
+    """
+
+    def __init__(self, values, fields, symbols, index):
+        self.values = values
+        self.fields = list(fields)
+        self.symbols = list(symbols)
+        self.index = index
+        self._field_pos = {name: i for i, name in enumerate(self.fields)}
+        self._symbol_pos = {name: i for i, name in enumerate(self.symbols)}
+
+    @property
+    def shape(self):
+        return len(self.symbols), len(self.index), len(self.fields)
+
+    @property
+    def nbytes(self):
+        return self.values.nbytes
+
+    def as_array(self):
+        return self.values.transpose(2, 1, 0)
+
+    def field(self, name):
+        return self.values[self._field_pos[name]]
+
+    def frame(self, symbol):
+        """All fields of one symbol as a DataFrame (copies that symbol only)."""
+        n = self._symbol_pos[symbol]
+        df = pd.DataFrame(self.values[:, :, n].T, index=self.index, columns=self.fields)
+        return df.dropna(how="all", subset=["Close"])
+
+    def latest(self):
+        """Symbols x fields table of the last bar that has a close for each symbol."""
+        close = self.field("Close")
+        valid = ~np.isnan(close)
+        has_data = valid.any(axis=0)
+        last = len(self.index) - 1 - valid[::-1].argmax(axis=0)
+        cols = np.arange(len(self.symbols))
+        table = pd.DataFrame(self.values[:, last, cols].T, index=self.symbols, columns=self.fields)
+        table["Date"] = self.index[last]
+        return table[has_data]
+
+
+def read_universe(path):
+    """
+    Tickers from a text file (one per line, '#' comments) or a CSV with a
+    symbol/ticker column.
+    """
+    if path.lower().endswith(".csv"):
+        df = pd.read_csv(path)
+        for col in df.columns:
+            if str(col).lower() in ("symbol", "ticker"):
+                return [str(t).strip().upper() for t in df[col].dropna()]
+        return [str(t).strip().upper() for t in df.iloc[:, 0].dropna()]
+    tickers = []
+    with open(path) as fh:
+        for line in fh:
+            line = line.split("#", 1)[0].strip()
+            if line:
+                tickers.extend(t.strip().upper() for t in line.replace(",", " ").split())
+    return list(dict.fromkeys(tickers))
+
+
+def _timestamps(bars):
+    """Epoch nanoseconds of an OHLCV DataFrame or a BarView (the store's column, not a copy)."""
+    if isinstance(bars, BarView):
+        return bars.ts
+    return bars.index.values.astype("datetime64[ns]").view("i8")
+
+
+def build_price_block(frames, extra_fields=0):
+    """
+    Align {symbol: OHLCV frame or BarView} (or a whole BarStore) on the union
+    of their timestamps. Returns (block, symbols, index) where block has shape
+    (len(PRICE_FIELDS) + extra_fields, T, N) and NaN where a symbol has no bar.
+    """
+    if isinstance(frames, BarStore):
+        frames = {symbol: frames.bars(symbol) for symbol in frames.symbols}
+    symbols = [s for s, df in frames.items() if df is not None and len(df)]
+    if not symbols:
+        return np.empty((len(PRICE_FIELDS) + extra_fields, 0, 0)), [], pd.DatetimeIndex([])
+    stamps = np.unique(np.concatenate([_timestamps(frames[s]) for s in symbols]))
+    block = np.full((len(PRICE_FIELDS) + extra_fields, len(stamps), len(symbols)), np.nan)
+    for n, symbol in enumerate(symbols):
+        bars = frames[symbol]
+        rows = np.searchsorted(stamps, _timestamps(bars))
+        for f, field in enumerate(PRICE_FIELDS):
+            block[f, rows, n] = np.asarray(bars[field], dtype=float)
+    return block, symbols, pd.DatetimeIndex(pd.to_datetime(stamps, unit="ns"))
+
+
+def calendar_groups(block):
+    """
+    [(rows, cols)]: symbols that have bars on exactly the same timestamps,
+    with the row indices of those timestamps. Stocks and crypto (or
+    exchanges with different holidays) end up in different groups.
+    """
+    present = ~np.isnan(block[:len(PRICE_FIELDS)]).all(axis=0)
+    if not present.size:
+        return []
+    calendars, inverse = np.unique(np.packbits(present, axis=0).T, axis=0, return_inverse=True)
+    inverse = inverse.ravel()
+    groups = []
+    for g in range(len(calendars)):
+        cols = np.flatnonzero(inverse == g)
+        rows = np.flatnonzero(present[:, cols[0]])
+        if len(rows):
+            groups.append((rows, cols))
+    return groups
+
+
+def _run_group(block, engine, rows, cols):
+    """Indicators of the symbols `cols` over their own bars `rows` only, written back into `block`."""
+    nprice = len(PRICE_FIELDS)
+    lo, hi = int(cols[0]), int(cols[-1]) + 1
+    if len(rows) == block.shape[1] and hi - lo == len(cols):
+        # one calendar over the whole axis: views, nothing copied
+        engine.run(block[0, :, lo:hi], block[1, :, lo:hi], block[2, :, lo:hi], out=block[nprice:, :, lo:hi])
+        return
+    sub = block[:, rows[:, None], cols]
+    engine.run(sub[0], sub[1], sub[2], out=sub[nprice:])
+    block[nprice:, rows[:, None], cols] = sub[nprice:]
+
+
+def _run_chunk(shm_name, shape, specs, rows, cols):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        block = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+        _run_group(block, IndicatorEngine(specs), rows, cols)
+        del block
+    finally:
+        shm.close()
+    return len(cols)
+
+
+def compute_panel(frames, specs=SCREENER_INDICATORS, workers=None):
+    """
+    Indicators for every symbol in {symbol: OHLCV frame or BarView} or in a
+    BarStore, as one Panel.
+    Each symbol's indicators are computed on its own bars (per calendar
+    group) and only the outputs are aligned on the common axis.
+    """
+    engine = IndicatorEngine(specs)
+    block, symbols, index = build_price_block(frames, extra_fields=len(engine.names))
+    fields = list(PRICE_FIELDS) + engine.names
+    T, N = block.shape[1], block.shape[2]
+    nprice = len(PRICE_FIELDS)
+    groups = calendar_groups(block) if T else []
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, N // MIN_SYMBOLS_PER_WORKER))
+
+    if workers == 1:
+        for rows, cols in groups:
+            _run_group(block, engine, rows, cols)
+        return Panel(block, fields, symbols, index)
+
+    shm = shared_memory.SharedMemory(create=True, size=block.nbytes)
+    try:
+        shared = np.ndarray(block.shape, dtype=np.float64, buffer=shm.buf)
+        shared[:nprice] = block[:nprice]
+        size = max(1, -(-N // (workers * 4)))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            jobs = [pool.submit(_run_chunk, shm.name, block.shape, engine.specs, rows, cols[i:i + size])
+                    for rows, cols in groups for i in range(0, len(cols), size)]
+            for job in jobs:
+                job.result()
+        block[nprice:] = shared[nprice:]
+        del shared
+    finally:
+        shm.close()
+        shm.unlink()
+    return Panel(block, fields, symbols, index)
+
+
+def rank(table, filter_expr=None, sort=None, ascending=True, top=None):
+    """Filter the latest-values table with a pandas query expression and sort it."""
+    if filter_expr:
+        table = table.query(filter_expr)
+    if sort:
+        table = table.sort_values(sort, ascending=ascending)
+    if top:
+        table = table.head(top)
+    return table
+
+
+def screen(tickers, filter_expr=None, sort=None, ascending=True, top=None, start=None, end=None,
+           period="1y", interval="1d", specs=SCREENER_INDICATORS, workers=None, store=None):
+    """
+    Fetch, compute and rank a universe. Returns (ranked table, Panel).
+    With `store` (a BarStore) the bars of `tickers` are read from its columns
+    instead of the cache, over the same [start, end) window (start from
+    `period` when not given); tickers it lacks are skipped.
+    """
+    if store is not None:
+        start = period_to_start(period or "1y") if start is None else start
+        # BarStore.bars includes `end`, the cache does not
+        end = None if end is None else pd.Timestamp(end) - pd.Timedelta(1, "ns")
+        frames = {t: store.bars(t, start, end) for t in tickers if t in store}
+    else:
+        frames = load_many(tickers, start=start, end=end, interval=interval, period=period)
+    panel = compute_panel(frames, specs=specs, workers=workers)
+    return rank(panel.latest(), filter_expr, sort, ascending, top), panel
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Screen a universe of tickers by indicator values.")
+    parser.add_argument("universe", help="text file with tickers or CSV with a symbol column")
+    parser.add_argument("--filter", dest="filter_expr", help='e.g. "RSI < 30 and ADX > 25"')
+    parser.add_argument("--sort", help="column to rank by, e.g. RSI")
+    parser.add_argument("--desc", action="store_true", help="sort descending")
+    parser.add_argument("--top", type=int, default=50)
+    parser.add_argument("--period", default="1y")
+    parser.add_argument("--interval", default="1d")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--store", help="directory of a saved BarStore to read bars from instead of the cache")
+    parser.add_argument("--csv", help="write the ranked table to this file")
+    args = parser.parse_args(argv)
+
+    tickers = read_universe(args.universe)
+    store = BarStore.open(args.store) if args.store else None
+    table, panel = screen(tickers, args.filter_expr, args.sort, not args.desc, args.top,
+                          period=args.period, interval=args.interval, workers=args.workers, store=store)
+    print(f"{len(panel.symbols)}/{len(tickers)} symbols, {len(panel.index)} bars, "
+          f"panel {panel.nbytes / 1e6:.1f} MB, {len(table)} matches", file=sys.stderr)
+    with pd.option_context("display.max_rows", None, "display.width", 200):
+        print(table)
+    if args.csv:
+        table.to_csv(args.csv)
+
+
+if __name__ == "__main__":
+    main()
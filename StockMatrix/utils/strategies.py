@@ -1,15 +1,27 @@
-import yfinance as yf
 import streamlit as st
+from utils.data_cache import load_bars
+from utils.backtest import run_backtest, sma_crossover
 
-def moving_average_strategy(symbol, short_window=10, long_window=50):
-    df = yf.download(symbol, period="1y")
+def moving_average_strategy(symbol, short_window=10, long_window=50, fee=0.001, slippage=0.0005):
+    df = load_bars(symbol, period="1y")
     if df is None or df.empty:
         st.error("Brak danych dla strategii")
         return
     df["SMA_short"] = df["Close"].rolling(short_window).mean()
     df["SMA_long"] = df["Close"].rolling(long_window).mean()
-    df["Signal"] = 0
-    df.loc[df["SMA_short"] > df["SMA_long"], "Signal"] = 1
+    df["Signal"] = sma_crossover(df["Close"], short_window, long_window)
     df["Position"] = df["Signal"].diff()
     st.line_chart(df[["Close","SMA_short","SMA_long"]].dropna())
+
+    # --- Wynik strategii (P&L z prowizją i poślizgiem) ---
+    result = run_backtest(df["Close"], df["Signal"], fee=fee, slippage=slippage)
+    m = result.metrics
+    cols = st.columns(4)
+    cols[0].metric("Stopa zwrotu", f"{m['total_return'] * 100:.2f}%")
+    cols[1].metric("Sharpe", f"{m['sharpe']:.2f}")
+    cols[2].metric("Max drawdown", f"{m['max_drawdown'] * 100:.2f}%")
+    cols[3].metric("Transakcje", m["trades"])
+    st.line_chart(result.equity)
+    st.write(result.trades.tail())
     st.write(df.tail())
+    return result
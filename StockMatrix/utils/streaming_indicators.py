@@ -0,0 +1,409 @@
+# utils/streaming_indicators.py
+"""
+Stateful indicators that take one bar at a time.
+
+Every class mirrors the batch kernels in utils/indicators step by step, in
+the same floating point order, so feeding bars one by one gives exactly the
+values `IndicatorEngine` produces for the whole history, missing (NaN) bars
+included: averages decay their weight over a gap and RSI counts moves into
+and out of a gap as zero, as the batch engine does. `parity` checks this on
+a given series. `update` costs O(1) in history length (O(window) at most),
+and `snapshot`/`restore` let a live feed persist its state and resume
+without replaying history.
+"""
+import math
+from collections import deque
+
+import numpy as np
+
+from utils.indicators import IndicatorEngine
+
+NAN = float("nan")
+
+
+def _field(bar, name):
+    if not hasattr(bar, "get"):
+        return float(bar) if name == "Close" else NAN
+    for key in (name, name.lower()):
+        value = bar.get(key)
+        if value is not None:
+            return float(value)
+    return NAN
+
+
+def _fmax(a, b):
+    # np.fmax: NaN only if both are NaN
+    if a != a:
+        return b
+    if b != b:
+        return a
+    return a if a >= b else b
+
+
+def _div(num, den):
+    # numpy float division semantics (inf/nan instead of ZeroDivisionError)
+    if den == 0:
+        if num != num or num == 0:
+            return NAN
+        return math.copysign(math.inf, num) * math.copysign(1.0, den)
+    return num / den
+
+
+class StreamingIndicator:
+    """Base class: subclasses implement `push(close, high, low)`."""
+    outputs = ()
+
+    def update(self, bar):
+        """Append one bar (mapping with Close/High/Low or a bare close price)."""
+        return self.push(_field(bar, "Close"), _field(bar, "High"), _field(bar, "Low"))
+
+    def push(self, close, high=NAN, low=NAN):
+        raise NotImplementedError
+
+    def snapshot(self):
+        state = {}
+        for key, value in self.__dict__.items():
+            if isinstance(value, StreamingIndicator):
+                value = {"__indicator__": value.snapshot()}
+            elif isinstance(value, deque):
+                value = {"__deque__": list(value), "maxlen": value.maxlen}
+            state[key] = value
+        return state
+
+    def restore(self, state):
+        for key, value in state.items():
+            if isinstance(value, dict) and "__indicator__" in value:
+                getattr(self, key).restore(value["__indicator__"])
+                continue
+            if isinstance(value, dict) and "__deque__" in value:
+                value = deque(value["__deque__"], maxlen=value["maxlen"])
+            setattr(self, key, value)
+        return self
+
+
+class _Ewm(StreamingIndicator):
+    """
+    Recursive average started at the first valid value (utils.indicators._ewm);
+    a NaN keeps the value and decays its weight `w` for the next valid one.
+    """
+
+    def __init__(self, alpha):
+        self.alpha = alpha
+        self.beta = 1.0 - alpha
+        self.w = self.beta
+        self.y = NAN
+
+    def push(self, close, high=NAN, low=NAN):
+        v = close
+        if v == v:
+            self.y = v if self.y != self.y else (self.w * self.y + self.alpha * v) / (self.w + self.alpha)
+            self.w = self.beta
+        elif self.y == self.y:
+            self.w *= self.beta
+        return self.y
+
+
+class _Wilder(StreamingIndicator):
+    """
+    Wilder smoothing seeded with the mean of the first `window` values
+    (utils.indicators._wilder); after the seed, NaN goes to the _Ewm so a gap
+    decays as in the batch engine.
+    """
+
+    def __init__(self, window):
+        self.window = window
+        self.ewm = _Ewm(1.0 / window)
+        self.n = 0
+        self.seed_sum = 0.0
+
+    def push(self, close, high=NAN, low=NAN):
+        v = close
+        if self.n == 0 and v != v:
+            return NAN
+        self.n += 1
+        if self.n <= self.window:
+            self.seed_sum += v if v == v else 0.0
+            if self.n < self.window:
+                return NAN
+            return self.ewm.push(self.seed_sum / self.window)
+        return self.ewm.push(v)
+
+
+class _Rolling(StreamingIndicator):
+    """Prefix sums over the last `window` bars, as the cumulative sums of the batch engine."""
+
+    def __init__(self, window):
+        self.window = window
+        self.total = 0.0
+        self.count = 0
+        self.sums = deque([0.0], maxlen=window + 1)
+        self.counts = deque([0], maxlen=window + 1)
+        self.values = deque(maxlen=window)
+
+    def push(self, close, high=NAN, low=NAN):
+        v = close
+        valid = v == v
+        self.total += v if valid else 0.0
+        self.count += valid
+        self.sums.append(self.total)
+        self.counts.append(self.count)
+        self.values.append(v)
+        if len(self.sums) <= self.window or self.counts[-1] - self.counts[0] != self.window:
+            return NAN
+        return (self.sums[-1] - self.sums[0]) / self.window
+
+
+class SMA(StreamingIndicator):
+    outputs = ("SMA",)
+
+    def __init__(self, window=20):
+        self.rolling = _Rolling(window)
+        self.value = NAN
+
+    def push(self, close, high=NAN, low=NAN):
+        self.value = self.rolling.push(close)
+        return self.value
+
+
+class EMA(StreamingIndicator):
+    outputs = ("EMA",)
+
+    def __init__(self, window=20):
+        self.window = window
+        self.ewm = _Ewm(2.0 / (window + 1))
+        self.count = 0
+        self.value = NAN
+
+    def push(self, close, high=NAN, low=NAN):
+        y = self.ewm.push(close)
+        self.count += close == close
+        self.value = y if self.count >= self.window else NAN
+        return self.value
+
+
+class RSI(StreamingIndicator):
+    outputs = ("RSI",)
+
+    def __init__(self, window=14):
+        self.window = window
+        self.up = _Ewm(1.0 / window)
+        self.down = _Ewm(1.0 / window)
+        self.prev = NAN
+        self.count = 0
+        self.value = NAN
+
+    def push(self, close, high=NAN, low=NAN):
+        diff = close - self.prev
+        self.prev = close
+        if self.count or close == close:
+            # from the first valid close on, a move into or out of a gap (NaN diff) counts as zero
+            self.count += 1
+            self.up.push(diff if diff > 0 else 0.0)
+            self.down.push(-diff if diff < 0 else 0.0)
+        if self.count < self.window:
+            self.value = NAN
+            return self.value
+        up, down = self.up.y, self.down.y
+        self.value = 100.0 if down == 0 else 100.0 - 100.0 / (1.0 + _div(up, down))
+        return self.value
+
+
+class MACD(StreamingIndicator):
+    outputs = ("MACD", "MACD_signal", "MACD_diff")
+
+    def __init__(self, fast=12, slow=26, signal=9):
+        self.fast = EMA(fast)
+        self.slow = EMA(slow)
+        self.signal_window = signal
+        self.signal_ewm = _Ewm(2.0 / (signal + 1))
+        self.count = 0
+        self.value = (NAN, NAN, NAN)
+
+    def push(self, close, high=NAN, low=NAN):
+        macd = self.fast.push(close) - self.slow.push(close)
+        y = self.signal_ewm.push(macd)
+        self.count += macd == macd
+        signal = y if self.count >= self.signal_window else NAN
+        self.value = (macd, signal, macd - signal)
+        return self.value
+
+
+class Bollinger(StreamingIndicator):
+    outputs = ("BB_upper", "BB_lower", "BB_mid")
+
+    def __init__(self, window=20, dev=2):
+        self.window = window
+        self.dev = dev
+        self.rolling = _Rolling(window)
+        self.value = (NAN, NAN, NAN)
+
+    def push(self, close, high=NAN, low=NAN):
+        mid = self.rolling.push(close)
+        std = NAN
+        if len(self.rolling.values) == self.window:
+            acc = 0.0
+            for v in reversed(self.rolling.values):
+                d = v - mid
+                acc += d * d
+            std = math.sqrt(acc / self.window)
+        self.value = (mid + self.dev * std, mid - self.dev * std, mid)
+        return self.value
+
+
+class ATR(StreamingIndicator):
+    outputs = ("ATR",)
+
+    def __init__(self, window=14):
+        self.wilder = _Wilder(window)
+        self.prev_close = NAN
+        self.value = 0.0
+
+    def push(self, close, high=NAN, low=NAN):
+        pc = self.prev_close
+        self.prev_close = close
+        tr = _fmax(high - low, _fmax(abs(high - pc), abs(low - pc)))
+        y = self.wilder.push(tr)
+        self.value = 0.0 if y != y else y
+        return self.value
+
+
+class Stochastic(StreamingIndicator):
+    outputs = ("Stochastic",)
+
+    def __init__(self, window=14):
+        self.window = window
+        self.highs = deque(maxlen=window)
+        self.lows = deque(maxlen=window)
+        self.value = NAN
+
+    def push(self, close, high=NAN, low=NAN):
+        self.highs.append(high)
+        self.lows.append(low)
+        self.value = NAN
+        if len(self.lows) == self.window:
+            if any(v != v for v in self.lows) or any(v != v for v in self.highs):
+                return self.value
+            lowest, highest = min(self.lows), max(self.highs)
+            self.value = _div(100.0 * (close - lowest), highest - lowest)
+        return self.value
+
+
+class ADX(StreamingIndicator):
+    outputs = ("ADX",)
+
+    def __init__(self, window=14):
+        self.tr = _Wilder(window)
+        self.pos = _Wilder(window)
+        self.neg = _Wilder(window)
+        self.adx = _Wilder(window)
+        self.prev_close = NAN
+        self.prev_high = NAN
+        self.prev_low = NAN
+        self.seen_tr = False
+        self.value = 0.0
+
+    def push(self, close, high=NAN, low=NAN):
+        pc = self.prev_close
+        tr = _fmax(high - low, _fmax(abs(high - pc), abs(low - pc)))
+        if tr == tr and not self.seen_tr:
+            # directional movement needs the previous bar, so the first bar is dropped as in ta
+            self.seen_tr = True
+            tr = NAN
+        up = high - self.prev_high
+        down = self.prev_low - low
+        self.prev_close, self.prev_high, self.prev_low = close, high, low
+        pos = NAN if up != up else (up if (up > down and up > 0) else 0.0)
+        neg = NAN if down != down else (down if (down > up and down > 0) else 0.0)
+
+        tr_s = self.tr.push(tr)
+        pos_s = self.pos.push(pos)
+        neg_s = self.neg.push(neg)
+        dx = NAN
+        if tr_s == tr_s:
+            di_pos = 100.0 * pos_s / tr_s if tr_s != 0 else 0.0
+            di_neg = 100.0 * neg_s / tr_s if tr_s != 0 else 0.0
+            di_sum = di_pos + di_neg
+            dx = 100.0 * abs(di_pos - di_neg) / di_sum if di_sum != 0 else 0.0
+        y = self.adx.push(dx)
+        self.value = 0.0 if y != y else y
+        return self.value
+
+
+_CLASSES = {
+    "sma": SMA,
+    "ema": EMA,
+    "rsi": RSI,
+    "macd": MACD,
+    "bbands": Bollinger,
+    "atr": ATR,
+    "stoch": Stochastic,
+    "adx": ADX,
+}
+
+
+class IndicatorSet:
+    """
+    Streaming counterpart of IndicatorEngine built from the same specs;
+    `update(bar)` returns {output name: value} for the new bar.
+    """
+
+    def __init__(self, specs):
+        self.engine = IndicatorEngine(specs)
+        self.specs = self.engine.specs
+        self.names = self.engine.names
+        self.indicators = [_CLASSES[s.kind](**dict(s.params)) for s in self.specs]
+        self.bars = 0
+
+    def push(self, close, high=NAN, low=NAN):
+        values = {}
+        for s, ind in zip(self.specs, self.indicators):
+            out = ind.push(close, high, low)
+            if not isinstance(out, tuple):
+                out = (out,)
+            values.update(zip(s.outputs, out))
+        self.bars += 1
+        return values
+
+    def update(self, bar):
+        return self.push(_field(bar, "Close"), _field(bar, "High"), _field(bar, "Low"))
+
+    def extend(self, close, high=None, low=None):
+        """Replay a history (e.g. cached bars) and return the values after the last bar."""
+        values = {}
+        high = [NAN] * len(close) if high is None else high
+        low = [NAN] * len(close) if low is None else low
+        for c, h, l in zip(close, high, low):
+            values = self.push(float(c), float(h), float(l))
+        return values
+
+    def snapshot(self):
+        return {"bars": self.bars, "state": [ind.snapshot() for ind in self.indicators]}
+
+    def restore(self, snapshot):
+        self.bars = snapshot["bars"]
+        for ind, state in zip(self.indicators, snapshot["state"]):
+            ind.restore(state)
+        return self
+
+
+def parity(specs, close, high=None, low=None):
+    """
+    Feed a series bar by bar through an IndicatorSet and compare it with
+    IndicatorEngine on the whole series. Returns {output name: rows that
+    differ}; NaN equals NaN, anything else must match exactly.
+    """
+    engine = IndicatorEngine(specs)
+    close = np.asarray(close, dtype=float)
+    high = None if high is None else np.asarray(high, dtype=float)
+    low = None if low is None else np.asarray(low, dtype=float)
+    block = engine.run(close, high, low)
+    stream = IndicatorSet(specs)
+    nan = np.full(len(close), np.nan)
+    rows = [stream.push(c, h, l) for c, h, l in zip(close.tolist(), (nan if high is None else high).tolist(),
+                                                     (nan if low is None else low).tolist())]
+    out = {}
+    for i, name in enumerate(engine.names):
+        streamed = np.array([r[name] for r in rows], dtype=float)
+        batch = block[i, :, 0]
+        out[name] = int(np.count_nonzero((streamed != batch) & ~(np.isnan(streamed) & np.isnan(batch))))
+    return out
@@ -0,0 +1,63 @@
+# utils/synthetic.py
+"""
+Deterministic synthetic OHLCV data for benchmarks and offline work.
+
+Closes follow a geometric random walk; open, high and low are drawn around
+it so that low <= open, close <= high always holds, and volume is
+log-normal. Every symbol gets its own stream spawned from
+SeedSequence((seed, symbol index)), so the bars of a symbol do not depend
+on how many other symbols are generated.
+"""
+import numpy as np
+import pandas as pd
+
+from utils.data_cache import is_intraday
+
+_FREQ = {"1m": "min", "5m": "5min", "15m": "15min", "1h": "h", "4h": "4h", "1d": "B", "1wk": "W-MON"}
+
+
+def synthetic_index(n_bars, interval="1d", end="2026-01-02"):
+    """`n_bars` timestamps ending at `end` (business days for 1d)."""
+    index = pd.date_range(end=end, periods=n_bars, freq=_FREQ[interval])
+    index.name = "Datetime" if is_intraday(interval) else "Date"
+    return index
+
+
+def _symbol_arrays(n_bars, seed, j, start_price=100.0, drift=0.0002, vol=0.015):
+    rng = np.random.default_rng(np.random.SeedSequence((seed, j)))
+    steps = rng.normal(drift, vol, n_bars)
+    close = start_price * np.exp(np.cumsum(steps) + rng.normal(0, 0.5))
+    open_ = np.concatenate([[close[0]], close[:-1]]) * np.exp(rng.normal(0, vol / 4, n_bars))
+    spread = np.abs(rng.normal(0, vol / 2, (2, n_bars)))
+    high = np.maximum(open_, close) * np.exp(spread[0])
+    low = np.minimum(open_, close) * np.exp(-spread[1])
+    volume = np.round(rng.lognormal(13, 0.6, n_bars))
+    return open_, high, low, close, volume
+
+
+def synthetic_arrays(n_bars, n_symbols=1, seed=0, **kwargs):
+    """
+    (open, high, low, close, volume), each a (n_bars, n_symbols) float64
+    array. Symbol j only depends on (seed, j).
+    """
+    out = np.empty((5, n_bars, n_symbols))
+    for j in range(n_symbols):
+        for f, values in enumerate(_symbol_arrays(n_bars, seed, j, **kwargs)):
+            out[f, :, j] = values
+    return out[0], out[1], out[2], out[3], out[4]
+
+
+def synthetic_bars(n_bars, seed=0, symbol_index=0, interval="1d", **kwargs):
+    """One symbol as a DataFrame with Open/High/Low/Close/Volume columns."""
+    arrays = _symbol_arrays(n_bars, seed, symbol_index, **kwargs)
+    return pd.DataFrame(dict(zip(("Open", "High", "Low", "Close", "Volume"), arrays)),
+                        index=synthetic_index(n_bars, interval))
+
+
+def synthetic_universe(n_symbols, n_bars, seed=0, interval="1d", prefix="SYN", **kwargs):
+    """{symbol: OHLCV DataFrame} for `n_symbols` symbols sharing one index."""
+    index = synthetic_index(n_bars, interval)
+    o, h, l, c, v = synthetic_arrays(n_bars, n_symbols, seed, **kwargs)
+    return {f"{prefix}{j:04d}": pd.DataFrame({"Open": o[:, j], "High": h[:, j], "Low": l[:, j],
+                                              "Close": c[:, j], "Volume": v[:, j]}, index=index)
+            for j in range(n_symbols)}
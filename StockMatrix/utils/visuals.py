@@ -1,23 +1,225 @@
+"""
+Chart rendering with server-side decimation.
+
+Candles are OHLC-aggregated to at most `max_points` buckets (about one per
+horizontal pixel) and overlay lines are reduced with LTTB (Largest Triangle
+Three Buckets), so the payload sent to the browser is bounded no matter how
+long the history is. A date-range slider (`chart_window`) picks the visible
+part; narrowing it re-aggregates that part at full resolution.
+
+Built figures are cached as JSON keyed on a data fingerprint and the
+render parameters, so a Streamlit rerun with unchanged data does not
+rebuild anything.
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
 import plotly.graph_objects as go
 import streamlit as st
 
-def plot_candlestick_chart(df, symbol):
-    fig = go.Figure(data=[
-        go.Candlestick(
-            x=df.index,
-            open=df["Open"],
-            high=df["High"],
-            low=df["Low"],
-            close=df["Close"],
-            name="Świece"
-        )
-    ])
-    fig.update_layout(title=f"📊 Wykres świecowy {symbol}", template="plotly_dark", height=600)
-    st.plotly_chart(fig, use_container_width=True)
-
-def plot_volume_chart(df, symbol):
-    fig = go.Figure(data=[
-        go.Bar(x=df.index, y=df["Volume"], name="Wolumen", marker_color="lightblue")
-    ])
-    fig.update_layout(title=f"🔹 Wolumen {symbol}", template="plotly_dark", height=300)
-    st.plotly_chart(fig, use_container_width=True)
+from utils import perf
+
+DEFAULT_MAX_POINTS = 1200
+FIGURE_CACHE_SIZE = 64
+
+
+def _bucket_edges(n, buckets):
+    return np.unique(np.linspace(0, n, buckets + 1).astype(int))
+
+
+def aggregate_ohlc(df, max_points=DEFAULT_MAX_POINTS, open_col="Open", high_col="High",
+                   low_col="Low", close_col="Close", volume_col="Volume"):
+    """
+    Merge consecutive bars into at most `max_points` candles: first open,
+    highest high, lowest low, last close, summed volume, stamped with the
+    first bar's time.
+    """
+    n = len(df)
+    if n <= max_points:
+        return df
+    edges = _bucket_edges(n, max_points)
+    starts, ends = edges[:-1], edges[1:] - 1
+    out = {
+        open_col: df[open_col].to_numpy(dtype=float)[starts],
+        high_col: np.fmax.reduceat(df[high_col].to_numpy(dtype=float), starts),
+        low_col: np.fmin.reduceat(df[low_col].to_numpy(dtype=float), starts),
+        close_col: df[close_col].to_numpy(dtype=float)[ends],
+    }
+    if volume_col and volume_col in df:
+        out[volume_col] = np.add.reduceat(np.nan_to_num(df[volume_col].to_numpy(dtype=float)), starts)
+    return pd.DataFrame(out, index=df.index[starts])
+
+
+def lttb(x, y, n_out):
+    """
+    Indices of the `n_out` points kept by Largest Triangle Three Buckets.
+    `x` and `y` are float arrays without NaNs.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    keep = np.empty(n_out, dtype=int)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            nlo, nhi = edges[i + 1], edges[i + 2]
+            cx, cy = x[nlo:nhi].mean(), y[nlo:nhi].mean()
+        else:
+            cx, cy = x[-1], y[-1]
+        ax, ay = x[a], y[a]
+        area = np.abs((ax - cx) * (y[lo:hi] - ay) - (ax - x[lo:hi]) * (cy - ay))
+        a = lo + int(np.argmax(area)) if hi > lo else lo
+        keep[i + 1] = a
+    return keep
+
+
+def decimate_line(series, max_points=DEFAULT_MAX_POINTS):
+    """LTTB-reduced copy of a time series (NaNs dropped first)."""
+    series = series.dropna()
+    if len(series) <= max_points:
+        return series
+    x = series.index.values.astype("datetime64[ns]").view("i8").astype(float) \
+        if isinstance(series.index, pd.DatetimeIndex) else np.arange(len(series), dtype=float)
+    keep = lttb(x, series.to_numpy(dtype=float), max_points)
+    return series.iloc[keep]
+
+
+def data_version(df):
+    """Cheap fingerprint: shape, columns, first/last stamps and the last row."""
+    if df.empty:
+        return "empty"
+    parts = (df.shape, tuple(map(str, df.columns)), str(df.index[0]), str(df.index[-1]),
+             tuple(np.round(df.iloc[-1].to_numpy(dtype=float, na_value=np.nan), 10).tolist()))
+    return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+
+class FigureCache:
+    """LRU of figure JSON strings."""
+
+    def __init__(self, maxsize=FIGURE_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_build(self, key, build):
+        with self._lock:
+            payload = self._items.get(key)
+            if payload is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+        perf.cache("figures", payload is not None)
+        if payload is None:
+            with perf.span("render.figure_build"):
+                payload = build().to_json()
+            with self._lock:
+                self.misses += 1
+                self._items[key] = payload
+                while len(self._items) > self.maxsize:
+                    self._items.popitem(last=False)
+        perf.observe_size("figure_json", len(payload))
+        return json.loads(payload)
+
+    def nbytes(self):
+        return sum(len(p) for p in self._items.values())
+
+
+figure_cache = FigureCache()
+
+
+def _window(df, start=None, end=None):
+    if start is not None:
+        df = df[df.index >= pd.Timestamp(start)]
+    if end is not None:
+        df = df[df.index <= pd.Timestamp(end)]
+    return df
+
+
+@perf.traced("render.candlestick_figure")
+def candlestick_figure(df, title, overlays=(), start=None, end=None, max_points=DEFAULT_MAX_POINTS,
+                       height=600, open_col="Open", high_col="High", low_col="Low", close_col="Close",
+                       increasing_color=None, decreasing_color=None):
+    """
+    Candlestick figure (as a plotly JSON dict) of df[start:end] with at most
+    `max_points` candles and per overlay. `overlays` is a sequence of
+    (column, line dict) pairs, e.g. ("SMA20", dict(color="orange", width=2)).
+    """
+    overlays = tuple((col, tuple(sorted(line.items()))) for col, line in overlays)
+    key = ("candles", data_version(df), title, overlays, str(start), str(end), max_points, height,
+           open_col, high_col, low_col, close_col, increasing_color, decreasing_color)
+
+    def build():
+        view = _window(df, start, end)
+        candles = aggregate_ohlc(view, max_points, open_col, high_col, low_col, close_col, None)
+        colors = {}
+        if increasing_color:
+            colors["increasing_line_color"] = increasing_color
+        if decreasing_color:
+            colors["decreasing_line_color"] = decreasing_color
+        fig = go.Figure(go.Candlestick(
+            x=candles.index, open=candles[open_col], high=candles[high_col],
+            low=candles[low_col], close=candles[close_col], name="Świece", **colors))
+        for col, style in overlays:
+            if col in view:
+                series = decimate_line(view[col], max_points)
+                fig.add_trace(go.Scatter(x=series.index, y=series, line=dict(style), name=col))
+        suffix = f" ({len(candles)}/{len(view)} świec)" if len(candles) < len(view) else ""
+        fig.update_layout(title=f"{title}{suffix}", template="plotly_dark",
+                          xaxis_rangeslider_visible=False, height=height)
+        return fig
+
+    return figure_cache.get_or_build(key, build)
+
+
+@perf.traced("render.volume_figure")
+def volume_figure(df, title, start=None, end=None, max_points=DEFAULT_MAX_POINTS, height=300,
+                  volume_col="Volume", color="lightblue"):
+    """Volume bars summed into at most `max_points` buckets."""
+    key = ("volume", data_version(df), title, str(start), str(end), max_points, height, volume_col, color)
+
+    def build():
+        view = _window(df, start, end)
+        volume = view[volume_col]
+        if len(volume) > max_points:
+            edges = _bucket_edges(len(volume), max_points)[:-1]
+            volume = pd.Series(np.add.reduceat(np.nan_to_num(volume.to_numpy(dtype=float)), edges),
+                               index=view.index[edges])
+        fig = go.Figure(go.Bar(x=volume.index, y=volume, name="Wolumen", marker_color=color))
+        fig.update_layout(title=title, template="plotly_dark", height=height)
+        return fig
+
+    return figure_cache.get_or_build(key, build)
+
+
+def chart_window(df, key):
+    """Date-range slider over df.index; returns (start, end) of the visible part."""
+    if len(df) < 2:
+        return None, None
+    first, last = df.index[0].to_pydatetime(), df.index[-1].to_pydatetime()
+    start, end = st.slider("Zakres wykresu", min_value=first, max_value=last, value=(first, last),
+                           key=key)
+    return start, end
+
+
+def show_chart(fig, **kwargs):
+    """st.plotly_chart at container width, timed as render.plotly_chart."""
+    with perf.span("render.plotly_chart"):
+        st.plotly_chart(fig, use_container_width=True, **kwargs)
+
+
+def plot_candlestick_chart(df, symbol, start=None, end=None, max_points=DEFAULT_MAX_POINTS):
+    fig = candlestick_figure(df, f"📊 Wykres świecowy {symbol}", start=start, end=end,
+                             max_points=max_points)
+    show_chart(fig)
+
+def plot_volume_chart(df, symbol, start=None, end=None, max_points=DEFAULT_MAX_POINTS):
+    fig = volume_figure(df, f"🔹 Wolumen {symbol}", start=start, end=end, max_points=max_points)
+    show_chart(fig)